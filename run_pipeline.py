@@ -22,7 +22,10 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 from welfareobs.utils.performance_monitor import PerformanceMonitor
 from welfareobs.runner import Runner
 from welfareobs.utils.config import Config
+from welfareobs.utils import logger
+from welfareobs.utils.startup_profile import StartupProfile
 import argparse
+import json
 
 
 
@@ -31,27 +34,40 @@ def main():
     parser.add_argument('-c', '--config',
                         help='JSON Configuration to use for running the pipeline (filename only)',
                         required=True)
+    parser.add_argument('--profile-startup', nargs='?', const='', default=None, metavar='JSON',
+                        help='Log a time-to-first-frame breakdown (and optionally write it to this JSON file)')
     args = parser.parse_args()                    
+    startup = StartupProfile() if args.profile_startup is not None else None
     cfg: Config = Config(
 	    f"/project/config/{args.config}",
 	    "/project/welfareobs/welfareobs"
     )
 
-    runner: Runner = Runner(cfg)
-    run_count = None
-    if cfg.exists("settings.run-count"):
-        run_count=cfg.as_int("settings.run-count")
-
-    run_seconds = None
-    if cfg.exists("settings.run-seconds"):
-        run_seconds=cfg.as_int("settings.run-seconds")
-
-    performance_csv_filename = None
-    if cfg.exists("settings.performance-csv-filename"):
-        performance_csv_filename=cfg.as_string("settings.performance-csv-filename")
-    
-    runner.run(run_count, run_seconds) # 107894 matches the performance-history-size configuration of the evaluation dataset
-    runner.performance.save(performance_csv_filename)
+    # e.g. "log-level": "INFO", "log-levels": {"welfareobs.handlers.aggregator": "DEBUG"}, "log-json-filename": "..."
+    logger.configure(
+        level=cfg.as_string("settings.log-level") or "INFO",
+        levels=cfg["settings.log-levels"] if cfg.exists("settings.log-levels") else None,
+        json_filename=cfg.as_string("settings.log-json-filename") or None
+    )
+
+    runner: Runner = Runner(cfg, startup)
+    settings = runner.pipeline.settings
+    runner.run(settings.run_count, settings.run_seconds) # 107894 matches the performance-history-size configuration of the evaluation dataset
+    if settings.performance_csv_filename != "":
+        # snapshots already hold this run's history, so overwrite rather than append to them
+        runner.performance.save(settings.performance_csv_filename, append=not runner.snapshots_enabled)
+    print(str(runner.timing))
+    if settings.handler_timing_filename != "":
+        with open(settings.handler_timing_filename, "w") as file:
+            json.dump(runner.timing.report(), file, indent=2)
+    if runner.memory is not None:
+        print(str(runner.memory))
+        if settings.memory_report_filename != "":
+            with open(settings.memory_report_filename, "w") as file:
+                json.dump(runner.memory.report(), file, indent=2)
+    if startup is not None and args.profile_startup != "":
+        with open(args.profile_startup, "w") as file:
+            json.dump(startup.report(), file, indent=2)
 
 
 if __name__ == "__main__":
@@ -24,12 +24,22 @@ import torch
 import timm
 import torchvision.transforms as T
 from torch.optim import SGD, Adam, SparseAdam, AdamW, ASGD, LBFGS
+from torch.utils.data import Subset
 from wildlife_tools.data import WildlifeDataset
 from wildlife_tools.features import DeepFeatures
 from wildlife_tools.train import ArcFaceLoss, BasicTrainer
+from welfareobs.detectron.amp_trainer import AmpTrainer
 from welfareobs.utils.config import Config
 from welfareobs.detectron.welfareobs_dataset import WelfareObsDataset
+from welfareobs.utils.gallery import EmbeddingCache, image_hash, save_gallery
+from welfareobs.utils.image_shards import ShardedImages
+from welfareobs.utils.retrieval import evaluate, holdout, leave_one_out_top1
+from welfareobs.utils.sweep import Sweep
+import csv
+import json
 import os
+import time
+import numpy as np
 import pandas as pd
 
 
@@ -38,6 +48,7 @@ Example:
 
 {
     "configs": "wod-1-md",
+    "devices": "cuda:0,cuda:1",
     "wod-1-md": {
         "comment": "Fine-tuning Mega Descriptor",
         "name": "wod-1-md",
@@ -51,10 +62,34 @@ Example:
         "dimensions": "384",
         "optimizer": "SGD",
         "learning-rate": "0.001",
-        "learning-rate-momentum": "0.9"
+        "learning-rate-momentum": "0.9",
+        "embedding-cache": "/project/data/embedding-cache",
+        "gallery-only": "False",
+        "preprocessed": "/project/data/preprocessed/wod-1-384",
+        "validation-fraction": "0.2",
+        "amp": "True",
+        "amp-dtype": "bfloat16",
+        "gradient-checkpointing": "True",
+        "channels-last": "True",
+        "accumulation-steps": "8"
     },
 }
 
+amp runs the backbone forward under autocast (float16 with loss scaling, or bfloat16), gradient-checkpointing
+recomputes the timm backbone activations in the backward pass instead of keeping them, and channels-last
+keeps the model and batches NHWC. Each epoch logs images/s and peak GPU memory (also in epochs.json and
+the sweep comparison) to compare configs.
+
+validation-fraction holds out that share of the images (split by a hash of the image path, so every config
+and rerun sees the same split) from training. After training the held-out embeddings are matched against
+the rest and metrics.json (top-1, top-5, mAP, embedding ms per image and top-1 per ms) and confusion.csv
+are written next to checkpoint.pth. The gallery keeps every image.
+
+The gallery (similarity.npy, float16 and memory mappable, with the similarity.json label index) is written
+next to checkpoint.pth. Embeddings are cached (embedding-cache, default <outpath>/embeddings) by image
+content, backbone, checkpoint and transform, so a rerun only embeds new images. After adding images set
+"gallery-only": "True" to keep the trained checkpoint and only extend the gallery.
+
 Variations on the Optimizers:
         "optimizer": "SGD",
         "learning-rate": "0.001",
@@ -84,39 +119,81 @@ Alternative backbones:
 
 """
 
-# Set data for similarity-aware and random splits
-config: Config = Config("/project/config.json")
-sets = [o.strip() for o in config["configs"].split(",")]
-for ptr in sets:
+CONFIG_FILENAME = "/project/config.json"
+OUTPUT = "/project/data/results"
+# parsed (and preprocessed) datasets by source and size, shared by every run in a sweep worker
+DATASETS: dict[tuple, WelfareObsDataset] = {}
+
+
+def load_dataset(config: Config, ptr: str, dimensions: int) -> WelfareObsDataset:
+    root = config[f"{ptr}.root"]
+    annotations_file = config[f"{ptr}.annotations-filename"]
+    # decoding full resolution JPEGs every epoch is the bottleneck on long runs: with "preprocessed" set the
+    # images are decoded and resized once into memory-mapped shards (redone when the annotations change)
+    preprocessed = config[f"{ptr}.preprocessed"] if config.exists(f"{ptr}.preprocessed") else None
+    key = (root, annotations_file, dimensions, preprocessed)
+    if key in DATASETS:
+        return DATASETS[key]
+
+    # WelfareObsDataset, WildlifeDataset and ImageDataset all return RGB images 
+    def create(preprocessed: str|None = None) -> WelfareObsDataset:
+        return WelfareObsDataset(
+            root=root,
+            annotations_file=annotations_file,
+            transform = T.Compose([
+                T.Resize(
+                    size=(dimensions,dimensions),
+                    interpolation=T.InterpolationMode.BILINEAR,
+                    max_size=None,
+                    antialias=True
+                ),  # Resize the input image to the given size            
+                # T.Resize(size=dimensions),
+                # T.CenterCrop(size=[dimensions, dimensions]),
+                T.ToTensor(),  # Convert a PIL Image or ndarray to tensor and scale the values 0->255 to 0.0->1.0
+                T.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)),  # output[channel] = (input[channel] - mean[channel]) / std[channel] (this is the mapping for ImageNet RGB)
+            ]),
+            img_load="full", # "bbox_mask",
+            col_path="path",
+            col_label="identity",
+            load_label=True,
+            preprocessed=preprocessed
+        )
+    try:
+        dataset = create(preprocessed)
+        if preprocessed is not None and ShardedImages(preprocessed).size != dimensions:
+            raise ValueError(f"{preprocessed} was preprocessed at another size")
+    except (OSError, ValueError) as ex:
+        if preprocessed is None:
+            raise
+        print(f"Preprocessing images to {preprocessed} ({ex})...")
+        create().preprocess(preprocessed, dimensions, workers=config.as_int(f"{ptr}.trainer-workers"))
+        dataset = create(preprocessed)
+    DATASETS[key] = dataset
+    return dataset
+
+
+def train(ptr: str, device: str = "") -> dict:
+    """
+    Train one config, then build its gallery
+    :param ptr: config name
+    :param device: overrides the config's device (the sweep worker's device)
+    :return: results for the sweep comparison
+    """
+    config: Config = Config(CONFIG_FILENAME)
     dimensions = config.as_int(f"{ptr}.dimensions")
     learning_rate = config.as_float(f"{ptr}.learning-rate")
     use_opt = config[f"{ptr}.optimizer"]
     name = config[f"{ptr}.name"]
-    device = config[f"{ptr}.device"]
-    outpath = f"/project/data/results/{name}"
-    print(f"Processing {ptr} to {outpath}.")
+    device = device or config[f"{ptr}.device"]
+    epochs = config.as_int(f"{ptr}.trainer-epochs")
+    outpath = os.path.join(OUTPUT, name)
+    print(f"Processing {ptr} to {outpath} on {device}.")
     os.makedirs(outpath, exist_ok=True)
-    # WelfareObsDataset, WildlifeDataset and ImageDataset all return RGB images 
-    dataset=WelfareObsDataset(
-        root=config[f"{ptr}.root"],
-        annotations_file=config[f"{ptr}.annotations-filename"],
-        transform = T.Compose([
-            T.Resize(
-                size=(dimensions,dimensions),
-                interpolation=T.InterpolationMode.BILINEAR,
-                max_size=None,
-                antialias=True
-            ),  # Resize the input image to the given size            
-            # T.Resize(size=dimensions),
-            # T.CenterCrop(size=[dimensions, dimensions]),
-            T.ToTensor(),  # Convert a PIL Image or ndarray to tensor and scale the values 0->255 to 0.0->1.0
-            T.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)),  # output[channel] = (input[channel] - mean[channel]) / std[channel] (this is the mapping for ImageNet RGB)
-        ]),
-        img_load="full", # "bbox_mask",
-        col_path="path",
-        col_label="identity",
-        load_label=True
-    )
+    images_root = os.path.join(config[f"{ptr}.root"], "images")
+    dataset = load_dataset(config, ptr, dimensions)
+    fraction = config.as_float(f"{ptr}.validation-fraction") if config.exists(f"{ptr}.validation-fraction") else 0.0
+    held = holdout([os.path.relpath(o, images_root) for o in dataset.metadata["path"]], dataset.labels_string, fraction)
+    print(f"Holding out {int(held.sum())} of {len(held)} images for validation.")
     backbone = timm.create_model(config[f"{ptr}.backbone"], num_classes=0, pretrained=True)
     with torch.no_grad():
         dummy_input = torch.randn(1, 3, dimensions, dimensions)
@@ -146,31 +223,147 @@ for ptr in sets:
         raise SyntaxError("Unsupported optimizer")
     min_lr = optimizer.defaults.get("lr") * 1e-3
     scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=100, eta_min=min_lr)
-    trainer = BasicTrainer(
-        dataset=dataset,
+    # every epoch is checkpointed to resume.pth (with the optimizer, scheduler and RNG states) and timed in
+    # epochs.json, so an interrupted run carries on from its last complete epoch
+    resume = os.path.join(outpath, "resume.pth")
+    timings = os.path.join(outpath, "epochs.json")
+    epoch_log: list[dict] = []
+    if os.path.exists(resume) and os.path.exists(timings):
+        with open(timings, "r") as file:
+            epoch_log = json.load(file)
+    epoch_start = time.perf_counter()
+
+    def on_epoch(trainer: BasicTrainer, epoch_data: dict):
+        nonlocal epoch_start
+        epoch_log.append({
+            "seconds": round(time.perf_counter() - epoch_start, 3),
+            "images_per_second": round(epoch_data.get("images_per_second", 0.0), 1),
+            "peak_memory_mb": round(epoch_data.get("peak_memory_mb", 0.0), 1)
+        })
+        trainer.save(outpath, file_name="resume.pth")
+        with open(timings, "w") as file:
+            json.dump(epoch_log, file, indent=2)
+        print(f"Epoch {trainer.epoch}/{epochs} took {epoch_log[-1]['seconds']:.1f}s, "
+              f"{epoch_log[-1]['images_per_second']:.1f} images/s, {epoch_log[-1]['peak_memory_mb']:.0f}MB peak GPU memory")
+        epoch_start = time.perf_counter()
+
+    # "amp" (with "amp-dtype" float16 or bfloat16) and "gradient-checkpointing" cut the memory per image, so
+    # trainer-batch-size can go up and accumulation-steps down; "channels-last" suits the tensor core kernels
+    if config.exists(f"{ptr}.gradient-checkpointing") and config.as_bool(f"{ptr}.gradient-checkpointing"):
+        backbone.set_grad_checkpointing(True)
+    trainer = AmpTrainer(
+        dataset=Subset(dataset, np.flatnonzero(~held).tolist()) if held.any() else dataset,
         model=backbone,
         objective=objective,
         optimizer=optimizer,
         scheduler=scheduler,
         batch_size=config.as_int(f"{ptr}.trainer-batch-size"),
-        accumulation_steps=8,
+        accumulation_steps=config.as_int(f"{ptr}.accumulation-steps") if config.exists(f"{ptr}.accumulation-steps") else 8,
         num_workers=config.as_int(f"{ptr}.trainer-workers"),
-        epochs=config.as_int(f"{ptr}.trainer-epochs"),
+        epochs=epochs,
         device=device,
+        epoch_callback=on_epoch,
+        amp=config.exists(f"{ptr}.amp") and config.as_bool(f"{ptr}.amp"),
+        amp_dtype=config[f"{ptr}.amp-dtype"] if config.exists(f"{ptr}.amp-dtype") else "float16",
+        channels_last=config.exists(f"{ptr}.channels-last") and config.as_bool(f"{ptr}.channels-last")
     )
-    print(f"Training {config.as_int(f"{ptr}.trainer-epochs")} epochs...")
-    trainer.train()
-    trainer.save(outpath)
+    checkpoint = os.path.join(outpath, "checkpoint.pth")
+    if config.exists(f"{ptr}.gallery-only") and config.as_bool(f"{ptr}.gallery-only"):
+        # images were added: keep the trained model, only the gallery is rebuilt
+        backbone.load_state_dict(torch.load(checkpoint, weights_only=False, map_location=torch.device(device))['model'])
+    else:
+        if os.path.exists(resume):
+            trainer.load(resume)
+            # BasicTrainer.train() runs trainer.epochs more epochs
+            trainer.epochs = epochs - trainer.epoch
+            print(f"Resuming from epoch {trainer.epoch}")
+        print(f"Training {trainer.epochs} epochs...")
+        epoch_start = time.perf_counter()
+        if trainer.epochs > 0:
+            trainer.train()
+        trainer.save(outpath)
+        if os.path.exists(resume):
+            os.remove(resume)
     extractor = DeepFeatures(backbone,
                              device=device,
                              batch_size=config.as_int(f"{ptr}.features-batch-size"),
                              num_workers=config.as_int(f"{ptr}.features-workers")
                              )
-    print("Extracting features...")
-    features = extractor(dataset)
-    features.save(os.path.join(outpath, f"similarity.pkl"))
+    # embeddings are cached by image content for this backbone, checkpoint and transform, so only images
+    # not seen by this model are pushed through it
+    cache = EmbeddingCache(
+        config[f"{ptr}.embedding-cache"] if config.exists(f"{ptr}.embedding-cache") else os.path.join(outpath, "embeddings"),
+        EmbeddingCache.model_key(config[f"{ptr}.backbone"], checkpoint, dimensions, repr(dataset.transform)),
+        {"backbone": config[f"{ptr}.backbone"], "checkpoint": checkpoint, "dimensions": dimensions}
+    )
+    images = [image_hash(os.path.join(images_root, o)) for o in dataset.metadata["path"]]
+    found, cached = cache.get(images)
+    missing = np.flatnonzero(~found)
+    print(f"Extracting features for {len(missing)} of {len(images)} images...")
+    if len(missing) > 0:
+        subset = WildlifeDataset(
+            metadata=dataset.metadata.iloc[missing].reset_index(drop=True),
+            root=images_root,
+            transform=dataset.transform,
+            img_load="full",
+            col_path="path",
+            col_label="identity",
+            load_label=True
+        )
+        cache.put([images[i] for i in missing], extractor(subset).features)
+    _, features = cache.get(images)
+    save_gallery(outpath, features, list(dataset.labels_string))
+    results = {
+        "epochs": len(epoch_log),
+        "seconds_per_epoch": round(float(np.mean([o["seconds"] for o in epoch_log])), 3) if len(epoch_log) > 0 else "",
+        "images_per_second": round(float(np.mean([o["images_per_second"] for o in epoch_log])), 1) if len(epoch_log) > 0 else "",
+        "peak_memory_mb": max([o["peak_memory_mb"] for o in epoch_log], default=""),
+        "images": len(images)
+    }
+    if not held.any():
+        results["top1_leave_one_out"] = round(leave_one_out_top1(features, dataset.labels_string), 4)
+        return results
+    labels = np.asarray(dataset.labels_string)
+    metrics = evaluate(features[held], labels[held], features[~held], labels[~held])
+    ms = embedding_ms(backbone, dimensions, device, config.as_int(f"{ptr}.features-batch-size"))
+    confusion, names = metrics.pop("confusion"), metrics.pop("labels")
+    metrics.update({"ms_per_image": round(ms, 3), "top1_per_ms": round(metrics["top1"] / ms, 5)})
+    with open(os.path.join(outpath, "metrics.json"), "w") as file:
+        json.dump(metrics, file, indent=2)
+    with open(os.path.join(outpath, "confusion.csv"), "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["identity"] + names)
+        writer.writerows([name] + row for name, row in zip(names, confusion))
+    print(f"Validation: top-1 {metrics['top1']:.3f}, top-5 {metrics['top5']:.3f}, mAP {metrics['mAP']:.3f}, {ms:.1f}ms per image")
+    return {**results, **{k: round(v, 4) if isinstance(v, float) else v for k, v in metrics.items()}}
+
+
+def embedding_ms(backbone, dimensions: int, device: str, batch_size: int, iterations: int = 5) -> float:
+    """
+    Inference cost of the backbone (milliseconds per image at the feature extraction batch size)
+    """
+    backbone.eval()
+    batch = torch.randn(batch_size, 3, dimensions, dimensions, device=device)
+    with torch.inference_mode():
+        for _ in range(2):
+            backbone(batch)
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            backbone(batch)
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+    return (time.perf_counter() - start) * 1e3 / (iterations * batch_size)
+
 
-####
-# TODO: add validation pass
+if __name__ == "__main__":
+    # every config in "configs" is queued on the devices in "devices" (one worker per device, e.g.
+    # "cuda:0,cuda:1"; without it each config runs on its own device, one at a time). Finished configs
+    # are skipped when this is run again, see results/sweep.json and results/comparison.csv
+    config: Config = Config(CONFIG_FILENAME)
+    sets = [o.strip() for o in config["configs"].split(",")]
+    devices = [o.strip() for o in config["devices"].split(",")] if config.exists("devices") else [""]
+    Sweep(OUTPUT, sets, devices, train).start()
 
     
@@ -1,4 +1,5 @@
 from welfareobs.handlers.abstract_handler import AbstractHandler
+import threading
 import time
 
 
@@ -7,6 +8,7 @@ class StubHandler(AbstractHandler):
         super().__init__(name, inputs, param)
         self.__state = 1
         self.has_run = False
+        self.runs = 0
         self.has_setup = False
         self.has_torndown = False
 
@@ -17,6 +19,7 @@ class StubHandler(AbstractHandler):
         # print(f"running {self.name} with params {self.param}")
         time.sleep(0.5)
         self.has_run = True
+        self.runs += 1
 
     def teardown(self):
         self.has_torndown = True
@@ -29,3 +32,29 @@ class StubHandler(AbstractHandler):
     def get_output(self) -> any:
         # print(f"Dumping state {self.__state}")
         return self.__state
+
+
+class SlowSetupHandler(StubHandler):
+    # set by a test: every setup waits here, so it only passes when the setups run at the same time
+    barrier: threading.Barrier|None = None
+
+    def __init__(self, name: str, inputs: [str], param: str):
+        super().__init__(name, inputs, param)
+        self.warmed_up = False
+        self.overlapped = False
+        self.setup_thread: int|None = None
+
+    def setup(self):
+        self.setup_thread = threading.get_ident()
+        if SlowSetupHandler.barrier is not None:
+            try:
+                SlowSetupHandler.barrier.wait()
+                self.overlapped = True
+            except threading.BrokenBarrierError:
+                pass
+        else:
+            time.sleep(0.3)
+        super().setup()
+
+    def warmup(self):
+        self.warmed_up = self.has_setup
@@ -0,0 +1,58 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+HAS_TRAINER = all(importlib.util.find_spec(o) is not None for o in ["torch", "wildlife_tools"])
+
+
+@unittest.skipUnless(HAS_TRAINER, "torch and wildlife_tools are not installed")
+class TestAmpTrainer(unittest.TestCase):
+    def __trainer(self, **kwargs):
+        import torch
+        from torch import nn
+        from torch.utils.data import TensorDataset
+        from welfareobs.detectron.amp_trainer import AmpTrainer
+        torch.manual_seed(0)
+        model = nn.Sequential(nn.Linear(8, 16), nn.ReLU(), nn.Linear(16, 3))
+        self.dataset = TensorDataset(torch.randn(32, 8), torch.randint(0, 3, (32,)))
+        return AmpTrainer(
+            dataset=self.dataset,
+            model=model,
+            objective=nn.CrossEntropyLoss(),
+            optimizer=torch.optim.SGD(model.parameters(), lr=0.1),
+            epochs=1,
+            device="cpu",
+            batch_size=8,
+            num_workers=0,
+            **kwargs
+        )
+
+    def test_bfloat16_cpu(self):
+        from torch.utils.data import DataLoader
+        trainer = self.__trainer(amp=True, amp_dtype="bfloat16")
+        # bfloat16 needs no loss scaling
+        self.assertFalse(trainer.scaler.is_enabled())
+        data = trainer.train_epoch(DataLoader(self.dataset, batch_size=8))
+        self.assertTrue(data["train_loss_epoch_avg"] == data["train_loss_epoch_avg"])  # not NaN
+        self.assertGreater(data["images_per_second"], 0.0)
+        self.assertEqual(data["peak_memory_mb"], 0.0)
+
+    def test_amp_dtype(self):
+        with self.assertRaises(ValueError):
+            self.__trainer(amp=True, amp_dtype="float32")
+
+    def test_scaler_checkpoint(self):
+        import torch
+        trainer = self.__trainer(amp=True)
+        trainer.scaler = torch.amp.GradScaler("cpu", init_scale=1024.0)
+        with tempfile.TemporaryDirectory() as root:
+            trainer.save(root, file_name="resume.pth")
+            resumed = self.__trainer(amp=True)
+            resumed.scaler = torch.amp.GradScaler("cpu")
+            resumed.load(os.path.join(root, "resume.pth"))
+        self.assertEqual(resumed.scaler.get_scale(), 1024.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
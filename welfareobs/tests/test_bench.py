@@ -0,0 +1,29 @@
+import json
+import os
+import tempfile
+import unittest
+
+from welfareobs.bench.scenario import run_scenario, compare
+
+
+class TestBench(unittest.TestCase):
+    def test_run_scenario(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "tiny.json")
+            with open(filename, "w") as file:
+                json.dump({"name": "tiny", "cameras": "2", "individuals": "2", "width": "128", "height": "128",
+                           "iterations": "5", "warmup": "2"}, file)
+            result = run_scenario(filename)
+        self.assertEqual(result["scenario"], "tiny")
+        self.assertEqual(result["iterations"], 5)
+        self.assertGreater(result["throughput_fps"], 0)
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+    def test_compare(self):
+        baseline = {"results": {"a": {"throughput_fps": 100, "p50_ms": 10, "p99_ms": 20, "peak_rss_mb": 300}}}
+        faster = {"results": {"a": {"throughput_fps": 150, "p50_ms": 6, "p99_ms": 12, "peak_rss_mb": 300}}}
+        slower = {"results": {"a": {"throughput_fps": 80, "p50_ms": 10.5, "p99_ms": 30, "peak_rss_mb": 300}}}
+        self.assertEqual(compare(faster, baseline), [])
+        regressions = compare(slower, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("a: throughput_fps"))
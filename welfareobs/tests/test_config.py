@@ -56,4 +56,7 @@ class TestConfig(unittest.TestCase):
     def test_validate_instance(self):
         config: Config = Config("tests/test_config.json")
         self.assertEqual(config.validate_instance("camera-1.handler"), True)
-        self.assertEqual(config.validate_instance("camera-1.config"), False)
+        # logged, not printed
+        with self.assertLogs("welfareobs.utils.config", level="DEBUG") as logs:
+            self.assertEqual(config.validate_instance("camera-1.config"), False)
+        self.assertIn("camera-1.config", logs.output[0])
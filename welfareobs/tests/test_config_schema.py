@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+
+from welfareobs.bench.synthetic import StubDetectionConfig
+from welfareobs.utils.config import Config
+from welfareobs.utils.config_schema import ConfigError, Settings, load_pipeline, parse, parse_file
+
+
+class TestConfigSchema(unittest.TestCase):
+    def setUp(self):
+        self.__root = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.__root.cleanup()
+
+    def __write(self, name: str, src: dict) -> str:
+        filename = os.path.join(self.__root.name, name)
+        with open(filename, "w") as file:
+            json.dump(src, file)
+        return filename
+
+    def test_parse(self):
+        errors = []
+        settings = parse(Settings, {
+            "configuration-name": "test",
+            "performance-history-size": "100",
+            "threadpool-size": "0",
+            "performance-exact-statistics": "False",
+            "run-count": "",
+            "memory-budget-mb": "512"
+        }, "settings", errors)
+        self.assertEqual(errors, [])
+        self.assertEqual(settings.performance_history_size, 100)
+        self.assertFalse(settings.performance_exact_statistics)
+        self.assertIsNone(settings.run_count)
+        self.assertEqual(settings.memory_budget_mb, 512.0)
+        self.assertEqual(settings.trace_capacity, 100000)
+
+    def test_parse_file(self):
+        cnf = parse_file(StubDetectionConfig, self.__write("stub.json", {"width": "64", "height": "48", "individuals": "2"}))
+        self.assertEqual((cnf.width, cnf.height, cnf.individuals, cnf.seed), (64, 48, 2, 0))
+        with self.assertRaises(ConfigError) as ctx:
+            parse_file(StubDetectionConfig, self.__write("bad.json", {"width": "wide", "colour": "red"}))
+        self.assertEqual(len(ctx.exception.errors), 4)  # invalid width, missing height/individuals, unknown colour
+
+    def test_load_pipeline_reports_every_error(self):
+        camera = self.__write("camera.json", {"width": "64", "height": "48"})
+        pipeline = self.__write("pipeline.json", {
+            "settings": {"configuration-name": "test", "threadpool-size": "0", "performance-histroy-size": "10"},
+            "pipeline": ["step-1", "step-2"],
+            "step-1": ["camera"],
+            "step-2": ["detection", "missing"],
+            "camera": {"handler": "welfareobs.bench.synthetic.SyntheticCameraHandler", "config": camera},
+            "detection": {
+                "handler": "welfareobs.bench.synthetic.StubDetectionHandler",
+                "input": ["camera", "kamera"],
+                "config": camera
+            }
+        })
+        with self.assertRaises(ConfigError) as ctx:
+            load_pipeline(Config(pipeline))
+        errors = "\n".join(ctx.exception.errors)
+        self.assertIn("missing `performance-history-size`", errors)
+        self.assertIn("unknown key `performance-histroy-size`", errors)
+        self.assertIn("`missing` element must exist", errors)
+        self.assertIn("missing `individuals`", errors)
+        self.assertIn("input `kamera` is not a task", errors)
+        self.assertEqual(len(ctx.exception.errors), 5)
+
+    def test_load_pipeline(self):
+        camera = self.__write("camera.json", {"width": "64", "height": "48", "seed": "3"})
+        pipeline = load_pipeline(Config(self.__write("pipeline.json", {
+            "settings": {"configuration-name": "test", "threadpool-size": "0", "performance-history-size": "10"},
+            "pipeline": ["step-1"],
+            "step-1": ["camera"],
+            "camera": {"handler": "welfareobs.bench.synthetic.SyntheticCameraHandler", "config": camera}
+        })))
+        self.assertEqual(pipeline.steps, [("step-1", ["camera"])])
+        self.assertEqual(pipeline.tasks["camera"].config.seed, 3)
+        self.assertEqual(pipeline.settings.configuration_name, "test")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from welfareobs.handlers.detection_replay import ReplayDetectionHandler
+from welfareobs.models.frame import Frame
+from welfareobs.models.individual import Individual
+from welfareobs.utils.config_schema import ConfigError
+from welfareobs.utils.detection_cache import DetectionCache, DetectionConfig
+
+
+def individual(identity: str) -> Individual:
+    return Individual("recorded-cam", 0.8, identity, "giraffe", 1.0, 2.0, 3.0, 4.0,
+                      np.ones((4, 4), dtype=bool), datetime(2020, 1, 1))
+
+
+class TestDetectionReplay(unittest.TestCase):
+    def setUp(self):
+        self.__directory = tempfile.TemporaryDirectory()
+        root = self.__directory.name
+        self.__model = os.path.join(root, "model")
+        os.makedirs(self.__model)
+        for name, content in [("segmentation.pkl", b"rcnn"), ("checkpoint.pth", b"reid"), ("similarity.npy", b"1")]:
+            with open(os.path.join(self.__model, name), "wb") as file:
+                file.write(content)
+        self.__cnf = self.__config(self.__model)
+
+    def tearDown(self):
+        self.__directory.cleanup()
+
+    def __config(self, model: str) -> DetectionConfig:
+        return DetectionConfig(384, model, "hf-hub:BVRA/wildlife-mega-L-384", os.path.join(model, "segmentation.pkl"),
+                               pytorch_device="cpu", record_cache=os.path.join(self.__directory.name, "cache"))
+
+    def __record(self, frames: dict[str, list[Individual]]):
+        cnf = self.__cnf
+        cache = DetectionCache(cnf.record_cache, DetectionCache.model_hash(cnf, DetectionCache.memo(cnf)), writable=True)
+        for filename, individuals in frames.items():
+            cache.put(Frame(None, "recorded-cam", datetime(2020, 1, 1), filename), individuals)
+        cache.close()
+
+    def __replay(self, cnf: DetectionConfig) -> ReplayDetectionHandler:
+        handler = ReplayDetectionHandler("detection", ["camera"], "unused.json")
+        handler.configure(cnf)
+        handler.setup()
+        return handler
+
+    def test_record_replay(self):
+        self.__record({"a.jpg": [individual("g1"), individual("g2")], "b.jpg": []})
+        handler = self.__replay(self.__cnf)
+        now = datetime(2025, 6, 1, 12, 0, 0)
+        handler.set_inputs([Frame(None, "cam-1", now, "a.jpg"), Frame(None, "cam-2", now, "b.jpg")])
+        handler.run()
+        output = handler.get_output()
+        self.assertEqual([o.identity for o in output], ["g1", "g2"])
+        # re-stamped with the replayed frame's camera and time
+        self.assertEqual({(o.camera_name, o.timestamp) for o in output}, {("cam-1", now)})
+        np.testing.assert_array_equal(output[0].mask, np.ones((4, 4), dtype=bool))
+        self.assertEqual(handler.misses, 0)
+        # a frame that was never recorded
+        handler.set_inputs([Frame(None, "cam-1", now, "c.jpg")])
+        with self.assertLogs("welfareobs.handlers.detection_replay", level="WARNING"):
+            handler.run()
+            self.assertEqual(handler.get_output(), [])
+            self.assertEqual(handler.misses, 1)
+            handler.teardown()
+
+    def test_live_frames_key(self):
+        # frames without a source file are keyed by camera and timestamp
+        frame = Frame(None, "cam-1", datetime(2025, 1, 1), None)
+        self.assertEqual(DetectionCache.key(frame), f"cam-1@{datetime(2025, 1, 1)}")
+
+    def test_model_hash(self):
+        cnf = self.__cnf
+        key = DetectionCache.model_hash(cnf)
+        # touching or copying the model keeps the recording
+        os.utime(os.path.join(self.__model, "checkpoint.pth"), ns=(1, 1))
+        self.assertEqual(DetectionCache.model_hash(cnf), key)
+        copy = os.path.join(self.__directory.name, "copy")
+        shutil.copytree(self.__model, copy)
+        self.assertEqual(DetectionCache.model_hash(self.__config(copy)), key)
+        # a new gallery changes the detections, so it records into a fresh cache
+        with open(os.path.join(self.__model, "similarity.npy"), "wb") as file:
+            file.write(b"2")
+        self.assertNotEqual(DetectionCache.model_hash(cnf), key)
+
+    def test_copied_recording_replays(self):
+        self.__record({"a.jpg": [individual("g1")]})
+        copy = os.path.join(self.__directory.name, "copy")
+        shutil.copytree(self.__model, copy)
+        handler = self.__replay(self.__config(copy))
+        handler.set_inputs([Frame(None, "cam-1", datetime(2025, 1, 1), "a.jpg")])
+        handler.run()
+        self.assertEqual([o.identity for o in handler.get_output()], ["g1"])
+
+    def test_missing_record_cache(self):
+        handler = ReplayDetectionHandler("detection", ["camera"], "unused.json")
+        handler.configure(DetectionConfig(384, self.__model, "b", "s"))
+        with self.assertRaises(ConfigError):
+            handler.setup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from welfareobs.utils.gallery import EmbeddingCache, Gallery, gallery_filename, image_hash, load_gallery, save_gallery
+
+
+class TestGallery(unittest.TestCase):
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.assertTrue(gallery_filename(root).endswith("similarity.pkl"))
+            features = np.random.default_rng(1).normal(size=(5, 8)).astype(np.float32)
+            save_gallery(root, features, ["a", "b", "a", "c", "b"])
+            self.assertEqual(gallery_filename(root), os.path.join(root, "similarity.npy"))
+            gallery = load_gallery(root)
+            self.assertIsInstance(gallery, Gallery)
+            self.assertEqual(len(gallery), 5)
+            self.assertEqual(list(gallery.labels_string), ["a", "b", "a", "c", "b"])
+            self.assertIsInstance(gallery.array, np.memmap)
+            self.assertEqual(gallery.array.dtype, np.float16)
+            self.assertEqual(gallery.features.dtype, np.float32)
+            # built on load (setup or the hot reload thread), not on the first forward
+            self.assertNotIsInstance(gallery.features, np.memmap)
+            self.assertIn("features", vars(gallery))
+            np.testing.assert_allclose(gallery.features, features, atol=1e-2)
+            with self.assertRaises(ValueError):
+                save_gallery(root, features, ["a"])
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def test_incremental(self):
+        with tempfile.TemporaryDirectory() as root:
+            key = EmbeddingCache.model_key("swin_large_patch4_window12_384", None, 384)
+            self.assertNotEqual(key, EmbeddingCache.model_key("swin_large_patch4_window12_384", None, 224))
+            cache = EmbeddingCache(root, key)
+            found, embeddings = cache.get(["x", "y"])
+            self.assertFalse(found.any())
+            self.assertEqual(len(embeddings), 0)
+            cache.put(["x", "y"], np.array([[1, 2], [3, 4]]))
+            # reopened: the new image is the only miss
+            cache = EmbeddingCache(root, key)
+            found, embeddings = cache.get(["y", "z", "x"])
+            self.assertEqual(list(found), [True, False, True])
+            np.testing.assert_array_equal(embeddings, [[3, 4], [1, 2]])
+            cache.put(["z"], np.array([[5, 6]]))
+            found, embeddings = cache.get(["x", "y", "z"])
+            self.assertTrue(found.all())
+            np.testing.assert_array_equal(embeddings, [[1, 2], [3, 4], [5, 6]])
+            with self.assertRaises(ValueError):
+                cache.put(["w"], np.zeros((1, 3)))
+
+    def test_checkpoint_key(self):
+        with tempfile.TemporaryDirectory() as root:
+            checkpoint = os.path.join(root, "checkpoint.pth")
+            with open(checkpoint, "wb") as file:
+                file.write(b"weights")
+            before = EmbeddingCache.model_key("b", checkpoint, 384)
+            self.assertEqual(image_hash(checkpoint), image_hash(checkpoint))
+            with open(checkpoint, "wb") as file:
+                file.write(b"retrained")
+            self.assertNotEqual(EmbeddingCache.model_key("b", checkpoint, 384), before)
+
+    def test_truncated(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = EmbeddingCache(root, "k")
+            cache.put(["x", "y"], np.ones((2, 4)))
+            filename = os.path.join(root, "k", "embeddings.f16")
+            with open(filename, "r+b") as file:
+                file.truncate(os.path.getsize(filename) - 2)
+            cache = EmbeddingCache(root, "k")
+            self.assertEqual(list(cache.get(["x", "y"])[0]), [True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
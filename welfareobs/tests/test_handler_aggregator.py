@@ -1,6 +1,52 @@
+import math
 import unittest
+from datetime import datetime
+
+import numpy as np
+
+from welfareobs.handlers.aggregator import AggregatorHandler
+from welfareobs.models.intersect import Intersect
 
 
 class TestHandlerAggregator(unittest.TestCase):
-    pass
+    def setUp(self):
+        self.handler = AggregatorHandler("aggregator", [], "unused.json")
+        self.now = datetime.now()
+
+    def test_fuse(self):
+        identities, locations, uncertainties = self.handler.fuse([
+            # identity 1 from two cameras: effective weights 1, 1 and 2 x 0.5
+            Intersect(1, [(0.0, 0.0), (2.0, 0.0)], self.now, 1.0, np.array([1.0, 1.0])),
+            Intersect(1, [(4.0, 0.0)], self.now, 0.5, np.array([2.0])),
+            # NaN and zero weight points are dropped, no weights means 1 per point
+            Intersect(2, [(np.nan, np.nan), (1.0, 1.0)], self.now, 0.8),
+            Intersect(2, [(9.0, 9.0)], self.now, 1.0, np.array([0.0])),
+            Intersect(3, [(np.nan, np.nan)], self.now)
+        ])
+        self.assertEqual(identities, [1, 2, 3])
+        np.testing.assert_allclose(locations[0], [2.0, 0.0])
+        # variance 8/3 over an effective sample size of 3
+        self.assertAlmostEqual(uncertainties[0], math.sqrt(8.0 / 9.0))
+        np.testing.assert_allclose(locations[1], [1.0, 1.0])
+        self.assertEqual(uncertainties[1], 0.0)
+        self.assertTrue(np.isnan(locations[2]).all())
+        self.assertTrue(np.isnan(uncertainties[2]))
+
+    def test_fuse_weighted(self):
+        # a point with three times the weight pulls the mean three quarters of the way
+        identities, locations, uncertainties = self.handler.fuse([
+            Intersect("a", [(0.0, 0.0), (4.0, 8.0)], self.now, 1.0, np.array([1.0, 3.0]))
+        ])
+        np.testing.assert_allclose(locations[0], [3.0, 6.0])
+        # variance (1 x 45 + 3 x 5) / 4 = 15, effective n = 16 / 10
+        self.assertAlmostEqual(uncertainties[0], math.sqrt(15.0 / 1.6))
+
+    def test_fuse_empty(self):
+        identities, locations, uncertainties = self.handler.fuse([])
+        self.assertEqual(identities, [])
+        self.assertEqual(locations.shape, (0, 2))
+        self.assertEqual(uncertainties.shape, (0,))
+
 
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from welfareobs.handlers.filesystem import RotatingIntersectConfig, RotatingIntersectHandler, SaveIntersectHandler
+from welfareobs.models.intersect import Intersect
+
+
+def intersects(second: int) -> list[Intersect]:
+    timestamp = datetime(2025, 3, 10, 10, 0, second)
+    return [
+        Intersect(1, [(1.0, 2.0), (3.0, 4.0)], timestamp, 0.9, location=(2.0, 3.0), uncertainty=0.5),
+        Intersect(2, [(5.0, 6.0)], timestamp, 0.7)
+    ]
+
+
+def lines(filename: str) -> list[str]:
+    with open(filename) as file:
+        return file.read().splitlines()
+
+
+class TestSaveIntersectHandler(unittest.TestCase):
+    def test_buffered(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "out.csv")
+            clock = [0.0]
+            with mock.patch("welfareobs.utils.rotating_writer.time", SimpleNamespace(monotonic=lambda: clock[0])):
+                handler = SaveIntersectHandler("save", ["aggregator"], filename)
+                handler.setup()
+                # 2 rows a run: 98 rows are buffered, the 100th row flushes
+                for second in range(49):
+                    handler.set_inputs([intersects(second)])
+                    handler.run()
+                self.assertEqual(lines(filename), ["sample,identity,intersect,timestamp"])
+                handler.set_inputs([intersects(49)])
+                handler.run()
+                self.assertEqual(len(lines(filename)), 101)
+                # then flushed when 10 seconds have passed
+                handler.set_inputs([intersects(50)])
+                handler.run()
+                self.assertEqual(len(lines(filename)), 101)
+                clock[0] = 10.0
+                handler.set_inputs([[]])
+                handler.run()
+                self.assertEqual(len(lines(filename)), 103)
+                # and on teardown
+                handler.set_inputs([intersects(51)])
+                handler.run()
+                self.assertEqual(len(lines(filename)), 103)
+                handler.teardown()
+            rows = lines(filename)
+            self.assertEqual(len(rows), 105)
+            self.assertEqual(rows[1], "1,1,( 1 | 2 ) ( 3 | 4 ),2025-03-10 10:00:00")
+            self.assertEqual(rows[-1], "53,2,( 5 | 6 ),2025-03-10 10:00:51")
+
+
+class TestRotatingIntersectHandler(unittest.TestCase):
+    def __handler(self, cnf: RotatingIntersectConfig) -> RotatingIntersectHandler:
+        handler = RotatingIntersectHandler("rotating", ["aggregator"], "unused.json")
+        handler.configure(cnf)
+        handler.setup()
+        return handler
+
+    def test_csv(self):
+        with tempfile.TemporaryDirectory() as root:
+            handler = self.__handler(RotatingIntersectConfig(os.path.join(root, "out.csv"), rotate="hour"))
+            handler.set_inputs([intersects(0)])
+            handler.run()
+            handler.teardown()
+            rows = lines(os.path.join(root, "out-2025031010.csv"))
+            self.assertEqual(rows[0], ",".join(RotatingIntersectHandler.COLUMNS))
+            self.assertEqual(rows[1], "1,1,2025-03-10 10:00:00,1 3,2 4,2.0,3.0,0.5,0.9")
+            self.assertEqual(rows[2], "1,2,2025-03-10 10:00:00,5,6,,,,0.7")
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        with tempfile.TemporaryDirectory() as root:
+            handler = self.__handler(RotatingIntersectConfig(os.path.join(root, "out.parquet"), format="parquet",
+                                                             rotate="day", flush_rows=3))
+            for second in range(3):
+                handler.set_inputs([intersects(second)])
+                handler.run()
+            handler.teardown()
+            parquet = pq.ParquetFile(os.path.join(root, "out-20250310.parquet"))
+            self.assertEqual(parquet.metadata.num_row_groups, 2)
+            table = parquet.read()
+            self.assertTrue(table.schema.equals(RotatingIntersectHandler.schema()))
+            self.assertEqual(table.num_rows, 6)
+            self.assertEqual(table.column("sample").to_pylist(), [1, 1, 2, 2, 3, 3])
+            self.assertEqual(table.column("intersect_x").to_pylist()[0], [1.0, 3.0])
+            self.assertEqual(table.column("intersect_z").to_pylist()[0], [2.0, 4.0])
+            self.assertEqual(table.column("location_x").to_pylist()[:2], [2.0, None])
+            np.testing.assert_allclose(table.column("confidence").to_pylist()[:2], [0.9, 0.7], rtol=1e-6)
+            self.assertEqual(table.column("timestamp").to_pylist()[5], datetime(2025, 3, 10, 10, 0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
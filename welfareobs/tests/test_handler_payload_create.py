@@ -1,5 +1,117 @@
+import os
+import tempfile
 import unittest
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+from welfareobs.handlers.payload_create import PayloadCreateHandler
+from welfareobs.models.frame import Frame
+from welfareobs.models.individual import Individual
+from welfareobs.utils.payload_file import INDEX_ENTRY, PayloadReader, PayloadWriter, rebuild_index
+
+
+def individual(identity: str, seed: int) -> Individual:
+    return Individual(
+        camera_name="cam-1",
+        confidence=0.9,
+        identity=identity,
+        species="giraffe",
+        x_min=1.0,
+        y_min=2.0,
+        x_max=30.0,
+        y_max=40.0,
+        mask=np.random.default_rng(seed).random((48, 64)) > 0.5,
+        timestamp=datetime(2025, 1, 2, 3, 4, 5)
+    )
 
 
 class TestHandlerPayloadCreate(unittest.TestCase):
-    pass
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "payload.bin")
+            image = Image.fromarray(np.arange(12 * 16 * 3, dtype=np.uint8).reshape(12, 16, 3))
+            frame = Frame(image, "cam-1", datetime(2025, 1, 2, 3, 4, 5), "frame-1.jpg")
+            handler = PayloadCreateHandler("payload", ["a", "b"], filename)
+            handler.setup()
+            handler.set_inputs([frame, [individual("g1", 1), individual("g2", 2)]])
+            handler.run()
+            handler.set_inputs([{"not": "a dataclass"}, (1, 2.5, None)])
+            handler.run()
+            handler.teardown()
+
+            reader = PayloadReader(filename)
+            self.assertEqual(len(reader), 2)
+            first, individuals = reader[0]
+            self.assertIsInstance(first, Frame)
+            self.assertEqual((first.camera_name, first.timestamp, first.filename), ("cam-1", frame.timestamp, "frame-1.jpg"))
+            self.assertEqual(first.image.mode, "RGB")
+            np.testing.assert_array_equal(np.asarray(first.image), np.asarray(image))
+            self.assertEqual([o.identity for o in individuals], ["g1", "g2"])
+            np.testing.assert_array_equal(individuals[1].mask, individual("g2", 2).mask)
+            self.assertEqual(individuals[1].mask.dtype, bool)
+            # masks are read only views on the map
+            self.assertFalse(individuals[0].mask.flags.writeable)
+            # pickle fallback
+            self.assertEqual(reader[-1], [{"not": "a dataclass"}, (1, 2.5, None)])
+            self.assertEqual(reader[-2][0].camera_name, "cam-1")
+            with self.assertRaises(IndexError):
+                reader[2]
+            with self.assertRaises(IndexError):
+                reader[-3]
+
+    def test_truncated_on_setup(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "payload.bin")
+            for _ in range(2):
+                handler = PayloadCreateHandler("payload", ["a"], filename)
+                handler.setup()
+                handler.set_inputs([1])
+                handler.run()
+                handler.teardown()
+            self.assertEqual(len(PayloadReader(filename)), 1)
+
+    def test_append_and_rebuild_index(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "payload.bin")
+            writer = PayloadWriter(filename)
+            for i in range(3):
+                writer.write([individual(f"g{i}", i)])
+            writer.close()
+            writer = PayloadWriter(filename, append=True)
+            self.assertEqual(writer.write("fourth"), 3)
+            writer.close()
+            self.assertEqual(PayloadReader(filename)[3], "fourth")
+
+            # index lost after the second record, then a torn record at the end of the data
+            with open(f"{filename}.idx", "r+b") as file:
+                file.truncate(2 * INDEX_ENTRY.size + 5)
+            with open(filename, "ab") as file:
+                file.write(b"\x10\x00\x00")
+            size = os.path.getsize(filename)
+            writer = PayloadWriter(filename, append=True)
+            self.assertEqual(len(writer), 4)
+            self.assertEqual(os.path.getsize(filename), size - 3)
+            self.assertEqual(writer.write("fifth"), 4)
+            writer.close()
+            reader = PayloadReader(filename)
+            self.assertEqual([o[0].identity for o in [reader[i] for i in range(3)]], ["g0", "g1", "g2"])
+            self.assertEqual((reader[3], reader[4]), ("fourth", "fifth"))
+
+            # the data lost part of the last record but the index kept its entry
+            with open(f"{filename}.idx", "rb") as file:
+                file.seek(4 * INDEX_ENTRY.size)
+                base, length = INDEX_ENTRY.unpack(file.read(INDEX_ENTRY.size))
+            with open(filename, "r+b") as file:
+                file.truncate(base + 10)
+            self.assertEqual(rebuild_index(filename), 0)
+            self.assertEqual(os.path.getsize(f"{filename}.idx"), 4 * INDEX_ENTRY.size)
+            self.assertEqual(os.path.getsize(filename), base)
+            reader = PayloadReader(filename)
+            self.assertEqual(len(reader), 4)
+            self.assertEqual(reader[3], "fourth")
+
+
+if __name__ == '__main__':
+    unittest.main()
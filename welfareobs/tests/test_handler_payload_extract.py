@@ -1,5 +1,56 @@
+import os
+import pickle
+import tempfile
 import unittest
 
+from welfareobs.handlers.payload_extract import PayloadExtractHandler
+from welfareobs.utils.payload_file import PayloadWriter
+
 
 class TestHandlerPayloadExtract(unittest.TestCase):
-    pass
+    def test_wrap_around_and_seek(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "payload.bin")
+            writer = PayloadWriter(filename)
+            for i in range(3):
+                writer.write([i, f"record-{i}"])
+            writer.close()
+            handler = PayloadExtractHandler("extract", [], filename)
+            handler.setup()
+            output = []
+            for _ in range(5):
+                handler.run()
+                output.append(handler.get_output()[0])
+            self.assertEqual(output, [0, 1, 2, 0, 1])
+            handler.seek(2)
+            handler.run()
+            self.assertEqual(handler.get_output(), [2, "record-2"])
+            handler.run()
+            self.assertEqual(handler.get_output()[0], 0)
+            # setup starts from the first record again
+            handler.setup()
+            handler.run()
+            self.assertEqual(handler.get_output()[0], 0)
+            handler.teardown()
+
+    def test_missing_and_empty(self):
+        with tempfile.TemporaryDirectory() as root:
+            handler = PayloadExtractHandler("extract", [], os.path.join(root, "missing.bin"))
+            handler.setup()
+            handler.run()
+            self.assertIsNone(handler.get_output())
+
+    def test_legacy_pickle(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "legacy.pkl")
+            with open(filename, "wb") as file:
+                pickle.dump({"frames": [1, 2, 3]}, file)
+            handler = PayloadExtractHandler("extract", [], filename)
+            handler.setup()
+            for _ in range(2):
+                handler.run()
+                self.assertEqual(handler.get_output(), {"frames": [1, 2, 3]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import time
+import unittest
+
+from welfareobs.utils.handler_timing import HandlerTiming
+
+
+class TestHandlerTiming(unittest.TestCase):
+    def test_critical_path(self):
+        timing = HandlerTiming()
+        timing.register("step-1", ["camera-1", "camera-2"], parallel=True)
+        timing.register("step-2", ["detection"], parallel=False)
+        for _ in range(3):
+            timing.timed("camera-1", "run", time.sleep, 0.001)
+            timing.timed("camera-2", "run", time.sleep, 0.02)
+            self.assertEqual(timing.timed("camera-2", "get_output", lambda: 42), 42)
+            timing.timed("detection", "set_inputs", lambda o: None, [42])
+            timing.timed("detection", "run", time.sleep, 0.005)
+            timing.end_iteration()
+        report = timing.report()
+        self.assertEqual(report["iterations"], 3)
+        self.assertEqual(report["top"][0]["job"], "camera-2")
+        self.assertEqual(report["top"][0]["phase"], "run")
+        self.assertEqual(report["critical_path"]["jobs"]["camera-2"], 3)
+        self.assertEqual(report["critical_path"]["jobs"]["camera-1"], 0)
+        self.assertEqual([o["job"] for o in report["critical_path"]["worst"]["path"]],
+                         ["get_output/set_inputs", "camera-2", "detection"])
+        self.assertGreater(report["critical_path"]["mean_ms"], 25)
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tests.stub_handler import StubHandler
+from welfareobs.utils.gallery import Gallery, gallery_filenames, load_gallery, save_gallery
+from welfareobs.utils.hot_reload import HotReloader
+
+
+class ReloadingHandler(StubHandler):
+    def __init__(self, name: str, filename: str):
+        super().__init__(name, [], filename)
+        self.value = None
+
+    def reload_files(self) -> list[str]:
+        return [self.param]
+
+    def reload(self, filename: str) -> callable:
+        with open(filename, "r") as file:
+            value = file.read()
+        if value == "broken":
+            raise ValueError("unreadable")
+
+        def swap():
+            self.value = value
+        return swap
+
+
+class GalleryHandler(StubHandler):
+    # watches a ReID model root the way DetectionHandler does
+    def __init__(self, name: str, root: str):
+        super().__init__(name, [], root)
+        self.gallery = None
+
+    def reload_files(self) -> list[str]:
+        return gallery_filenames(self.param)
+
+    def reload(self, filename: str) -> callable:
+        gallery = load_gallery(os.path.dirname(filename))
+
+        def swap():
+            self.gallery = gallery
+        return swap
+
+
+class TestHotReload(unittest.TestCase):
+    def test_reload(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "gallery.txt")
+            with open(filename, "w") as file:
+                file.write("one")
+            handler = ReloadingHandler("detection", filename)
+            reloader = HotReloader([handler], poll_seconds=60)
+            reloader.start()
+            try:
+                reloader.check()
+                self.assertEqual(reloader.apply(), 0)
+                with open(filename, "w") as file:
+                    file.write("two!")
+                reloader.check()  # changed, waits for it to settle
+                self.assertEqual(reloader.apply(), 0)
+                reloader.check()
+                self.assertIsNone(handler.value)  # nothing is swapped until apply()
+                self.assertEqual(reloader.apply(), 1)
+                self.assertEqual(handler.value, "two!")
+                # a failed reload keeps the current state
+                with open(filename, "w") as file:
+                    file.write("broken")
+                reloader.check(force=True)
+                self.assertEqual(reloader.apply(), 0)
+                self.assertEqual(handler.value, "two!")
+                self.assertEqual(reloader.reloads, 1)
+            finally:
+                reloader.stop()
+
+    def test_gallery_npy_after_pkl(self):
+        with tempfile.TemporaryDirectory() as root:
+            # set up with only the legacy gallery
+            with open(os.path.join(root, "similarity.pkl"), "wb") as file:
+                file.write(b"legacy")
+            handler = GalleryHandler("detection", root)
+            reloader = HotReloader([handler], poll_seconds=60)
+            reloader.start()
+            try:
+                reloader.check()
+                self.assertEqual(reloader.apply(), 0)
+                # a rebuild writes the .npy gallery next to it
+                save_gallery(root, np.ones((2, 4)), ["a", "b"])
+                reloader.check()
+                reloader.check()
+                self.assertEqual(reloader.apply(), 1)
+                self.assertIsInstance(handler.gallery, Gallery)
+                self.assertEqual(list(handler.gallery.labels_string), ["a", "b"])
+            finally:
+                reloader.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from welfareobs.utils.image_shards import ShardWriter, ShardedImages, rgb_array, write_shards
+
+
+class TestImageShards(unittest.TestCase):
+    def test_write_read(self):
+        with tempfile.TemporaryDirectory() as root:
+            colours = [(i * 20, 255 - i * 20, i) for i in range(7)]
+            write_shards(
+                root,
+                [str(i) for i in range(7)],
+                lambda key: Image.new("RGB", (64 + int(key), 48), colours[int(key)]),
+                size=16,
+                shard_size=3,
+                workers=2,
+                meta={"img_load": "full"}
+            )
+            self.assertEqual(sorted(o for o in os.listdir(root) if o.startswith("shard-")),
+                             ["shard-00000.npy", "shard-00001.npy", "shard-00002.npy"])
+            shards = ShardedImages(root)
+            self.assertEqual(len(shards), 7)
+            self.assertEqual(shards.size, 16)
+            self.assertEqual(shards.keys, [str(i) for i in range(7)])
+            self.assertEqual(shards.meta, {"img_load": "full", "size": 16})
+            for i in [0, 2, 3, 6, -1]:
+                self.assertEqual(shards[i].shape, (16, 16, 3))
+                self.assertEqual(shards[i].dtype, np.uint8)
+                self.assertEqual(tuple(shards[i][8, 8]), colours[i])
+            self.assertEqual(shards.image(4).size, (16, 16))
+            with self.assertRaises(IndexError):
+                shards[7]
+            # handed to DataLoader workers: the mappings are not pickled
+            copy = pickle.loads(pickle.dumps(shards))
+            self.assertEqual(tuple(copy[5][0, 0]), colours[5])
+
+    def test_bounded(self):
+        lock = threading.Lock()
+        counts = {"loaded": 0, "added": 0, "ahead": 0}
+        add = ShardWriter.add
+
+        def load(key):
+            with lock:
+                counts["loaded"] += 1
+                counts["ahead"] = max(counts["ahead"], counts["loaded"] - counts["added"])
+            return Image.new("RGB", (32, 32), (int(key), 0, 0))
+
+        def counted_add(writer, key, image):
+            # the workers hand back resized arrays, not the decoded images
+            self.assertIsInstance(image, np.ndarray)
+            self.assertEqual(image.shape, (8, 8, 3))
+            add(writer, key, image)
+            with lock:
+                counts["added"] += 1
+
+        with tempfile.TemporaryDirectory() as root:
+            with mock.patch.object(ShardWriter, "add", counted_add):
+                write_shards(root, [str(i) for i in range(200)], load, size=8, shard_size=64, workers=2)
+            self.assertEqual(counts["added"], 200)
+            # at most 4 x workers submitted ahead of the writer
+            self.assertLessEqual(counts["ahead"], 9)
+            shards = ShardedImages(root)
+            self.assertEqual([int(shards[i][0, 0, 0]) for i in range(200)], list(range(200)))
+
+    def test_rgb_array(self):
+        array = rgb_array(Image.new("L", (20, 10), 7), 4)
+        self.assertEqual(array.shape, (4, 4, 3))
+        self.assertEqual(tuple(array[0, 0]), (7, 7, 7))
+
+    def test_interrupted(self):
+        with tempfile.TemporaryDirectory() as root:
+            with self.assertRaises(RuntimeError):
+                with ShardWriter(root, 8) as writer:
+                    writer.add("a", Image.new("L", (8, 8)))
+                    raise RuntimeError()
+            with self.assertRaises(OSError):
+                ShardedImages(root)
+
+
+if __name__ == '__main__':
+    unittest.main()
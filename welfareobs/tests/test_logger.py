@@ -0,0 +1,47 @@
+import io
+import json
+import logging
+import unittest
+
+from welfareobs.utils.logger import RateLimitFilter, JsonLinesFormatter, every
+
+
+class Expensive(object):
+    formatted = 0
+
+    def __str__(self):
+        Expensive.formatted += 1
+        return "expensive"
+
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        handler = logging.StreamHandler(self.stream)
+        handler.setFormatter(JsonLinesFormatter())
+        handler.addFilter(RateLimitFilter())
+        self.log = logging.getLogger("welfareobs.tests.logger")
+        self.log.propagate = False
+        self.log.handlers = [handler]
+        self.log.setLevel(logging.INFO)
+
+    def records(self) -> list[dict]:
+        return [json.loads(o) for o in self.stream.getvalue().splitlines()]
+
+    def test_rate_limit(self):
+        for i in range(5):
+            self.log.info("step %d", i, extra=every(60.0, key="step-1"))
+            self.log.info("step %d", i, extra=every(60.0, key="step-2"))
+        self.log.info("step %d", 99, extra=every(0.0, key="step-1"))
+        records = self.records()
+        self.assertEqual([o["message"] for o in records], ["step 0", "step 0", "step 99"])
+        self.assertEqual(records[2]["suppressed"], 4)
+
+    def test_structured_and_lazy(self):
+        self.log.debug("%s", Expensive())
+        self.assertEqual(Expensive.formatted, 0)
+        self.log.info("detections", extra={"fields": {"camera": "camera-1", "count": 3}})
+        record = self.records()[0]
+        self.assertEqual(record["camera"], "camera-1")
+        self.assertEqual(record["count"], 3)
+        self.assertEqual(record["level"], "INFO")
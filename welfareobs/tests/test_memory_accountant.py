@@ -0,0 +1,35 @@
+import tracemalloc
+import unittest
+
+import numpy as np
+
+from welfareobs.utils.handler_timing import HandlerTiming
+from welfareobs.utils.memory_accountant import MemoryAccountant, PRESSURE_NONE, PRESSURE_SOFT, PRESSURE_HARD
+
+
+class TestMemoryAccountant(unittest.TestCase):
+    def tearDown(self):
+        tracemalloc.stop()
+
+    def test_handler_attribution(self):
+        memory = MemoryAccountant(trace=True)
+        timing = HandlerTiming(memory=memory)
+        timing.register("step-1", ["detection", "location"])
+        held = []
+        timing.timed("detection", "run", lambda: held.append(np.ones((1024, 1024), dtype=np.uint8)))  # 1MB kept
+        timing.timed("location", "run", lambda: np.ones((4096, 1024), dtype=np.uint8).sum())  # 4MB transient
+        memory.sample("step-1")
+        report = memory.report()
+        handlers = {o["job"]: o for o in report["handlers"]}
+        self.assertAlmostEqual(handlers["detection"]["max_net_mb"], 1.0, places=1)
+        self.assertAlmostEqual(handlers["location"]["max_net_mb"], 0.0, places=1)
+        self.assertGreaterEqual(handlers["location"]["max_peak_mb"], 4.0)
+        self.assertEqual(report["handlers"][0]["job"], "location")
+        self.assertGreater(report["steps"]["step-1"]["rss_mb"], 0)
+
+    def test_pressure(self):
+        self.assertEqual(MemoryAccountant().pressure(), PRESSURE_NONE)  # no budget
+        rss_mb = MemoryAccountant().rss / 1048576
+        self.assertEqual(MemoryAccountant(budget_mb=rss_mb * 10).pressure(), PRESSURE_NONE)
+        self.assertEqual(MemoryAccountant(budget_mb=rss_mb * 1.05, soft_fraction=0.5).pressure(), PRESSURE_SOFT)
+        self.assertEqual(MemoryAccountant(budget_mb=rss_mb / 2).pressure(), PRESSURE_HARD)
@@ -0,0 +1,39 @@
+import unittest
+import urllib.request
+
+from welfareobs.utils.metrics import MetricsRegistry, MetricsServer
+from welfareobs.utils.performance_monitor import PerformanceMonitor
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self):
+        registry = MetricsRegistry()
+        monitor = PerformanceMonitor("step", history_size=0)
+        for o in [0.1, 0.2, 0.3]:
+            monitor.add(o)
+        registry.inc("detections", 2, "Individuals detected", camera="camera-1")
+        registry.inc("detections", 3, camera="camera-1")
+        registry.set("fps", 12.5, pipeline="a \"quoted\" name")
+        registry.monitor("step_seconds", monitor, step="step-1")
+        text = registry.render()
+        self.assertIn("# TYPE detections counter", text)
+        self.assertIn("# HELP detections Individuals detected", text)
+        self.assertIn('detections_total{camera="camera-1"} 5.0', text)
+        self.assertIn('fps{pipeline="a \\"quoted\\" name"} 12.5', text)
+        self.assertIn('step_seconds{step="step-1",quantile="0.5"} 0.2', text)
+        self.assertIn('step_seconds_count{step="step-1"} 3', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+        with self.assertRaises(TypeError):
+            registry.set("detections", 1)
+
+    def test_server(self):
+        registry = MetricsRegistry()
+        registry.set("fps", 30)
+        server = MetricsServer(registry, port=0, host="127.0.0.1")
+        server.start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                self.assertTrue(response.headers["Content-Type"].startswith("application/openmetrics-text"))
+                self.assertIn("fps 30", response.read().decode("utf-8"))
+        finally:
+            server.stop()
@@ -0,0 +1,18 @@
+import unittest
+
+from welfareobs.bench.micro import BENCHMARKS, cases, measure
+
+
+class TestMicroBench(unittest.TestCase):
+    def test_reference_checks(self):
+        # every benchmark agrees with its reference implementation (smallest parameters)
+        for name, params in cases(quick=True):
+            with self.subTest(benchmark=name, **params):
+                run, check = BENCHMARKS[name][0](**params)
+                check()
+
+    def test_measure(self):
+        result = measure("config_getitem", {"depth": 3}, repeat=2)
+        self.assertEqual(result["benchmark"], "config_getitem")
+        self.assertGreater(result["median_us"], 0)
+        self.assertLessEqual(result["min_us"], result["median_us"])
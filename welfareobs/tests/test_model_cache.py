@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+
+import shutil
+
+from welfareobs.utils.detection_cache import DetectionCache, DetectionConfig
+from welfareobs.utils.model_cache import ModelCache, file_sha256
+
+
+class TestModelCache(unittest.TestCase):
+    def test_put_get(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = ModelCache(root)
+            self.assertIsNone(cache.get("abc"))
+
+            def write(filename):
+                with open(filename, "wb") as file:
+                    file.write(b"weights" * 1000)
+            meta = cache.put("abc", write, {"reid-architecture": "swin_large_patch4_window12_384"})
+            self.assertEqual(meta["reid-architecture"], "swin_large_patch4_window12_384")
+            self.assertEqual(meta["size"], 7000)
+            self.assertEqual(cache.get("abc")["filename"], os.path.join(root, "abc", ModelCache.ARTEFACT))
+            self.assertTrue(cache.verify("abc"))
+            # no temporary directories left behind
+            self.assertEqual(os.listdir(root), ["abc"])
+
+    def test_truncated(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = ModelCache(root)
+            cache.put("abc", lambda filename: open(filename, "wb").close(), {})
+            with open(os.path.join(root, "abc", ModelCache.ARTEFACT), "wb") as file:
+                file.write(b"x")
+            self.assertIsNone(cache.get("abc"))
+            # a fresh put replaces the broken entry
+            cache.put("abc", lambda filename: open(filename, "wb").close(), {"n": 2})
+            self.assertEqual(cache.get("abc")["n"], 2)
+            with open(os.path.join(root, "abc", "meta.json"), "r") as file:
+                self.assertEqual(json.load(file)["key"], "abc")
+
+    def test_prune(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = ModelCache(root)
+            empty = lambda filename: open(filename, "wb").close()
+            cache.put("old", empty, {"slot": "model-a"})
+            cache.put("other", empty, {"slot": "model-b"})
+            cache.put("new", empty, {"slot": "model-a"})
+            self.assertEqual(sorted(os.listdir(root)), ["new", "other"])
+            self.assertIsNone(cache.get("old"))
+
+    def test_weights_hash(self):
+        with tempfile.TemporaryDirectory() as root:
+            model = os.path.join(root, "model")
+            os.makedirs(model)
+            for name, content in [("segmentation.pkl", b"rcnn"), ("checkpoint.pth", b"reid"), ("similarity.npy", b"1")]:
+                with open(os.path.join(model, name), "wb") as file:
+                    file.write(content)
+            cnf = DetectionConfig(384, model, "hf-hub:BVRA/wildlife-mega-L-384", os.path.join(model, "segmentation.pkl"))
+            cache = ModelCache(os.path.join(root, "cache"))
+            key = DetectionCache.weights_hash(cnf, cache.hash_file)
+            # a new gallery, a touch or a copy to another root keep the key
+            with open(os.path.join(model, "similarity.npy"), "wb") as file:
+                file.write(b"12")
+            os.utime(os.path.join(model, "checkpoint.pth"), ns=(1, 1))
+            self.assertEqual(DetectionCache.weights_hash(cnf, cache.hash_file), key)
+            copy = os.path.join(root, "copy")
+            shutil.copytree(model, copy)
+            copied = DetectionConfig(384, copy, cnf.reid_timm_backbone, os.path.join(copy, "segmentation.pkl"))
+            self.assertEqual(DetectionCache.weights_hash(copied, cache.hash_file), key)
+            # retraining changes it
+            with open(os.path.join(model, "checkpoint.pth"), "wb") as file:
+                file.write(b"retrained")
+            self.assertNotEqual(DetectionCache.weights_hash(cnf, cache.hash_file), key)
+
+    def test_file_sha256_memo(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename, memo = os.path.join(root, "weights"), os.path.join(root, "hashes.json")
+            with open(filename, "wb") as file:
+                file.write(b"weights")
+            digest = file_sha256(filename, memo)
+            self.assertEqual(digest, ModelCache.sha256(filename))
+            # the memo answers while size and mtime are unchanged
+            with open(memo, "r") as file:
+                hashes = json.load(file)
+            hashes[os.path.abspath(filename)][2] = "remembered"
+            with open(memo, "w") as file:
+                json.dump(hashes, file)
+            self.assertEqual(file_sha256(filename, memo), "remembered")
+            os.utime(filename, ns=(1, 1))
+            self.assertEqual(file_sha256(filename, memo), digest)
+
+
+if __name__ == '__main__':
+    unittest.main()
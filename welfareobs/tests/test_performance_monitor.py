@@ -0,0 +1,190 @@
+import csv
+import os
+import random
+import statistics
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from welfareobs.utils.performance_monitor import PerformanceMonitor
+from welfareobs.utils.streaming_stats import LogHistogram, RunningMedian, RunningStats, stable_copy
+
+
+def quadratic_cumulative(history, start_run):
+    # the original implementation: every row recomputed from the whole prefix
+    rows = []
+    for index in range(len(history)):
+        prefix = history[:index + 1]
+        rows.append((index + start_run, prefix[-1], sum(prefix), sum(prefix) / len(prefix),
+                     statistics.median(prefix), statistics.stdev(prefix) if len(prefix) > 1 else 0.0))
+    return rows
+
+
+class TestPerformanceMonitor(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        self.samples = [rng.lognormvariate(-3, 0.5) for _ in range(5000)]
+
+    def test_running_stats(self):
+        stats = RunningStats()
+        for o in self.samples:
+            stats.add(o)
+        self.assertAlmostEqual(stats.mean, statistics.mean(self.samples), places=9)
+        self.assertAlmostEqual(stats.stdev, statistics.stdev(self.samples), places=9)
+
+    def test_histogram_quantile(self):
+        histogram = LogHistogram(precision=0.01)
+        for o in self.samples:
+            histogram.add(o)
+        ordered = sorted(self.samples)
+        for q in [0.5, 0.95, 0.99]:
+            expected = ordered[int(q * (len(ordered) - 1))]
+            self.assertAlmostEqual(histogram.quantile(q), expected, delta=expected * 0.01)
+
+    def test_streaming_matches_exact(self):
+        streaming = PerformanceMonitor("streaming", history_size=len(self.samples))
+        exact = PerformanceMonitor("exact", history_size=len(self.samples), exact=True)
+        for o in self.samples:
+            streaming.add(o)
+            exact.add(o)
+        self.assertAlmostEqual(streaming.average, exact.average, places=3)
+        self.assertAlmostEqual(streaming.stdev, exact.stdev, places=3)
+        self.assertAlmostEqual(streaming.p95, exact.p95, delta=exact.p95 * 0.01 + 0.001)
+        # streaming keeps no raw times unless asked to
+        self.assertEqual(len(streaming), 0)
+        self.assertEqual(len(exact), len(self.samples))
+
+    def test_window(self):
+        # exact statistics cover the history window, streaming statistics every run
+        streaming = PerformanceMonitor("streaming", history_size=2, keep_history=True)
+        exact = PerformanceMonitor("exact", history_size=2, exact=True)
+        for o in [10.0, 1.0, 1.0]:
+            streaming.add(o)
+            exact.add(o)
+        self.assertEqual(exact.average, 1.0)
+        self.assertEqual(streaming.average, 4.0)
+        self.assertEqual(list(streaming), [1.0, 1.0])
+        self.assertEqual(streaming.number_of_executions, 3)
+
+    def test_no_history(self):
+        monitor = PerformanceMonitor("none", history_size=0)
+        monitor.track_start()
+        monitor.track_end()
+        self.assertEqual(len(monitor), 0)
+        self.assertEqual(monitor.number_of_executions, 1)
+        self.assertTrue(str(monitor).startswith("none: run=1"))
+
+    def test_concurrent_reads(self):
+        # the metrics thread reads percentiles while the pipeline loop appends
+        for exact in [True, False]:
+            monitor = PerformanceMonitor("concurrent", history_size=2000, exact=exact)
+            stop = threading.Event()
+
+            def append():
+                i = 0
+                while not stop.is_set():
+                    monitor.add(self.samples[i % len(self.samples)] * (1 + i // len(self.samples)))
+                    i += 1
+
+            thread = threading.Thread(target=append)
+            thread.start()
+            try:
+                for _ in range(200):
+                    monitor.p95
+                    monitor.median
+                    monitor.average
+                    monitor.stdev
+            finally:
+                stop.set()
+                thread.join()
+
+    def test_stable_copy(self):
+        class Changing(object):
+            def __init__(self):
+                self.failures = 2
+
+            def __iter__(self):
+                if self.failures > 0:
+                    self.failures -= 1
+                    raise RuntimeError("deque mutated during iteration")
+                return iter([1, 2])
+
+        self.assertEqual(stable_copy(Changing()), (1, 2))
+        with self.assertRaises(RuntimeError):
+            stable_copy(Changing(), attempts=2)
+
+    def test_running_median(self):
+        median = RunningMedian()
+        self.assertEqual(median.median, 0.0)
+        for i, o in enumerate(self.samples[:500]):
+            median.add(o)
+            self.assertEqual(median.median, statistics.median(self.samples[:i + 1]))
+        self.assertEqual(len(median), 500)
+
+    def test_cumulative_matches_quadratic(self):
+        monitor = PerformanceMonitor("window", history_size=300, keep_history=True)
+        for o in self.samples[:1000]:
+            monitor.add(o)
+        rows = list(monitor.cumulative())
+        expected = quadratic_cumulative(self.samples[700:1000], 700)
+        self.assertEqual(len(rows), len(expected))
+        for row, other in zip(rows, expected):
+            self.assertEqual(row[:2], other[:2])
+            for a, b in zip(row[2:], other[2:]):
+                self.assertAlmostEqual(a, b, places=9)
+
+    def test_save(self):
+        monitor = PerformanceMonitor("save", history_size=10, keep_history=True)
+        for o in self.samples[:10]:
+            monitor.add(o)
+        expected = np.array(list(monitor.cumulative()))
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "performance.csv")
+            monitor.save(filename)
+            monitor.save(filename)
+            with open(filename, "r", newline="") as file:
+                rows = list(csv.reader(file))
+            self.assertEqual(rows[0], PerformanceMonitor.COLUMNS)
+            self.assertEqual(len(rows), 21)  # appended, the header written once
+            np.testing.assert_allclose(np.array(rows[1:11], dtype=np.float64), expected)
+            monitor.save(filename, append=False)
+            with open(filename, "r", newline="") as file:
+                self.assertEqual(len(list(csv.reader(file))), 11)
+            filename = os.path.join(root, "performance.npz")
+            monitor.save(filename)
+            with np.load(filename) as data:
+                self.assertEqual(sorted(data.files), sorted(PerformanceMonitor.COLUMNS))
+                for i, name in enumerate(PerformanceMonitor.COLUMNS):
+                    np.testing.assert_allclose(data[name], expected[:, i])
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                return
+            filename = os.path.join(root, "performance.parquet")
+            monitor.save(filename)
+            table = pq.read_table(filename)
+            self.assertEqual(table.column_names, PerformanceMonitor.COLUMNS)
+            self.assertEqual(str(table.schema.field("run").type), "int64")
+            np.testing.assert_allclose(np.array(table.column("avg")), expected[:, 3])
+            PerformanceMonitor("empty").save(filename)
+            self.assertEqual(pq.read_table(filename).num_rows, 0)
+
+    def test_snapshot(self):
+        monitor = PerformanceMonitor("snapshot", history_size=100, keep_history=True)
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "performance.csv")
+            for o in self.samples[:50]:
+                monitor.add(o)
+            self.assertTrue(monitor.snapshot(filename))
+            # the history was copied when the snapshot was requested, later runs are not in this file
+            for o in self.samples[50:80]:
+                monitor.add(o)
+            monitor.wait()
+            with open(filename, "r", newline="") as file:
+                self.assertEqual(len(list(csv.reader(file))), 51)
+            self.assertTrue(monitor.snapshot(filename, background=False))
+            with open(filename, "r", newline="") as file:
+                self.assertEqual(len(list(csv.reader(file))), 81)
+            self.assertEqual(os.listdir(root), ["performance.csv"])
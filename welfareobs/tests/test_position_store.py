@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from welfareobs.utils.position_store import PositionStore
+
+
+class TestPositionStore(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.store = PositionStore(os.path.join(self.root.name, "positions.db"))
+        self.store.set_names(["Zarafa", "Ebo", "Jimiyu", "Kito"])
+        self.start = datetime(2025, 3, 10, 10, 0, 0).timestamp()
+        rows = []
+        for sample in range(10):
+            rows.append((sample + 1, 4, self.start + sample * 5, 1.0 if sample < 6 else -1.0, 2.0, 0.1, 0.9))
+            rows.append((sample + 1, 1, self.start + sample * 5, None, None, None, 0.5))
+        self.store.insert(rows)
+
+    def tearDown(self):
+        self.store.close()
+        self.root.cleanup()
+
+    def test_query_by_name_and_range(self):
+        rows = self.store.query("Kito", datetime(2025, 3, 10, 10, 0, 0), self.start + 20)
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(o[0] == 4 for o in rows))
+        self.assertEqual(len(self.store.query()), 20)
+
+    def test_unknown_name(self):
+        with self.assertRaises(KeyError):
+            self.store.query("Nobody")
+
+    def test_downsample(self):
+        rows = self.store.downsample(25, identity=4)
+        self.assertEqual(sum(o[4] for o in rows), 10)
+
+    def test_dwell_time(self):
+        rows = self.store.dwell_time(1.0, identity="Kito")
+        self.assertEqual(rows, [(4, 1, 2, 30.0), (4, -1, 2, 15.0)])
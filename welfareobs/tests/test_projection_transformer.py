@@ -0,0 +1,33 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from welfareobs.utils.projection_transformer import ProjectionTransformer
+
+
+class TestProjectionTransformer(unittest.TestCase):
+    def test_weight_map(self):
+        # calibrated 40x40 block in a 60x60 image: x rises 2 per column, z 3 per row, so the footprint is 6
+        lut = np.zeros((60, 60, 3), dtype=np.uint8)
+        rows, columns = np.mgrid[0:40, 0:40]
+        lut[10:50, 10:50, 1] = 20 + 2 * columns
+        lut[10:50, 10:50, 0] = 20 + 3 * rows
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "pt.pkl")
+            with open(filename, "wb") as file:
+                pickle.dump({"warped_grid_image": lut}, file)
+            pt = ProjectionTransformer()
+            pt.load(filename)
+        # interior
+        np.testing.assert_allclose(pt.get_weight_array([(30, 30), (20, 40), (40, 20)]), 1.0 / 7.0, rtol=1e-5)
+        # outside the calibrated area (flat zeros would otherwise be weight 1) and at its edge
+        np.testing.assert_array_equal(pt.get_weight_array([(0, 0), (5, 30), (59, 59), (10, 30), (30, 12)]), 0.0)
+        self.assertEqual(pt.get_weight_array([(30, 30)]).shape, (1,))
+        self.assertEqual(pt.get_xz(30, 30), (20 + 2 * 20 - 128, 20 + 3 * 20 - 128))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import unittest
+
+from welfareobs.handlers import registry
+from welfareobs.utils.config import Config
+from welfareobs.utils.startup_profile import StartupProfile
+
+
+class TestRegistry(unittest.TestCase):
+    def test_resolve(self):
+        from welfareobs.handlers.payload_create import PayloadCreateHandler
+        self.assertIs(registry.resolve("payload-create"), PayloadCreateHandler)
+        self.assertIs(registry.resolve("welfareobs.handlers.payload_create.PayloadCreateHandler"), PayloadCreateHandler)
+        self.assertIn("welfareobs.handlers.payload_create.PayloadCreateHandler", registry.import_times())
+        self.assertEqual(registry.path("tests.stub_handler.StubHandler"), "tests.stub_handler.StubHandler")
+        with self.assertRaises(ImportError):
+            registry.resolve("welfareobs.handlers.missing.Handler")
+        with self.assertRaises(ValueError):
+            registry.resolve("no-such-handler")
+
+    def test_manifest(self):
+        # every manifest entry imports without the heavy handler dependencies (torch, rtsp, ...)
+        for name in registry.MANIFEST.keys():
+            self.assertTrue(hasattr(registry.resolve(name), "setup"), name)
+
+    def test_sys_path(self):
+        config = Config("tests/runner_config.json")
+        size = len(sys.path)
+        for _ in range(3):
+            config.instance("task-1.handler")
+            config.validate_instance("task-2.handler")
+        self.assertEqual(len(sys.path), size)
+
+    def test_startup_profile(self):
+        startup = StartupProfile()
+        with startup.phase("import"):
+            import json  # noqa: F401
+        startup.mark("first-frame")
+        startup.mark("first-frame")
+        report = startup.report()
+        self.assertEqual([o["phase"] for o in report["phases"]], ["import"])
+        self.assertGreaterEqual(report["marks"]["first-frame"], report["phases"][0]["at_ms"])
+        self.assertIn("first-frame", str(startup))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from welfareobs.utils.retrieval import evaluate, holdout, leave_one_out_top1
+
+
+class TestRetrieval(unittest.TestCase):
+    def test_leave_one_out_top1(self):
+        features = np.array([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9], [0.8, 0.2]])
+        self.assertEqual(leave_one_out_top1(features, ["a", "a", "b", "b", "a"], batch_size=2), 1.0)
+        self.assertEqual(leave_one_out_top1(features, ["a", "b", "b", "a", "a"]), 0.0)
+        self.assertEqual(leave_one_out_top1(features[:1], ["a"]), 0.0)
+
+    def test_holdout(self):
+        keys = [f"img-{i}.jpg" for i in range(200)]
+        labels = [str(i % 10) for i in range(200)]
+        held = holdout(keys, labels, 0.25)
+        self.assertTrue(np.array_equal(held, holdout(keys, labels, 0.25)))
+        self.assertTrue(30 < held.sum() < 70)
+        # every identity keeps a database row
+        self.assertEqual(set(np.asarray(labels)[~held]), set(labels))
+        self.assertFalse(holdout(keys, labels, 0.0).any())
+        self.assertEqual(holdout(["a", "b"], ["x", "x"], 1.0).tolist().count(False), 1)
+
+    def test_evaluate(self):
+        database = np.array([[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0, 0.9, 0.1], [0, 0, 1]])
+        database_labels = ["a", "a", "b", "b", "c"]
+        queries = np.array([[1, 0.05, 0], [0, 1, 0.05], [0.1, 0, 1], [0.95, 0.1, 0]])
+        query_labels = ["a", "b", "c", "b"]
+        output = evaluate(queries, query_labels, database, database_labels, top_k=(1, 3), batch_size=3)
+        self.assertEqual(output["queries"], 4)
+        self.assertEqual(output["top1"], 0.75)
+        self.assertEqual(output["top3"], 1.0)
+        # the last query ranks its two relevant rows 3rd and 4th: AP = (1/3 + 2/4) / 2
+        self.assertAlmostEqual(output["mAP"], (1 + 1 + 1 + (1 / 3 + 2 / 4) / 2) / 4)
+        self.assertEqual(output["labels"], ["a", "b", "c"])
+        self.assertEqual(output["confusion"], [[1, 0, 0], [1, 1, 0], [0, 0, 1]])
+        # a query whose identity is not in the database is a miss
+        output = evaluate(queries[:1], ["z"], database, database_labels)
+        self.assertEqual((output["top1"], output["mAP"]), (0.0, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from welfareobs.utils.rotating_writer import RotatingWriter
+
+
+class TestRotatingWriter(unittest.TestCase):
+    def test_buffered_until_flush_rows(self):
+        with tempfile.TemporaryDirectory() as root:
+            writer = RotatingWriter(os.path.join(root, "out.csv"), columns=["a", "b"], flush_rows=3, flush_seconds=3600)
+            writer.write([1, 2])
+            writer.write([3, 4])
+            with open(os.path.join(root, "out.csv")) as file:
+                self.assertEqual(file.read().splitlines(), ["a,b"])
+            writer.write([5, 6])
+            with open(os.path.join(root, "out.csv")) as file:
+                self.assertEqual(len(file.read().splitlines()), 4)
+            writer.close()
+
+    def test_rotate_hour(self):
+        with tempfile.TemporaryDirectory() as root:
+            writer = RotatingWriter(os.path.join(root, "out.csv"), columns=["a"], rotate="hour")
+            writer.write([1], datetime(2025, 3, 10, 10, 59, 59))
+            writer.write([2], datetime(2025, 3, 10, 11, 0, 0))
+            self.assertEqual(writer.filename, os.path.join(root, "out-2025031011.csv"))
+            writer.close()
+            self.assertEqual(sorted(os.listdir(root)), ["out-2025031010.csv", "out-2025031011.csv"])
+            with open(os.path.join(root, "out-2025031010.csv")) as file:
+                self.assertEqual(file.read().splitlines(), ["a", "1"])
+
+    def test_csv_restart(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "out.csv")
+            for value in [1, 2]:
+                writer = RotatingWriter(filename, columns=["a"])
+                writer.write([value])
+                writer.close()
+            # appended, the header written once
+            with open(filename) as file:
+                self.assertEqual(file.read().splitlines(), ["a", "1", "2"])
+
+    def test_flush_seconds(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "out.csv")
+            writer = RotatingWriter(filename, columns=["a"], flush_rows=1000, flush_seconds=0.0)
+            writer.write([1])
+            writer.flush_if_due()
+            with open(filename) as file:
+                self.assertEqual(file.read().splitlines(), ["a", "1"])
+            writer.close()
+
+    def test_parquet(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        schema = pa.schema([("a", pa.int64()), ("b", pa.list_(pa.float32())), ("c", pa.timestamp("ms"))])
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "out.parquet")
+            writer = RotatingWriter(filename, columns=["a", "b", "c"], fmt="parquet", flush_rows=2, schema=schema)
+            for i in range(5):
+                writer.write([i, [float(i), 0.5], datetime(2025, 3, 10, 10, 0, i)])
+            writer.close()
+            parquet = pq.ParquetFile(filename)
+            # one row group per flush
+            self.assertEqual(parquet.metadata.num_row_groups, 3)
+            table = parquet.read()
+            self.assertTrue(table.schema.equals(schema))
+            self.assertEqual(table.column("a").to_pylist(), [0, 1, 2, 3, 4])
+            self.assertEqual(table.column("b").to_pylist()[3], [3.0, 0.5])
+            self.assertEqual(table.column("c").to_pylist()[4], datetime(2025, 3, 10, 10, 0, 4))
+
+    def test_parquet_sequence(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        schema = pa.schema([("a", pa.int64())])
+        with tempfile.TemporaryDirectory() as root:
+            # every restart inside a partition starts the next sequence file, nothing is overwritten
+            for value in [1, 2, 3]:
+                writer = RotatingWriter(os.path.join(root, "out.parquet"), columns=["a"], fmt="parquet",
+                                        rotate="hour", schema=schema)
+                writer.write([value], datetime(2025, 3, 10, 10))
+                writer.close()
+            for value in [4, 5]:
+                writer = RotatingWriter(os.path.join(root, "plain.parquet"), columns=["a"], fmt="parquet", schema=schema)
+                writer.write([value])
+                writer.close()
+            self.assertEqual(sorted(os.listdir(root)), [
+                "out-2025031010-1.parquet", "out-2025031010-2.parquet", "out-2025031010.parquet",
+                "plain-1.parquet", "plain.parquet"
+            ])
+            self.assertEqual(pq.read_table(os.path.join(root, "out-2025031010-2.parquet")).column("a").to_pylist(), [3])
+            self.assertEqual(pq.read_table(os.path.join(root, "plain-1.parquet")).column("a").to_pylist(), [5])
+
+    def test_parquet_requires_schema(self):
+        with self.assertRaises(SyntaxError):
+            RotatingWriter("out.parquet", columns=["a"], fmt="parquet")
+
+    def test_invalid_rotation(self):
+        with self.assertRaises(SyntaxError):
+            RotatingWriter("out.csv", columns=["a"], rotate="weekly")
+
+
+if __name__ == '__main__':
+    unittest.main()
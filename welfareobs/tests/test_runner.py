@@ -1,7 +1,12 @@
+import json
+import os
+import tempfile
+import threading
 import unittest
 
 from welfareobs.utils.config import Config
 from welfareobs.runner import Runner
+from tests.stub_handler import SlowSetupHandler
 
 
 class TestRunner(unittest.TestCase):
@@ -41,3 +46,73 @@ class TestRunner(unittest.TestCase):
         self.assertTrue(runner.get_step(1).jobs[0].has_torndown)
 
 
+
+    def test_parallel_setup(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "pipeline.json")
+            with open(filename, "w") as file:
+                json.dump({
+                    "settings": {"configuration-name": "setup", "performance-history-size": "10",
+                                 "threadpool-size": "0", "setup-threads": "3"},
+                    "pipeline": ["step-1"],
+                    "step-1": ["task-1", "task-2", "task-3"],
+                    "task-1": {"handler": "tests.stub_handler.SlowSetupHandler", "config": ""},
+                    "task-2": {"handler": "tests.stub_handler.SlowSetupHandler", "config": ""},
+                    "task-3": {"handler": "tests.stub_handler.SlowSetupHandler", "config": ""}
+                }, file)
+            # a serial setup would time out at the barrier (the first setup waits for the other two)
+            SlowSetupHandler.barrier = threading.Barrier(3, timeout=10.0)
+            try:
+                runner: Runner = Runner(Config(filename))
+                runner.run(run_count=1)
+            finally:
+                SlowSetupHandler.barrier = None
+        tasks = [runner[f"task-{o}"] for o in range(1, 4)]
+        self.assertTrue(all(o.warmed_up for o in tasks))
+        self.assertTrue(all(o.overlapped for o in tasks))
+        self.assertEqual(len({o.setup_thread for o in tasks}), 3)
+        self.assertGreater(runner.ready_seconds, 0.0)
+
+    def test_shed_not_counted(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "pipeline.json")
+            with open(filename, "w") as file:
+                json.dump({
+                    # a 1MB budget is always over, so every other iteration is shed
+                    "settings": {"configuration-name": "shed", "performance-history-size": "10",
+                                 "threadpool-size": "0", "memory-budget-mb": "1",
+                                 "trace-filename": os.path.join(root, "trace.json")},
+                    "pipeline": ["step-1"],
+                    "step-1": ["task-1"],
+                    "task-1": {"handler": "tests.stub_handler.StubHandler", "config": ""}
+                }, file)
+            runner: Runner = Runner(Config(filename))
+            runner.run(run_count=2)
+            with open(os.path.join(root, "trace.json"), "r") as file:
+                events = [o for o in json.load(file)["traceEvents"] if o.get("cat") == "runner"]
+        self.assertEqual(runner["task-1"].runs, 2)
+        self.assertEqual([o["name"] for o in events], ["shed", "iteration", "shed", "iteration"])
+        self.assertEqual([o["args"]["iteration"] for o in events], [0, 0, 1, 1])
+
+    def test_performance_history(self):
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "pipeline.json")
+            csv_filename = os.path.join(root, "performance.csv")
+            with open(filename, "w") as file:
+                json.dump({
+                    # a performance file and no snapshots: the raw times are still kept for the final save
+                    "settings": {"configuration-name": "performance", "performance-history-size": "10",
+                                 "threadpool-size": "0", "performance-csv-filename": csv_filename},
+                    "pipeline": ["step-1"],
+                    "step-1": ["task-1"],
+                    "task-1": {"handler": "tests.stub_handler.StubHandler", "config": ""}
+                }, file)
+            runner: Runner = Runner(Config(filename))
+            self.assertFalse(runner.snapshots_enabled)
+            runner.run(run_count=3)
+            self.assertEqual(len(runner.performance), 3)
+            runner.performance.save(csv_filename)
+            with open(csv_filename, "r") as file:
+                lines = file.read().splitlines()
+        self.assertEqual(lines[0], "run,time,sum,avg,med,sd")
+        self.assertEqual([o.split(",")[0] for o in lines[1:]], ["0", "1", "2"])
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+
+from welfareobs.utils.sweep import Sweep
+
+
+def stub_run(name: str, device: str) -> dict:
+    # fails once for names starting with "flaky", the marker file stands in for a resume checkpoint
+    if name.startswith("flaky"):
+        marker = os.path.join(os.environ["SWEEP_TEST_DIR"], name)
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            raise RuntimeError("interrupted")
+    if name.startswith("interrupted"):
+        marker = os.path.join(os.environ["SWEEP_TEST_DIR"], name)
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            raise KeyboardInterrupt()
+    return {"accuracy": len(name) / 10, "pid": os.getpid()}
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.__directory = tempfile.TemporaryDirectory()
+        os.environ["SWEEP_TEST_DIR"] = self.__directory.name
+
+    def tearDown(self):
+        self.__directory.cleanup()
+
+    def test_resume(self):
+        root = self.__directory.name
+        sweep = Sweep(root, ["a", "flaky-b", "cc"], ["cpu"], stub_run)
+        state = sweep.start()
+        self.assertEqual(state["a"]["status"], "done")
+        self.assertEqual(state["flaky-b"]["status"], "failed")
+        self.assertIn("interrupted", state["flaky-b"]["error"])
+        self.assertEqual(state["cc"]["accuracy"], 0.2)
+        # started again: only the failed run is queued
+        sweep = Sweep(root, ["a", "flaky-b", "cc"], ["cpu"], stub_run)
+        self.assertEqual(sweep.pending(), ["flaky-b"])
+        state = sweep.start()
+        self.assertEqual(state["flaky-b"]["status"], "done")
+        with open(os.path.join(root, "sweep.json"), "r") as file:
+            self.assertEqual({k: v["status"] for k, v in json.load(file).items()},
+                             {"a": "done", "flaky-b": "done", "cc": "done"})
+        with open(os.path.join(root, "comparison.csv"), "r") as file:
+            lines = file.read().splitlines()
+        self.assertEqual(lines[0].split(",")[:4], ["run", "status", "device", "accuracy"])
+        self.assertEqual([o.split(",")[0] for o in lines[1:]], ["a", "flaky-b", "cc"])
+
+    def test_interrupted(self):
+        root = self.__directory.name
+        runs = ["a", "interrupted-b", "cc"]
+        with self.assertRaises(KeyboardInterrupt):
+            Sweep(root, runs, ["cpu"], stub_run).start()
+        with open(os.path.join(root, "sweep.json"), "r") as file:
+            self.assertEqual({k: v["status"] for k, v in json.load(file).items()},
+                             {"a": "done", "interrupted-b": "running"})
+        sweep = Sweep(root, runs, ["cpu"], stub_run)
+        self.assertEqual(sweep.pending(), ["interrupted-b", "cc"])
+        state = sweep.start()
+        self.assertTrue(all(o["status"] == "done" for o in state.values()))
+
+    def test_processes(self):
+        sweep = Sweep(self.__directory.name, ["a", "bb", "ccc", "dddd"], ["cpu:0", "cpu:1"], stub_run)
+        state = sweep.start()
+        self.assertTrue(all(o["status"] == "done" for o in state.values()))
+        self.assertTrue(all(o["pid"] != os.getpid() for o in state.values()))
+        self.assertLessEqual({o["device"] for o in state.values()}, {"cpu:0", "cpu:1"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import os
+import signal
+import tempfile
+import time
+import unittest
+
+from welfareobs.pipeline_step import PipelineStep
+from welfareobs.runner import Runner
+from welfareobs.utils.config import Config
+from welfareobs.utils.handler_timing import HandlerTiming
+from welfareobs.utils.tracer import Tracer
+from tests.stub_handler import StubHandler
+
+
+class TestTracer(unittest.TestCase):
+    def test_step_trace(self):
+        tracer = Tracer(capacity=5)
+        timing = HandlerTiming(tracer)
+        step = PipelineStep("step-1", thread_pool_size=2, timing=timing, tracer=tracer)
+        for name in ["camera-1", "camera-2"]:
+            step.add_job(StubHandler(name, [], ""))
+        timing.register("step-1", ["camera-1", "camera-2"])
+        for _ in range(2):
+            step.run()
+            tracer.next_iteration()
+        # ring buffer keeps the last 5 of 6 events
+        self.assertEqual(len(tracer), 5)
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "trace.json")
+            tracer.dump(filename)
+            with open(filename, "r") as file:
+                events = json.load(file)["traceEvents"]
+        complete = [o for o in events if o["ph"] == "X"]
+        self.assertEqual([o["name"] for o in complete[-3:]].count("step-1"), 1)
+        self.assertEqual(complete[-1]["args"]["iteration"], 1)
+        jobs = [o for o in complete if o["cat"] == "run" and o["args"]["iteration"] == 1]
+        # jobs ran on different threads and overlap
+        self.assertNotEqual(jobs[0]["tid"], jobs[1]["tid"])
+        self.assertLess(jobs[1]["ts"], jobs[0]["ts"] + jobs[0]["dur"])
+        self.assertGreaterEqual(jobs[0]["dur"], 500000)
+        self.assertTrue(all(o["ph"] == "M" for o in events[:len(events) - len(complete)]))
+
+    def test_dump_if_due(self):
+        tracer = Tracer(capacity=10)
+        tracer.complete("a", "run", time.perf_counter_ns())
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "trace.json")
+            self.assertFalse(tracer.dump_if_due(filename))
+            tracer.request_dump()
+            self.assertTrue(tracer.dump_if_due(filename))
+            tracer.wait()
+            self.assertFalse(tracer.dump_if_due(filename))
+            with open(filename, "r") as file:
+                self.assertEqual([o["name"] for o in json.load(file)["traceEvents"] if o["ph"] == "X"], ["a"])
+            # time windowed
+            tracer = Tracer(capacity=10, dump_seconds=0.05)
+            tracer.complete("b", "run", time.perf_counter_ns())
+            self.assertFalse(tracer.dump_if_due(filename))
+            time.sleep(0.06)
+            self.assertTrue(tracer.dump_if_due(filename))
+            tracer.wait()
+            self.assertEqual(os.listdir(root), ["trace.json"])
+
+    @unittest.skipUnless(hasattr(signal, "SIGUSR1"), "no SIGUSR1 on this platform")
+    def test_signal(self):
+        previous = signal.getsignal(signal.SIGUSR1)
+        with tempfile.TemporaryDirectory() as root:
+            filename = os.path.join(root, "pipeline.json")
+            trace = os.path.join(root, "trace.json")
+            with open(filename, "w") as file:
+                json.dump({
+                    "settings": {"configuration-name": "trace", "performance-history-size": "10",
+                                 "threadpool-size": "0", "trace-filename": trace},
+                    "pipeline": ["step-1"],
+                    "step-1": ["task-1"],
+                    "task-1": {"handler": "tests.stub_handler.StubHandler", "config": ""}
+                }, file)
+            runner = Runner(Config(filename))
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertTrue(runner.tracer.dump_if_due(trace))
+            runner.tracer.wait()
+            self.assertTrue(os.path.exists(trace))
+            runner.run(run_count=1)
+        # the previous handler is put back on teardown
+        self.assertEqual(signal.getsignal(signal.SIGUSR1), previous)
+
+
+if __name__ == '__main__':
+    unittest.main()
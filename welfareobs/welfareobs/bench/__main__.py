@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: __main__.py
+Description: Run the end-to-end benchmark scenarios, save baselines and flag regressions
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+from welfareobs.bench.scenario import scenarios, run_scenario, environment, compare
+
+
+"""
+python -m welfareobs.bench                                   # run every bundled scenario
+python -m welfareobs.bench one-camera --save baseline.json    # record a baseline
+python -m welfareobs.bench --compare baseline.json            # exit 1 if anything regressed by more than 10%
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run benchmark scenarios (CPU only, no dataset)")
+    parser.add_argument("scenario", nargs="*", help=f"scenario names or JSON files (default: {' '.join(scenarios())})")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change allowed (default 0.1)")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "results": {}}
+    # one fresh process per scenario so peak RSS and warm caches don't leak between scenarios
+    context = multiprocessing.get_context("spawn")
+    for name in args.scenario or scenarios():
+        with context.Pool(1) as pool:
+            result = pool.apply(run_scenario, (name,))
+        results["results"][result["scenario"]] = result
+        print(f"{result['scenario']:<24}{result['throughput_fps']:>10.2f} fps  p50={result['p50_ms']:.3f}ms  "
+              f"p99={result['p99_ms']:.3f}ms  rss={result['peak_rss_mb']}MB")
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: micro.py
+Description: Micro-benchmarks for the location, projection, aggregation, config and monitor kernels
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import argparse
+import atexit
+import functools
+import itertools
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+import numpy as np
+from scipy.ndimage import zoom
+from welfareobs.bench.synthetic import make_projection, giraffe_mask
+from welfareobs.handlers.aggregator import AggregatorHandler
+from welfareobs.handlers.location import LocationHandler
+from welfareobs.models.intersect import Intersect
+from welfareobs.utils.config import Config
+from welfareobs.utils.performance_monitor import PerformanceMonitor
+from welfareobs.utils.projection_transformer import ProjectionTransformer
+
+
+"""
+asv style: every benchmark is a function of its parameters that builds generated fixtures and returns
+(run, check). `run` is the timed call and `check` compares one result of `run` against a straightforward
+reference implementation, raising AssertionError if they disagree. Every parameter combination is checked
+before it is timed.
+
+python -m welfareobs.bench.micro                          # all benchmarks, all parameters
+python -m welfareobs.bench.micro lower_intersect --quick  # smallest parameters only
+python -m welfareobs.bench.micro --save micro.json
+python -m welfareobs.bench.micro --compare micro.json     # exit 1 on a regression
+"""
+BENCHMARKS: dict[str, tuple] = {}
+_ROOT = tempfile.mkdtemp(prefix="welfareobs-micro-")
+atexit.register(shutil.rmtree, _ROOT, ignore_errors=True)
+
+
+def benchmark(**params):
+    """
+    Register a benchmark with its parameter grid (name -> list of values)
+    """
+    def register(fn):
+        BENCHMARKS[fn.__name__] = (fn, params)
+        return fn
+    return register
+
+
+@functools.lru_cache(maxsize=None)
+def _projection(size: int) -> str:
+    filename = os.path.join(_ROOT, f"projection-{size}.pkl")
+    make_projection(filename, size, size)
+    return filename
+
+
+@functools.lru_cache(maxsize=None)
+def _transformer(size: int) -> ProjectionTransformer:
+    pt = ProjectionTransformer()
+    pt.load(_projection(size))
+    return pt
+
+
+def _masks(size: int, detections: int, seed: int = 1) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    output = []
+    for _ in range(detections):
+        scale = int(rng.integers(size // 24, size // 12))
+        output.append(giraffe_mask(
+            size, size,
+            int(rng.integers(int(size * 0.3), int(size * 0.7))),
+            int(rng.integers(int(size * 0.6), int(size * 0.8))),
+            scale
+        ))
+    return output
+
+
+def _write_config(name: str, src: dict) -> str:
+    filename = os.path.join(_ROOT, name)
+    with open(filename, "w") as file:
+        json.dump(src, file)
+    return filename
+
+
+def reference_lower_intersect(mask: np.ndarray, clipping_threshold: int) -> set:
+    """Lowest mask pixel per column, within clipping_threshold of the lowest pixel overall"""
+    columns = np.flatnonzero(mask.any(axis=0))
+    if len(columns) == 0:
+        return set()
+    bottoms = mask.shape[0] - 1 - np.argmax(mask[::-1, columns], axis=0)
+    threshold = bottoms.max() if clipping_threshold == 0 else clipping_threshold
+    keep = bottoms >= bottoms.max() - threshold
+    return set(zip(columns[keep].tolist(), bottoms[keep].tolist()))
+
+
+@benchmark(size=[128, 384, 768], detections=[1, 4, 12])
+def lower_intersect(size: int, detections: int):
+    handler = LocationHandler("location", [], "")
+    masks = _masks(size, detections)
+
+    def run():
+        return [handler.get_xy_mask_lower_intersect(mask, 5) for mask in masks]
+
+    def check():
+        for mask, points in zip(masks, run()):
+            assert set(map(tuple, points.tolist())) == reference_lower_intersect(mask, 5)
+    return run, check
+
+
+@benchmark(size=[128, 384, 768], points=[16, 128, 1024])
+def xz_array(size: int, points: int):
+    pt = _transformer(size)
+    rng = np.random.default_rng(points)
+    pairs = np.stack([rng.integers(0, size, points), rng.integers(0, size, points)], axis=1)
+
+    def run():
+        return pt.get_xz_array(pairs)
+
+    def check():
+        lut = pt.warped_grid_image[pairs[:, 1], pairs[:, 0]].astype(np.int64) - 128
+        assert np.array_equal(run(), lut[:, [1, 0]])
+    return run, check
+
+
+@benchmark(size=[128, 384, 768])
+def projection_load(size: int):
+    filename = _projection(size)
+    target = size // 2
+
+    def run():
+        pt = ProjectionTransformer()
+        pt.load(filename, target_w=target, target_h=target)
+        return pt
+
+    def check():
+        with open(filename, "rb") as file:
+            source = pickle.load(file)["warped_grid_image"]
+        expected = zoom(source, (target / source.shape[0], target / source.shape[1], 1), order=1)
+        assert np.array_equal(run().warped_grid_image, expected)
+    return run, check
+
+
+def reference_fuse(intersects: list[Intersect]) -> dict:
+    """Per identity confidence * LUT weighted mean of the valid intersect points"""
+    sums = {}
+    for element in intersects:
+        for point, weight in zip(element.intersect, element.weights):
+            if np.isnan(point).any():
+                continue
+            total = sums.setdefault(element.identity, [0.0, 0.0, 0.0])
+            total[0] += weight * element.confidence * point[0]
+            total[1] += weight * element.confidence * point[1]
+            total[2] += weight * element.confidence
+    return {identity: (x / w, z / w) for identity, (x, z, w) in sums.items()}
+
+
+@benchmark(cameras=[1, 3, 6], detections=[2, 8, 32])
+def aggregator_run(cameras: int, detections: int):
+    handler = AggregatorHandler("aggregator", [], _write_config(f"aggregator-{detections}.json", {
+        "dbscan-eps": "2.0",
+        "min-samples": "1",
+        "individuals": [f"individual-{o + 1}" for o in range(detections)]
+    }))
+    handler.setup()
+    rng = np.random.default_rng(cameras * 100 + detections)
+    timestamp = datetime(2025, 1, 1, 8, 0, 0)
+    inputs = []
+    for _ in range(cameras):
+        camera = []
+        for identity in range(1, detections + 1):
+            points = int(rng.integers(20, 60))
+            centre = rng.uniform(-50, 50, 2)
+            camera.append(Intersect(
+                identity=identity,
+                intersect=np.round(centre + rng.normal(0, 1.5, (points, 2))),
+                timestamp=timestamp,
+                confidence=float(rng.uniform(0.6, 0.99)),
+                weights=rng.uniform(0.2, 1.0, points)
+            ))
+        inputs.append(camera)
+
+    def run():
+        handler.set_inputs(inputs)
+        handler.run()
+        return handler.get_output()
+
+    def check():
+        expected = reference_fuse([element for camera in inputs for element in camera])
+        output = run()
+        assert len(output) == detections
+        for element in output:
+            assert np.allclose(element.location, expected[element.identity])
+    return run, check
+
+
+@benchmark(depth=[1, 3, 6])
+def config_getitem(depth: int):
+    keys = [f"level-{o}" for o in range(depth)]
+    data = {"value": "42"}
+    for key in reversed(keys):
+        data = {key: data, "sibling": {"value": "0"}}
+    cnf = Config(_write_config(f"config-{depth}.json", data))
+    path = ".".join(keys + ["value"])
+
+    def run():
+        return cnf[path]
+
+    def check():
+        assert run() == functools.reduce(lambda value, key: value[key], keys + ["value"], data)
+    return run, check
+
+
+@benchmark(samples=[1000, 10000, 100000], exact=[False, True])
+def performance_monitor(samples: int, exact: bool):
+    values = np.random.default_rng(samples).lognormal(-3.0, 0.5, samples)
+
+    def run():
+        monitor = PerformanceMonitor("bench", history_size=samples, exact=exact)
+        for value in values:
+            monitor.add(value)
+        return monitor.average, monitor.stdev, monitor.median, monitor.p95, monitor.p99
+
+    def check():
+        average, stdev, median, p95, p99 = run()
+        assert abs(average - round(values.mean(), 3)) <= 1e-3
+        assert abs(stdev - round(values.std(ddof=1), 3)) <= 1e-3
+        for actual, p in [(median, 50), (p95, 95), (p99, 99)]:
+            expected = np.percentile(values, p, method="nearest" if exact else "linear")
+            # streaming percentiles are within 1% (plus the monitor rounding to 3 places)
+            assert abs(actual - expected) <= (1e-3 if exact else expected * 0.01 + 1e-3)
+    return run, check
+
+
+def cases(names: list[str]|None = None, quick: bool = False):
+    """
+    :param names: benchmark names (default all)
+    :param quick: smallest parameters only
+    :return: generator of (name, params dict)
+    """
+    for name in names or BENCHMARKS.keys():
+        fn, grid = BENCHMARKS[name]
+        values = [[v[0]] if quick else v for v in grid.values()]
+        for combination in itertools.product(*values):
+            yield name, dict(zip(grid.keys(), combination))
+
+
+def measure(name: str, params: dict, repeat: int = 5) -> dict:
+    """
+    Check then time one benchmark case
+    :return: result dict (times in microseconds per call)
+    """
+    run, check = BENCHMARKS[name][0](**params)
+    check()
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    times = [o / number * 1e6 for o in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "benchmark": name,
+        "params": params,
+        "min_us": round(min(times), 3),
+        "median_us": round(float(np.median(times)), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run micro-benchmarks")
+    parser.add_argument("benchmark", nargs="*", help=f"benchmark names (default: {' '.join(BENCHMARKS.keys())})")
+    parser.add_argument("--quick", action="store_true", help="smallest parameters only")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slow down allowed (default 0.2)")
+    args = parser.parse_args()
+
+    results = []
+    for name, params in cases(args.benchmark, args.quick):
+        result = measure(name, params)
+        results.append(result)
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{name:<22}{label:<28}{result['median_us']:>14.3f} us")
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = {(o["benchmark"], json.dumps(o["params"], sort_keys=True)): o for o in json.load(file)}
+        regressed = False
+        for result in results:
+            base = baseline.get((result["benchmark"], json.dumps(result["params"], sort_keys=True)))
+            if base is not None and result["median_us"] > base["median_us"] * (1 + args.tolerance):
+                regressed = True
+                print(f"REGRESSION {result['benchmark']} {result['params']}: {base['median_us']} -> {result['median_us']} us")
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: scenario.py
+Description: Build, run and compare end-to-end benchmark scenarios
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+from welfareobs.bench.synthetic import make_projection
+from welfareobs.runner import Runner
+from welfareobs.utils.config import Config
+
+
+SCENARIO_ROOT = os.path.join(os.path.dirname(__file__), "scenarios")
+
+"""
+A scenario file looks like this (all values optional except name):
+    {
+      "name": "three-cameras",
+      "cameras": "3",
+      "individuals": "4",
+      "width": "384",
+      "height": "384",
+      "iterations": "200",
+      "warmup": "20",
+      "threadpool-size": "0",
+      "seed": "1"
+    }
+
+The pipeline is the production one with the camera and detection steps replaced:
+    SyntheticCameraHandler x cameras -> StubDetectionHandler -> LocationHandler x cameras
+    -> AggregatorHandler -> SaveIntersectHandler
+"""
+DEFAULTS = {
+    "cameras": 3,
+    "individuals": 4,
+    "width": 384,
+    "height": 384,
+    "iterations": 200,
+    "warmup": 20,
+    "threadpool-size": 0,
+    "seed": 1
+}
+# metric -> direction that counts as worse (+1 higher is worse, -1 lower is worse)
+METRICS = {
+    "throughput_fps": -1,
+    "p50_ms": 1,
+    "p99_ms": 1,
+    "peak_rss_mb": 1
+}
+
+
+def scenarios() -> list[str]:
+    """
+    :return: names of the bundled scenarios
+    """
+    return sorted(o[:-5] for o in os.listdir(SCENARIO_ROOT) if o.endswith(".json"))
+
+
+def load_scenario(name: str) -> dict:
+    """
+    :param name: bundled scenario name or a scenario JSON filename
+    :return: scenario settings (with defaults)
+    """
+    filename = name if name.endswith(".json") else os.path.join(SCENARIO_ROOT, f"{name}.json")
+    cnf = Config(filename)
+    output = {"name": cnf.as_string("name")}
+    for key, value in DEFAULTS.items():
+        output[key] = cnf.as_int(key) if cnf.exists(key) else value
+    return output
+
+
+def _write(filename: str, src: dict) -> str:
+    with open(filename, "w") as file:
+        json.dump(src, file, indent=2)
+    return filename
+
+
+def build_pipeline(scenario: dict, root: str) -> str:
+    """
+    Write the pipeline config (and every handler config) for a scenario
+    :param scenario: from load_scenario()
+    :param root: working directory
+    :return: pipeline config filename
+    """
+    cameras = [f"camera-{o + 1}" for o in range(scenario["cameras"])]
+    locations = [f"location-{o + 1}" for o in range(scenario["cameras"])]
+    size = {"width": str(scenario["width"]), "height": str(scenario["height"])}
+    pipeline = {
+        "settings": {
+            "configuration-name": scenario["name"],
+            "performance-history-size": str(scenario["iterations"]),
+            "performance-exact-statistics": "True",
+            "threadpool-size": str(scenario["threadpool-size"])
+        },
+        "pipeline": ["step-1", "step-2", "step-3", "step-4", "step-5"],
+        "step-1": cameras,
+        "step-2": ["detection"],
+        "step-3": locations,
+        "step-4": ["aggregator"],
+        "step-5": ["local-save"],
+        "detection": {
+            "handler": "welfareobs.bench.synthetic.StubDetectionHandler",
+            "input": cameras,
+            "config": _write(os.path.join(root, "detection.json"), {
+                **size,
+                "individuals": str(scenario["individuals"]),
+                "seed": str(scenario["seed"])
+            })
+        },
+        "aggregator": {
+            "handler": "welfareobs.handlers.aggregator.AggregatorHandler",
+            "input": locations,
+            "config": _write(os.path.join(root, "aggregator.json"), {
+                "dbscan-eps": "2.0",
+                "min-samples": "1",
+                "individuals": [f"individual-{o + 1}" for o in range(scenario["individuals"])]
+            })
+        },
+        "local-save": {
+            "handler": "welfareobs.handlers.filesystem.SaveIntersectHandler",
+            "input": "aggregator",
+            "config": os.path.join(root, "output.csv")
+        }
+    }
+    for index, (camera, location) in enumerate(zip(cameras, locations)):
+        projection = os.path.join(root, f"{camera}.pkl")
+        make_projection(projection, scenario["width"], scenario["height"])
+        pipeline[camera] = {
+            "handler": "welfareobs.bench.synthetic.SyntheticCameraHandler",
+            "config": _write(os.path.join(root, f"{camera}.json"), {**size, "seed": str(scenario["seed"] + index)})
+        }
+        pipeline[location] = {
+            "handler": "welfareobs.handlers.location.LocationHandler",
+            "input": "detection",
+            "config": _write(os.path.join(root, f"{location}.json"), {
+                "camera-name": camera,
+                "camera-projection-filename": projection,
+                "y-mask-clipping-threshold": "5",
+                "target-width": size["width"],
+                "target-height": size["height"],
+                "debug-enable": "False"
+            })
+        }
+    return _write(os.path.join(root, "pipeline.json"), pipeline)
+
+
+def run_scenario(name: str) -> dict:
+    """
+    Run a scenario in this process (use a fresh process per scenario so peak RSS is meaningful)
+    :param name: bundled scenario name or scenario JSON filename
+    :return: result dict
+    """
+    scenario = load_scenario(name)
+    with tempfile.TemporaryDirectory() as root:
+        runner = Runner(Config(build_pipeline(scenario, root)))
+        runner.run(run_count=scenario["warmup"] + scenario["iterations"])
+    # the exact monitor keeps the last `iterations` runs, i.e. everything after the warm-up
+    times = np.array(list(runner.performance)) * 1e3
+    return {
+        "scenario": scenario["name"],
+        "iterations": len(times),
+        "throughput_fps": round(float(len(times) / (times.sum() / 1e3)), 3),
+        "p50_ms": round(float(np.percentile(times, 50)), 3),
+        "p99_ms": round(float(np.percentile(times, 99)), 3),
+        # ru_maxrss is KB on linux and bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+    }
+
+
+def environment() -> dict:
+    return {
+        "timestamp": datetime.now().isoformat(" ", "seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.1) -> list[str]:
+    """
+    Compare results against a baseline (both {"results": {scenario: result}})
+    :param tolerance: relative change allowed before a metric is a regression
+    :return: list of regression messages (empty if none)
+    """
+    output = []
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric, worse in METRICS.items():
+            if base.get(metric, 0) <= 0:
+                continue
+            change = (result[metric] - base[metric]) / base[metric]
+            if change * worse > tolerance:
+                output.append(f"{name}: {metric} {base[metric]} -> {result[metric]} ({change:+.1%})")
+    return output
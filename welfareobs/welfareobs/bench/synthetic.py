@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: synthetic.py
+Description: Synthetic camera and stub detector handlers (no dataset, no model) for benchmarking
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+import numpy as np
+from PIL import Image
+from welfareobs.handlers.abstract_handler import AbstractHandler
+from welfareobs.models.frame import Frame
+from welfareobs.models.individual import Individual
+from welfareobs.utils.projection_transformer import ProjectionTransformer
+
+
+@dataclass(frozen=True, slots=True)
+class SyntheticCameraConfig:
+    width: int
+    height: int
+    seed: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class StubDetectionConfig:
+    width: int
+    height: int
+    individuals: int
+    seed: int = 0
+
+
+def make_projection(filename: str, width: int, height: int):
+    """
+    Calibrate and save a ProjectionTransformer for a camera looking down on the lower half of the frame
+    (the same LUT LocationHandler loads for a real camera)
+    :param filename: output .pkl
+    :param width: camera image width
+    :param height: camera image height
+    :return: None
+    """
+    pt = ProjectionTransformer()
+    pt.calibrate(
+        width,
+        height,
+        north_west=(int(width * 0.40), int(height * 0.55)),
+        south_west=(int(width * 0.35), int(height * 0.75)),
+        north_east=(int(width * 0.60), int(height * 0.55)),
+        south_east=(int(width * 0.65), int(height * 0.75)),
+        overlay_resolution=2048
+    )
+    pt.save(filename)
+
+
+def giraffe_mask(width: int, height: int, cx: int, cy: int, size: int) -> np.ndarray:
+    """
+    Boolean (height, width) mask shaped roughly like a giraffe side-on: an elliptical body, a neck and
+    four legs, with the feet (the lower intersect LocationHandler extracts) at cy
+    """
+    yy, xx = np.ogrid[:height, :width]
+    body_y = cy - size
+    mask = ((xx - cx) / size) ** 2 + ((yy - body_y) / (size * 0.45)) ** 2 <= 1.0
+    neck_x = cx + int(size * 0.7)
+    mask |= (xx >= neck_x) & (xx < neck_x + max(2, size // 5)) & (yy >= body_y - size * 2) & (yy <= body_y)
+    for leg in [-0.7, -0.4, 0.4, 0.7]:
+        leg_x = cx + int(size * leg)
+        mask |= (xx >= leg_x) & (xx < leg_x + max(2, size // 8)) & (yy >= body_y) & (yy <= cy)
+    return mask
+
+
+class SyntheticCameraHandler(AbstractHandler):
+    """
+    INPUT: Nothing
+    OUTPUT: Frame with a fixed noise image and an advancing timestamp
+    JSON config param is a config filename:
+        {
+          "width": "384",
+          "height": "384",
+          "seed": "1"
+        }
+    """
+    CONFIG = SyntheticCameraConfig
+
+    def __init__(self, name: str, inputs: list[str], param: str):
+        super().__init__(name, inputs, param)
+        self.__image = None
+        self.__timestamp = datetime(2025, 1, 1, 8, 0, 0)
+
+    def setup(self):
+        cnf: SyntheticCameraConfig = self.config
+        rng = np.random.default_rng(cnf.seed)
+        self.__image = Image.fromarray(
+            rng.integers(0, 255, (cnf.height, cnf.width, 3), dtype=np.uint8)
+        )
+
+    def run(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def set_inputs(self, values: list):
+        pass
+
+    def get_output(self) -> any:
+        output = Frame(self.__image, self.name, self.__timestamp)
+        self.__timestamp = self.__timestamp + timedelta(seconds=1)
+        return output
+
+
+class StubDetectionHandler(AbstractHandler):
+    """
+    INPUT: frames from multiple cameras
+    OUTPUT: list of Individual, one per identity per camera, with fresh full-frame masks every run
+    JSON config param is a config filename:
+        {
+          "width": "384",
+          "height": "384",
+          "individuals": "4",
+          "seed": "1"
+        }
+
+    Individuals wander a few pixels per run so the masks (and the location work) change every iteration.
+    """
+    CONFIG = StubDetectionConfig
+
+    def __init__(self, name: str, inputs: list[str], param: str):
+        super().__init__(name, inputs, param)
+        self.__frames: list[Frame] = []
+        self.__buffer: list[Individual] = []
+        self.__width: int = 0
+        self.__height: int = 0
+        self.__positions: dict[tuple[str, int], np.ndarray] = {}
+        self.__sizes: dict[int, int] = {}
+        self.__rng = None
+
+    def setup(self):
+        cnf: StubDetectionConfig = self.config
+        self.__width = cnf.width
+        self.__height = cnf.height
+        self.__rng = np.random.default_rng(cnf.seed)
+        for identity in range(1, cnf.individuals + 1):
+            self.__sizes[identity] = int(self.__rng.integers(self.__width // 24, self.__width // 12))
+
+    def run(self):
+        output: list[Individual] = []
+        for frame in self.__frames:
+            for identity, size in self.__sizes.items():
+                key = (frame.camera_name, identity)
+                if key not in self.__positions:
+                    self.__positions[key] = np.array([
+                        self.__rng.integers(int(self.__width * 0.3), int(self.__width * 0.7)),
+                        self.__rng.integers(int(self.__height * 0.6), int(self.__height * 0.8))
+                    ])
+                position = np.clip(
+                    self.__positions[key] + self.__rng.integers(-2, 3, 2),
+                    [size * 2, size * 3],
+                    [self.__width - size * 2, self.__height - 1]
+                )
+                self.__positions[key] = position
+                mask = giraffe_mask(self.__width, self.__height, int(position[0]), int(position[1]), size)
+                output.append(
+                    Individual(
+                        camera_name=frame.camera_name,
+                        confidence=float(self.__rng.uniform(0.6, 0.99)),
+                        identity=identity,
+                        species=0,
+                        x_min=float(position[0] - size),
+                        y_min=float(position[1] - size * 3),
+                        x_max=float(position[0] + size * 2),
+                        y_max=float(position[1]),
+                        mask=mask,
+                        timestamp=frame.timestamp
+                    )
+                )
+        self.__buffer = output
+
+    def teardown(self):
+        pass
+
+    def set_inputs(self, values: list):
+        self.__frames = values
+
+    def get_output(self) -> any:
+        return self.__buffer
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: amp_trainer.py
+Description: wildlife-tools BasicTrainer with mixed precision, channels_last and per-epoch throughput
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import os
+import time
+import numpy as np
+import torch
+from torch import nn
+from wildlife_tools.train import BasicTrainer
+
+
+class AmpTrainer(BasicTrainer):
+    """
+    Same training loop as BasicTrainer (gradient accumulation, clipping at 1, scheduler stepped per epoch)
+    with:
+        amp             backbone forward under torch.autocast (float16 with a GradScaler, or bfloat16
+                        which needs no scaling), the loss in float32
+        channels_last   model and batches in NHWC, which the tensor core convolution kernels prefer
+    and every epoch reports images_per_second and peak_memory_mb (CUDA) in the epoch data handed to
+    epoch_callback. Gradient checkpointing is set on the timm backbone by the caller
+    (backbone.set_grad_checkpointing()), it trades a second forward for the activation memory.
+
+    The GradScaler state is saved in the checkpoint (save/load), so a resumed float16 run carries on with the
+    scale it had calibrated.
+    """
+    AMP_DTYPES = ["float16", "bfloat16"]
+
+    def __init__(self, *args, amp: bool = False, amp_dtype: str = "float16", channels_last: bool = False, **kwargs):
+        if amp_dtype not in AmpTrainer.AMP_DTYPES:
+            raise ValueError(f"Unsupported amp dtype `{amp_dtype}` (use {' or '.join(AmpTrainer.AMP_DTYPES)})")
+        super().__init__(*args, **kwargs)
+        self.amp: bool = amp
+        self.amp_dtype: torch.dtype = getattr(torch, amp_dtype)
+        self.channels_last: bool = channels_last
+        self.device_type: str = str(self.device).split(":")[0]
+        self.scaler = torch.amp.GradScaler(
+            self.device_type,
+            enabled=amp and self.amp_dtype == torch.float16 and self.device_type == "cuda"
+        )
+
+    def train_epoch(self, loader):
+        model = self.model.train()
+        if self.channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        cuda = self.device_type == "cuda"
+        if cuda:
+            torch.cuda.reset_peak_memory_stats(self.device)
+        losses = []
+        images = 0
+        start = time.perf_counter()
+        for i, (x, y) in enumerate(loader):
+            x = x.to(self.device, non_blocking=True)
+            y = y.to(self.device, non_blocking=True)
+            if self.channels_last:
+                x = x.contiguous(memory_format=torch.channels_last)
+            with torch.autocast(device_type=self.device_type, dtype=self.amp_dtype, enabled=self.amp):
+                embeddings = model(x)
+            # the ArcFace margin is computed in float32 (the scaled logits overflow float16)
+            loss = self.objective(embeddings.float(), y)
+            self.scaler.scale(loss).backward()
+            if (i - 1) % self.accumulation_steps == 0:
+                # the clip threshold applies to the real gradients, not the scaled ones
+                self.scaler.unscale_(self.optimizer)
+                nn.utils.clip_grad_norm_(model.parameters(), 1)
+                self.scaler.step(self.optimizer)
+                self.scaler.update()
+                self.optimizer.zero_grad(set_to_none=True)
+            losses.append(loss.detach())
+            images += len(x)
+        if cuda:
+            torch.cuda.synchronize(self.device)
+        seconds = time.perf_counter() - start
+        if self.scheduler:
+            self.scheduler.step()
+        return {
+            "train_loss_epoch_avg": float(torch.stack(losses).float().mean().cpu()) if len(losses) > 0 else np.nan,
+            "images_per_second": images / seconds if seconds > 0 else 0.0,
+            "peak_memory_mb": torch.cuda.max_memory_allocated(self.device) / 2 ** 20 if cuda else 0.0
+        }
+
+    def save(self, folder, file_name="checkpoint.pth", **kwargs):
+        super().save(folder, file_name=file_name, **kwargs)
+        if self.scaler.is_enabled():
+            # BasicTrainer writes the checkpoint itself, the scaler state is added to it
+            filename = os.path.join(folder, file_name)
+            checkpoint = torch.load(filename, weights_only=False, map_location="cpu")
+            checkpoint["scaler"] = self.scaler.state_dict()
+            torch.save(checkpoint, filename)
+
+    def load(self, path, **kwargs):
+        super().load(path, **kwargs)
+        if self.scaler.is_enabled():
+            checkpoint = torch.load(path, weights_only=False, map_location="cpu")
+            if "scaler" in checkpoint:
+                self.scaler.load_state_dict(checkpoint["scaler"])
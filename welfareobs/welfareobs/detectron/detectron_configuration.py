@@ -38,7 +38,7 @@ from detectron2.modeling.roi_heads import (
 
 from welfareobs.detectron.re_id_head import ReIdHead
 from welfareobs.detectron.re_id_roi_heads import ReIdROIHeads
-from wildlife_tools.data import FeatureDataset
+from welfareobs.utils.gallery import load_gallery
 
 
 # this comes from Detectron2
@@ -58,8 +58,14 @@ def get_configuration(
         root: str,
         backbone: str = "hf-hub:BVRA/wildlife-mega-L-384",
         dimensions: int = 384,
-        device: str = "cuda"
+        device: str = "cuda",
+        pretrained: bool = True
 ):
+    """
+    :param root: ReID model root (checkpoint.pth and the gallery, similarity.npy or similarity.pkl)
+    :param backbone: timm model name
+    :param pretrained: False builds the model without any weights (loaded from the model cache instead)
+    """
     return L(GeneralizedRCNN)(
         backbone=L(FPN)(
             bottom_up=L(ResNet)(
@@ -134,13 +140,12 @@ def get_configuration(
             reid_head=L(ReIdHead)(
                 input_dim=dimensions,
                 model_name=backbone,
-                checkpoint_filename=os.path.join(root, "checkpoint.pth"),
+                checkpoint_filename=os.path.join(root, "checkpoint.pth") if pretrained else None,
+                pretrained=pretrained,
                 batch_size=1,
                 num_workers=1,
                 device=device,
-                features_database=L(FeatureDataset.from_file)(
-                    path=os.path.join(root, "similarity.pkl")
-                )
+                features_database=L(load_gallery)(root=root)
             ),
             device=device,
             classes_to_reid=[23, 24, 25]  #23 on CUDA - somehow CPU breaks this.
@@ -40,13 +40,24 @@ class ReIdHead(nn.Module):
                  batch_size: int = 128,
                  num_workers: int = 1,
                  device: str = "cuda",
-                 features_database: FeatureDataset|None = None
+                 features_database: FeatureDataset|None = None,
+                 pretrained: bool = True
                  ):
+        """
+        :param model_name: timm model name (hf-hub:... or a timm architecture)
+        :param checkpoint_filename: fine-tuned weights, the pretrained weights are not fetched when given
+        :param pretrained: False builds the architecture only (the weights are loaded from the model cache)
+        :param features_database: the gallery, a FeatureDataset or a welfareobs.utils.gallery.Gallery
+        """
         super().__init__()
         # we expose this for pre-run validation only
         print(f"Using device: {device}")
         self.input_dim = input_dim
-        intermediate_model = timm.create_model(model_name, pretrained=True, num_classes=0)
+        # the pretrained weights would be overwritten by the checkpoint straight away, so don't download them
+        intermediate_model = timm.create_model(model_name, pretrained=pretrained and checkpoint_filename is None, num_classes=0)
+        # the plain timm architecture (hf-hub:BVRA/wildlife-mega-L-384 -> swin_large_patch4_window12_384)
+        # rebuilds this model without resolving the hub
+        self.architecture: str = getattr(intermediate_model, "pretrained_cfg", {}).get("architecture", model_name)
         if checkpoint_filename is not None:
             intermediate_model.load_state_dict(torch.load(checkpoint_filename, weights_only=False, map_location=torch.device(device))['model'])
         self.extractor = DeepFeatures(
@@ -34,6 +34,7 @@ import json
 import matplotlib.pyplot as plt
 import numpy as np
 from welfareobs.utils.bgr_transform import BGRTransform 
+from welfareobs.utils.torch_profiler import label
 import torchvision.transforms as T
 
 
@@ -85,6 +86,14 @@ class ReIdROIHeads(StandardROIHeads):
             T.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)), # renormalise fragments as RGB      
         ])
 
+    def _forward_box(self, features: dict[str, torch.Tensor], proposals: list[Instances]):
+        with label("roi_heads.box"):
+            return super()._forward_box(features, proposals)
+
+    def _forward_mask(self, features: dict[str, torch.Tensor], instances: list[Instances]):
+        with label("roi_heads.mask"):
+            return super()._forward_mask(features, instances)
+
     def forward(
             self,
             images: ImageList,
@@ -101,27 +110,29 @@ class ReIdROIHeads(StandardROIHeads):
             mask_logits = instances[ptr].pred_masks  # Shape: (N, 1, H, W)
             reid_embeddings = [torch.tensor(-1)] * mask_logits.shape[0]
             reid_proposals = {}
-            for i in range(mask_logits.shape[0]):  # Process each detected instance
-                # Don't bother trying to reid anything we are not interested in
-                c = instances[ptr].pred_classes[i]  
-                if c not in self.classes_to_reid:
-                    continue
-                # convert to a set of proposals (multiple individuals)
-                x1, y1, x2, y2 = instances[ptr].pred_boxes[i].tensor[0].cpu().numpy()
-                x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
-                cropped_region = images[ptr][:,y1:y2, x1:x2]
-                # cropped_region = F.interpolate(
-                #     cropped_region.unsqueeze(0),
-                #     size=(self.reid_head.input_dim, self.reid_head.input_dim),
-                #     mode="bilinear",
-                #     align_corners=False
-                # )
-                reid_proposals[i] = self.reid_tx(cropped_region).unsqueeze(0) # Add zero batch to left
-                # debug reid proposals
-                # print(reid_proposals[i].shape)
-                # self.dump_crop(reid_proposals[i])
+            with label("reid.crop"):
+                for i in range(mask_logits.shape[0]):  # Process each detected instance
+                    # Don't bother trying to reid anything we are not interested in
+                    c = instances[ptr].pred_classes[i]  
+                    if c not in self.classes_to_reid:
+                        continue
+                    # convert to a set of proposals (multiple individuals)
+                    x1, y1, x2, y2 = instances[ptr].pred_boxes[i].tensor[0].cpu().numpy()
+                    x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
+                    cropped_region = images[ptr][:,y1:y2, x1:x2]
+                    # cropped_region = F.interpolate(
+                    #     cropped_region.unsqueeze(0),
+                    #     size=(self.reid_head.input_dim, self.reid_head.input_dim),
+                    #     mode="bilinear",
+                    #     align_corners=False
+                    # )
+                    reid_proposals[i] = self.reid_tx(cropped_region).unsqueeze(0) # Add zero batch to left
+                    # debug reid proposals
+                    # print(reid_proposals[i].shape)
+                    # self.dump_crop(reid_proposals[i])
             if len(reid_proposals.keys()) > 0:
-                tmp_embeddings = self.reid_head.forward([(reid_proposals[o],0) for o in reid_proposals.keys()])
+                with label("reid.head"):
+                    tmp_embeddings = self.reid_head.forward([(reid_proposals[o],0) for o in reid_proposals.keys()])
                 for index, offset in enumerate(reid_proposals.keys()):
                     reid_embeddings[offset] = torch.tensor(int(tmp_embeddings[index]))
                 # We add a new field to Detectron instances object - this needs to be a Tensor loaded into the GPU!
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """
-Module Name: 
-Description: 
+Module Name: welfareobs_dataset.py
+Description: WelfareObs COCO annotations as a wildlife-tools dataset, optionally read from preprocessed shards
 
 Copyright (C) 2025 J.Cincotta
 
@@ -27,6 +27,8 @@ from wildlife_tools.data import WildlifeDataset
 from wildlife_datasets.datasets import utils
 from typing import Callable
 import pandas as pd
+from PIL import Image
+from welfareobs.utils.image_shards import ShardedImages, write_shards
 
 
 class WelfareObsDataset(WildlifeDataset):
@@ -50,6 +52,8 @@ class WelfareObsDataset(WildlifeDataset):
         col_path: Column name in the metadata containing image file paths.
         col_label: Column name in the metadata containing class labels.
         load_label: If False, \_\_getitem\_\_ returns only image instead of (image, label) tuple.
+        preprocessed: Directory written by preprocess(). Images are then read from its memory-mapped
+            shards (already cropped and resized, no JPEG decoding) instead of the image files.
 
     Attributes:
         labels np.array : An integers array of ordinal encoding of labels.
@@ -66,6 +70,7 @@ class WelfareObsDataset(WildlifeDataset):
             col_path: str = "path",
             col_label: str = "identity",
             load_label: bool = True,
+            preprocessed: str | None = None,
     ):
         # old pure CSV file version
         # metadata: pd.DataFrame = pd.read_csv(metadata_filename)
@@ -105,4 +110,50 @@ class WelfareObsDataset(WildlifeDataset):
         # df = df.drop(['image_id', 'file_name', 'supercategory', 'category_id'], axis=1)
         df.rename({'id': 'image_id'}, axis=1, inplace=True)
         super().__init__(df, path_images, transform, img_load, col_path, col_label, load_label)
+        self.__path_images: str = path_images
+        self.__img_load: str = img_load
+        self.__shards: ShardedImages | None = None
+        if preprocessed is not None:
+            shards = ShardedImages(preprocessed)
+            if shards.meta.get("img_load") != img_load or shards.keys != self.__keys():
+                raise ValueError(f"{preprocessed} was not preprocessed from {path_json} ({img_load}), run preprocess() again")
+            self.__shards = shards
+
+    def __keys(self) -> list[str]:
+        paths = [os.path.relpath(o, self.__path_images) for o in self.metadata["path"]]
+        if self.__img_load == "full":
+            return paths
+        return [f"{path}#{','.join(str(v) for v in bbox)}" for path, bbox in zip(paths, self.metadata["bbox"])]
+
+    def __load(self, row: int) -> Image.Image:
+        image = Image.open(self.metadata["path"].iloc[row]).convert("RGB")
+        if self.__img_load == "bbox":
+            x, y, w, h = self.metadata["bbox"].iloc[row]
+            image = image.crop((x, y, x + w, y + h))
+        return image
+
+    def preprocess(self, directory: str, size: int, shard_size: int = 1024, workers: int = 8):
+        """
+        Decode, crop and resize every image once into memory-mapped uint8 shards (see utils/image_shards.py)
+        that the dataset then reads with preprocessed=directory. Only the "full" and "bbox" img_load methods
+        are supported. Rerun after the annotations or images change.
+        :param size: square side, the resize the transform would do (e.g. 384)
+        :param workers: decoding threads
+        """
+        if self.__img_load not in ("full", "bbox"):
+            raise ValueError(f"img_load {self.__img_load} cannot be preprocessed")
+        keys = self.__keys()
+        rows = {key: row for row, key in enumerate(keys)}
+        write_shards(directory, keys, lambda key: self.__load(rows[key]), size, shard_size, workers,
+                     {"img_load": self.__img_load})
+
+    def __getitem__(self, idx):
+        if self.__shards is None:
+            return super().__getitem__(idx)
+        img = self.__shards.image(idx)
+        if self.transform:
+            img = self.transform(img)
+        if self.load_label:
+            return img, self.labels[idx]
+        return img
         
\ No newline at end of file
@@ -20,13 +20,19 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 """
 from abc import ABC, abstractmethod
+from welfareobs.utils.config_schema import parse_file
 
 
 class AbstractHandler(ABC):
+    # schema dataclass for the JSON config file named by param (see utils/config_schema.py),
+    # None for handlers whose param is not a config file
+    CONFIG: type|None = None
+
     def __init__(self, name: str, inputs: list[str], param: str):
         self.__name: str = name
         self.__inputs: list[str] = inputs
         self.__param: str = param
+        self.__config: any = None
 
     @property
     def name(self) -> str:
@@ -36,6 +42,23 @@ class AbstractHandler(ABC):
     def param(self) -> str:
         return self.__param
 
+    @property
+    def config(self) -> any:
+        """
+        Typed config (an instance of CONFIG), parsed from param on first use unless the runner has
+        already supplied the validated one
+        """
+        if self.__config is None and type(self).CONFIG is not None:
+            self.__config = parse_file(type(self).CONFIG, self.__param)
+        return self.__config
+
+    def configure(self, config: any):
+        """
+        Supply the already validated config (the runner parses every handler config up front)
+        :param config: instance of CONFIG
+        """
+        self.__config = config
+
     @abstractmethod
     def setup(self):
         pass
@@ -48,6 +71,37 @@ class AbstractHandler(ABC):
     def teardown(self):
         pass
 
+    def warmup(self):
+        """
+        Called once after every handler has been set up and before the first iteration. Handlers that pay a
+        first call cost (e.g. CUDA kernel selection) can run dummy work here, the default is to do nothing.
+        """
+        pass
+
+    def reload_files(self) -> list[str]:
+        """
+        Data files that can be reloaded without a restart (see utils/hot_reload.py), default none
+        """
+        return []
+
+    def reload(self, filename: str) -> callable:
+        """
+        Called on the reload thread when one of reload_files() has changed. Build the new state here and
+        return a function that swaps it in; the runner calls that between iterations, so it must be quick
+        (an assignment). Raise to keep the current state.
+        :param filename: the file that changed
+        :return: swap function, or None if there is nothing to swap
+        """
+        return None
+
+    def set_memory_pressure(self, level: int):
+        """
+        Called by the runner when the memory budget pressure changes (see utils/memory_accountant.py).
+        Handlers that hold large buffers can degrade (e.g. shed frames), the default is to do nothing.
+        :param level: PRESSURE_NONE, PRESSURE_SOFT or PRESSURE_HARD
+        """
+        pass
+
     def required_jobs_for_inputs(self) -> list[str]:
         return self.__inputs
 
@@ -20,13 +20,23 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 """
 
-from sklearn.cluster import DBSCAN
 import numpy as np
 from numpy.exceptions import AxisError
 from welfareobs.handlers.abstract_handler import AbstractHandler
 from welfareobs.models.intersect import Intersect
-from welfareobs.utils.config import Config
 from datetime import datetime
+from dataclasses import dataclass, field
+from welfareobs.utils.logger import get_logger, every
+
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class AggregatorConfig:
+    dbscan_eps: float
+    min_samples: int
+    individuals: list[str] = field(default_factory=list)
 
 
 class AggregatorHandler(AbstractHandler):
@@ -35,6 +45,10 @@ class AggregatorHandler(AbstractHandler):
     OUTPUT: single array of intersect dataclass, one for each individual
     JSON config param is configuration filename to configure the DBSCAN
 
+    Each output Intersect also carries a fused location and uncertainty. Every point from every camera is
+    weighted by the detection confidence and the LUT weight of its source pixel, and the weighted mean and
+    standard error are computed for all individuals at once (see fuse).
+
     aggregator configuration file looks like this:
     {
       "dbscan-eps": "2.0",
@@ -42,6 +56,8 @@ class AggregatorHandler(AbstractHandler):
       "individuals": ["Zarafa", "Ebo", "Jimiyu", "Kito"]  
     }    
     """
+    CONFIG = AggregatorConfig
+
     def __init__(self, name: str, inputs: list[str], param: str):
         super().__init__(name, inputs, param)
         self.__individuals: {str,list[Intersect]} = {}
@@ -51,14 +67,19 @@ class AggregatorHandler(AbstractHandler):
         self.__names: list = []
 
     def setup(self):
-        cnf: Config = Config(self.param)
-        self.__dbscan_eps = cnf.as_float("dbscan-eps")
-        self.__min_samples = cnf.as_int("min-samples")
-        self.__names = cnf.as_list("individuals")
+        cnf: AggregatorConfig = self.config
+        self.__dbscan_eps = cnf.dbscan_eps
+        self.__min_samples = cnf.min_samples
+        self.__names = cnf.individuals
 
     def run(self):
-        print(f" - Aggregator got {len(self.__individuals.keys())} giraffe")
+        from sklearn.cluster import DBSCAN  # deferred, importing sklearn takes longer than validating the pipeline
+        log.debug("Aggregator got %d giraffe", len(self.__individuals))
         self.__output = []
+        identities, locations, uncertainties = self.fuse(
+            [element for elements in self.__individuals.values() for element in elements]
+        )
+        fused = {identity: (tuple(location), uncertainty) for identity, location, uncertainty in zip(identities, locations, uncertainties)}
         for individual in self.__individuals.keys():
             try:
                 # use some fancy list comprehension to expand all the intersect arrays in all the intersect classes
@@ -66,10 +87,61 @@ class AggregatorHandler(AbstractHandler):
                 mask = ~np.isnan(coords).all(axis=1)
                 d: DBSCAN = DBSCAN(eps=self.__dbscan_eps, min_samples=self.__min_samples)
                 d.fit_predict(coords[mask])
-                print(f" - Coordinates for {self.__names[individual - 1]}: source={coords.shape} valid={coords[mask].shape} clustered={d.components_.shape}")
-                self.__output.append(Intersect(individual, intersect=[tuple(coord) for coord in d.components_], timestamp=self.__individuals[individual][0].timestamp))
+                log.debug("Coordinates for %s: source=%s valid=%s clustered=%s", self.__names[individual - 1],
+                          coords.shape, mask.sum(), d.components_.shape)
+                location, uncertainty = fused[individual]
+                self.__output.append(
+                    Intersect(
+                        individual,
+                        intersect=[tuple(coord) for coord in d.components_],
+                        timestamp=self.__individuals[individual][0].timestamp,
+                        confidence=max(element.confidence for element in self.__individuals[individual]),
+                        location=location,
+                        uncertainty=uncertainty
+                    )
+                )
             except AxisError as err:
-                print(f" - Coordinates for {self.__names[individual - 1]} failed. {err}")
+                log.warning("Coordinates for %s failed. %s", self.__names[individual - 1], err, extra=every(10.0))
+
+    def fuse(self, intersects: list[Intersect]) -> (list, np.ndarray, np.ndarray):
+        """
+        Weighted multi-camera fusion of intersect points, vectorised over all identities.
+        Point weight is the detection confidence multiplied by the LUT weight of the source pixel (1 if the
+        intersect has no weights). Uncertainty is the standard error of the weighted mean (radial, XZ units),
+        using the effective sample size of the weights.
+        :param intersects: flat list of Intersect from every camera
+        :return: (identities, locations [K, 2], uncertainties [K]) with NaN for identities with no valid points
+        """
+        identities = list(dict.fromkeys(element.identity for element in intersects))
+        if len(identities) == 0:
+            return identities, np.empty((0, 2)), np.empty(0)
+        lookup = {identity: index for index, identity in enumerate(identities)}
+        coords, weights, labels = [], [], []
+        for element in intersects:
+            xz = np.asarray(element.intersect, dtype=np.float64).reshape(-1, 2)
+            w = np.ones(len(xz)) if element.weights is None else np.asarray(element.weights, dtype=np.float64).reshape(-1)
+            coords.append(xz)
+            weights.append(w * element.confidence)
+            labels.append(np.full(len(xz), lookup[element.identity], dtype=np.intp))
+        coords = np.concatenate(coords)
+        weights = np.concatenate(weights)
+        labels = np.concatenate(labels)
+        valid = ~np.isnan(coords).any(axis=1) & np.isfinite(weights) & (weights > 0)
+        coords, weights, labels = coords[valid], weights[valid], labels[valid]
+        k = len(identities)
+        sum_w = np.bincount(labels, weights=weights, minlength=k)
+        sum_w2 = np.bincount(labels, weights=weights * weights, minlength=k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            locations = np.stack([
+                np.bincount(labels, weights=weights * coords[:, 0], minlength=k) / sum_w,
+                np.bincount(labels, weights=weights * coords[:, 1], minlength=k) / sum_w
+            ], axis=1)
+            residual = np.sum((coords - locations[labels]) ** 2, axis=1)
+            variance = np.bincount(labels, weights=weights * residual, minlength=k) / sum_w
+            effective_n = sum_w * sum_w / sum_w2
+            uncertainties = np.sqrt(variance / effective_n)
+        return identities, locations, uncertainties
+
     def teardown(self):
         pass
 
@@ -22,15 +22,29 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 from datetime import datetime, timedelta
 from typing import Optional
-import rtsp
 from welfareobs.models.frame import Frame
 from welfareobs.handlers.abstract_handler import AbstractHandler
 from welfareobs.utils.type_conv import to_int_brute_force
-from welfareobs.utils.config import Config
+from dataclasses import dataclass, field
 from PIL import Image
-import matplotlib.pyplot as plt
 import os
 import pathlib
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class FauxCameraConfig:
+    root: str
+    timestamp_start: str
+    timestamp_delta_seconds: int = 0
+    camera_filter: str = ""
+    hour_start_filter: int = 0
+    hour_end_filter: int = 0
+    file_types: list[str] = field(default_factory=list)
+    debug_enable: bool = False
 
 
 class CameraHandler(AbstractHandler):
@@ -42,14 +56,17 @@ class CameraHandler(AbstractHandler):
     """
     def __init__(self, name: str, inputs: [str], param: str):
         super().__init__(name, inputs, param)
-        self.__client = rtsp.Client(rtsp_server_uri=param)
+        self.__client = None
         self.__frame: Optional[any] = None
 
     def setup(self):
+        import rtsp  # deferred so validating a pipeline does not need the rtsp client
+        self.__client = rtsp.Client(rtsp_server_uri=self.param)
         self.__client.open()
 
     def teardown(self):
-        self.__client.close()
+        if self.__client is not None:
+            self.__client.close()
 
     def run(self):
         self.__frame = self.__client.read()
@@ -84,6 +101,8 @@ class FauxCameraHandler(AbstractHandler):
             "timestamp-delta-seconds": "5"
         }
     """
+    CONFIG = FauxCameraConfig
+
     def __init__(self, name: str, inputs: list[str], param: str):
         super().__init__(name, inputs, param)
         self.__files: list = []
@@ -110,23 +129,22 @@ class FauxCameraHandler(AbstractHandler):
         return files
 
     def setup(self):
-        cnf: Config = Config(self.param)
-        # use the as_string() in config to allow the element to 
-        # not be present in the config without failing.
-        print(f"root={cnf["root"]} camera-filter={cnf.as_string("camera-filter")} time-filter={cnf.as_int("hour-start-filter")}->{cnf.as_int("hour-end-filter")} Types: {cnf.as_list("file-types")}")
+        cnf: FauxCameraConfig = self.config
+        log.info("root=%s camera-filter=%s time-filter=%d->%d Types: %s", cnf.root, cnf.camera_filter,
+                 cnf.hour_start_filter, cnf.hour_end_filter, cnf.file_types)
         self.__files = self.__gather(
-            cnf["root"],
-            cnf.as_string("camera-filter"),
-            cnf.as_int("hour-start-filter"),
-            cnf.as_int("hour-end-filter"),
-            suffixes=cnf.as_list("file-types")
+            cnf.root,
+            cnf.camera_filter,
+            cnf.hour_start_filter,
+            cnf.hour_end_filter,
+            suffixes=cnf.file_types
         )
         self.__files = sorted(self.__files, key=str.lower)
         self.__index = 0
-        self.__timestamp = datetime.strptime(cnf.as_string("timestamp-start"), '%Y-%m-%d %H:%M:%S')  
-        self.__timestamp_delta_seconds = cnf.as_int("timestamp-delta-seconds")
-        self.__debug_enable = cnf.as_bool("debug-enable")
-        print(f"found {len(self.__files)} files")
+        self.__timestamp = datetime.strptime(cnf.timestamp_start, '%Y-%m-%d %H:%M:%S')
+        self.__timestamp_delta_seconds = cnf.timestamp_delta_seconds
+        self.__debug_enable = cnf.debug_enable
+        log.info("found %d files", len(self.__files))
 
     def teardown(self):
         pass
@@ -145,10 +163,11 @@ class FauxCameraHandler(AbstractHandler):
                 self.__files[self.__index]
             ),
             self.name,
-            self.__timestamp
+            self.__timestamp,
+            filename=self.__files[self.__index]
         )
         if self.__debug_enable:
-            print(f" - Filename: {self.__files[self.__index]} stamp: {self.__timestamp.timestamp()} ({self.__timestamp})")
+            log.debug("Filename: %s stamp: %s", self.__files[self.__index], self.__timestamp)
         self.__index += 1
         self.__timestamp = self.__timestamp + timedelta(seconds=self.__timestamp_delta_seconds)
         if self.__debug_enable:
@@ -158,5 +177,6 @@ class FauxCameraHandler(AbstractHandler):
     def dump_output(self, output: Frame):
         # img = (image.cpu().permute(1, 2, 0).numpy())[ :, :, [2, 1, 0]]
         # img = np.interp(img, (img.min(), img.max()), (0, 255)).astype(np.uint8)
+        import matplotlib.pyplot as plt
         plt.imshow(output.image)
         plt.show()
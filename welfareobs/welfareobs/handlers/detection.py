@@ -19,25 +19,23 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 """
+import os
 from typing import Optional
-from pyarrow import timestamp
-from welfareobs.detectron.detectron_configuration import get_configuration
-from welfareobs.detectron.detectron_calls import image_tensor, predict
-from detectron2.config import instantiate
-from detectron2.checkpoint import DetectionCheckpointer
 from welfareobs.handlers.abstract_handler import AbstractHandler
 from welfareobs.models.frame import Frame
 from welfareobs.models.individual import Individual
-from welfareobs.utils.config import Config
+from welfareobs.utils.detection_cache import DetectionCache, DetectionConfig
+from welfareobs.utils.gallery import gallery_filenames, load_gallery
+from welfareobs.utils.metrics import REGISTRY
+from welfareobs.utils.logger import get_logger
 
-import cv2
 import numpy as np
-import torch
-from PIL import Image
-import matplotlib.pyplot as plt
-from detectron2.utils.visualizer import Visualizer
-from detectron2.data.catalog import MetadataCatalog
-from detectron2.structures import Instances, Boxes
+
+# torch, detectron2, wildlife-tools and matplotlib are imported in setup() (or on first use for the
+# debug output), so importing this module to validate a pipeline config takes milliseconds, not seconds
+
+
+log = get_logger(__name__)
 
 
 class DetectionHandler(AbstractHandler):
@@ -52,10 +50,36 @@ class DetectionHandler(AbstractHandler):
           "reid-model-root": "/project/data/results/wod-md",
           "reid-timm-backbone": "hf-hub:BVRA/wildlife-mega-L-384",
           "segmentation-checkpoint": "/project/data/detectron2_models/mask_rcnn_R_101_FPN_3x/model_final_a3ec72.pkl"
-          "debug-enable": "True"
+          "debug-enable": "True",
+          "record-cache": "/project/data/detection-cache",
+          "profile-output": "/project/data/profiles",
+          "profile-skip": "10",
+          "profile-iterations": "20",
+          "warmup-iterations": "3",
+          "model-cache": "/project/data/model-cache"
         }    
-    
+
+    record-cache is optional. When set, the detections for every frame are recorded to the cache so that
+    ReplayDetectionHandler (detection_replay.py) can stream them back without the model.
+
+    profile-output is optional. When set, torch.profiler records profile-iterations runs after skipping
+    profile-skip runs, with the backbone trunk, FPN, RPN, ROI heads and ReID stages labelled
+    ("profile-memory": "True" adds allocations). Without it nothing is wrapped or labelled.
+
+    model-cache is optional. When set, the fully assembled model (Detectron2 weights and the fine-tuned ReID
+    backbone) is stored there as one safetensors artefact after the first start, and later starts build the
+    bare architecture and load that artefact instead: no hub access (works offline) and each weight is
+    read once.
+
+    The ReID gallery (<reid-model-root>/similarity.npy, or similarity.pkl from older trainings) is hot reloaded when settings.hot-reload is on.
+
+    warmup-iterations is optional. When set, blank frames are pushed through the model that many times at
+    each batch size run() will see (one frame per camera input, and a single frame when memory pressure
+    sheds frames) before the first real frame, so cuDNN algorithm selection and the CUDA allocator
+    warm-up are paid before the pipeline starts.
     """
+    CONFIG = DetectionConfig
+
     def __init__(self, name: str, inputs: list[str], param: str):
         super().__init__(name, inputs, param)
         self.__model = None
@@ -65,46 +89,156 @@ class DetectionHandler(AbstractHandler):
         self.__reid_timm_backbone: str = ""
         self.__segmentation_checkpoint: str = ""
         self.__buffer: list = []
-        self.__metadata = MetadataCatalog.get("coco_2017_val")
+        self.__metadata = None
         self.__debug_enable: bool = False
         self.__pytorch_device: str = "cuda"
+        self.__cache: DetectionCache|None = None
+        self.__profiler = None  # TorchProfiler
+        self.__shed_frames: bool = False
+        self.__next_frame: int = 0
+        self.__warmup_iterations: int = 0
+        # bound in setup() so the per-frame run() does no imports (image_tensor, predict, label)
+        self.__image_tensor: callable = None
+        self.__predict: callable = None
+        self.__label: callable = None
 
     def setup(self):
-        cnf: Config = Config(self.param)
-        self.__dimensions = cnf.as_int("dimensions")
-        self.__reid_model_root = cnf.as_string("reid-model-root")
-        self.__reid_timm_backbone = cnf.as_string("reid-timm-backbone")
-        self.__segmentation_checkpoint = cnf.as_string("segmentation-checkpoint")
-        self.__debug_enable = cnf.as_bool("debug-enable")
-        self.__pytorch_device = cnf["pytorch-device"]
-        self.__model = instantiate(
-            get_configuration(
-                self.__reid_model_root,
-                backbone=self.__reid_timm_backbone,
-                dimensions=self.__dimensions,
-                device=self.__pytorch_device
+        from detectron2.config import instantiate
+        from detectron2.checkpoint import DetectionCheckpointer
+        from welfareobs.detectron.detectron_configuration import get_configuration
+        from welfareobs.utils.torch_profiler import TorchProfiler, label_module
+        from welfareobs.utils.model_cache import ModelCache, load_model, save_model
+        from welfareobs.detectron.detectron_calls import image_tensor, predict
+        from welfareobs.utils.torch_profiler import label
+        self.__image_tensor = image_tensor
+        self.__predict = predict
+        self.__label = label
+        cnf: DetectionConfig = self.config
+        self.__dimensions = cnf.dimensions
+        self.__reid_model_root = cnf.reid_model_root
+        self.__reid_timm_backbone = cnf.reid_timm_backbone
+        self.__segmentation_checkpoint = cnf.segmentation_checkpoint
+        self.__debug_enable = cnf.debug_enable
+        self.__pytorch_device = cnf.pytorch_device
+        self.__warmup_iterations = cnf.warmup_iterations
+        if cnf.record_cache != "":
+            self.__cache = DetectionCache(cnf.record_cache, DetectionCache.model_hash(cnf, DetectionCache.memo(cnf)),
+                                          writable=True)
+        model_cache = ModelCache(cnf.model_cache) if cnf.model_cache != "" else None
+        key = DetectionCache.weights_hash(cnf, model_cache.hash_file) if model_cache is not None else ""
+        artefact = model_cache.get(key) if model_cache is not None else None
+        if artefact is not None:
+            # architecture only (no hub, no checkpoints), then every weight from the local artefact
+            self.__model = instantiate(
+                get_configuration(
+                    self.__reid_model_root,
+                    backbone=artefact["reid-architecture"],
+                    dimensions=self.__dimensions,
+                    device=self.__pytorch_device,
+                    pretrained=False
+                )
             )
-        )
-        # then load it with the pretrained backbone
-        DetectionCheckpointer(self.__model).load(self.__segmentation_checkpoint)
+            load_model(self.__model, artefact, device=self.__pytorch_device)
+            log.info("%s loaded model %s from the model cache", self.name, key)
+        else:
+            self.__model = instantiate(
+                get_configuration(
+                    self.__reid_model_root,
+                    backbone=self.__reid_timm_backbone,
+                    dimensions=self.__dimensions,
+                    device=self.__pytorch_device
+                )
+            )
+            # then load it with the pretrained backbone
+            DetectionCheckpointer(self.__model).load(self.__segmentation_checkpoint)
+            if model_cache is not None:
+                save_model(model_cache, key, self.__model, {
+                    "reid-architecture": self.__model.roi_heads.reid_head.architecture,
+                    "reid-timm-backbone": self.__reid_timm_backbone,
+                    "segmentation-checkpoint": self.__segmentation_checkpoint,
+                    # a retrained model replaces the artefact built from the same files
+                    "slot": f"{self.__segmentation_checkpoint}|{self.__reid_model_root}"
+                })
+                log.info("%s stored model %s in the model cache", self.name, key)
         self.__model.eval()
         self.__model.to(self.__pytorch_device)
+        if cnf.profile_output != "":
+            label_module(self.__model.backbone.bottom_up, "backbone.trunk")
+            label_module(self.__model.backbone, "backbone")
+            label_module(self.__model.proposal_generator, "rpn")
+            label_module(self.__model.roi_heads, "roi_heads")
+            self.__profiler = TorchProfiler(
+                cnf.profile_output,
+                self.name,
+                skip=cnf.profile_skip,
+                iterations=cnf.profile_iterations,
+                device=self.__pytorch_device,
+                profile_memory=cnf.profile_memory
+            )
+            self.__profiler.start()
+
+    def warmup(self):
+        if self.__warmup_iterations <= 0:
+            return
+        import torch
+        from PIL import Image
+        blank = self.__image_tensor(
+            Image.new("RGB", (self.__dimensions, self.__dimensions)),
+            self.__dimensions,
+            self.__pytorch_device
+        )
+        # blank frames have no detections, so the ReID head is warmed up separately on dummy crops of the
+        # size the ROI heads hand it (a batch of one crop and one of a crop per camera)
+        reid_head = self.__model.roi_heads.reid_head
+        crop = torch.zeros((1, 3, reid_head.input_dim, reid_head.input_dim), device=self.__pytorch_device)
+        for size in sorted({1, max(1, len(self.required_jobs_for_inputs()))}):
+            for _ in range(self.__warmup_iterations):
+                self.__predict([blank] * size, self.__model)
+                with torch.no_grad():
+                    reid_head.forward([(crop, 0)] * size)
+        if self.__pytorch_device.startswith("cuda"):
+            torch.cuda.synchronize()
+        log.info("%s warmed up (%d iterations)", self.name, self.__warmup_iterations)
+
+    def reload_files(self) -> list[str]:
+        return gallery_filenames(self.__reid_model_root)
+
+    def reload(self, filename: str) -> callable:
+        # new individuals in the gallery: the feature database is read by the ReID head on every forward,
+        # so swapping the reference between iterations is enough (the model itself is untouched). The gallery
+        # (float32 features included) is fully built here on the reload thread, the swap is only the assignment.
+        # Whichever of the two watched files changed, load_gallery reads the .npy when there is one
+        database = load_gallery(os.path.dirname(filename))
+        reid_head = self.__model.roi_heads.reid_head
+
+        def swap():
+            reid_head.features_database = database
+        return swap
+
+    def set_memory_pressure(self, level: int):
+        # under memory pressure only one camera frame goes through the model per run (round robin)
+        self.__shed_frames = level > 0
 
     def run(self):
         output: list[Individual] = []
-        predictions = predict(
-            [image_tensor(
+        frames: list[Frame] = self.__current_frames
+        if self.__shed_frames and len(frames) > 1:
+            frames = [frames[self.__next_frame % len(frames)]]
+            self.__next_frame += 1
+        with self.__label("detection.preprocess"):
+            tensors = [self.__image_tensor(
                 o.image,
                 self.__dimensions,
                 self.__pytorch_device
-            ) for o in self.__current_frames],
-            self.__model
-        )
+            ) for o in frames]
+        with self.__label("detection.model"):
+            predictions = self.__predict(tensors, self.__model)
 
         for index, prediction in enumerate(predictions):
             prediction = prediction["instances"]
+            first = len(output)
             if self.__debug_enable:
-                self.dump_image(self.__current_frames[index].image, prediction)
+                self.dump_image(frames[index].image, prediction)
             if prediction.has("reid_embeddings"):
                 _reids = list(prediction.get("reid_embeddings").cpu().numpy().flatten())
                 _classes = list(prediction.get("pred_classes").cpu().numpy())
@@ -115,7 +249,7 @@ class DetectionHandler(AbstractHandler):
                     if _reids[i] != -1:
                         output.append(
                             Individual(
-                                camera_name=self.__current_frames[index].camera_name,
+                                camera_name=frames[index].camera_name,
                                 confidence=_scores[i],
                                 identity=_reids[i],
                                 species=_classes[i],
@@ -124,14 +258,23 @@ class DetectionHandler(AbstractHandler):
                                 x_max=0.0,
                                 y_max=0.0,
                                 mask=_masks[i],
-                                timestamp=self.__current_frames[index].timestamp
+                                timestamp=frames[index].timestamp
                             )
                         )
+            if self.__cache is not None:
+                self.__cache.put(frames[index], output[first:])
+            REGISTRY.inc("welfareobs_detections", len(output) - first, "Individuals detected",
+                         camera=frames[index].camera_name)
         # print(f"detection::run output size = {len(output)}")
         self.__buffer = output
+        if self.__profiler is not None:
+            self.__profiler.step()
 
     def teardown(self):
-        pass
+        if self.__cache is not None:
+            self.__cache.close()
+        if self.__profiler is not None:
+            self.__profiler.stop()
 
     def set_inputs(self, values: list):
         """
@@ -146,6 +289,13 @@ class DetectionHandler(AbstractHandler):
         return self.__buffer
 
     def dump_image(self, image, instance):
+        import matplotlib.pyplot as plt
+        from detectron2.data.catalog import MetadataCatalog
+        from detectron2.structures import Instances
+        from detectron2.utils.visualizer import Visualizer
+        from welfareobs.detectron.detectron_calls import image_tensor
+        if self.__metadata is None:
+            self.__metadata = MetadataCatalog.get("coco_2017_val")
         image = np.array(image_tensor(
                 image,
                 self.__dimensions
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: detection_replay.py
+Description: Replay recorded detections from the detection cache (no model, no GPU)
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+from welfareobs.handlers.abstract_handler import AbstractHandler
+from welfareobs.models.individual import Individual
+from welfareobs.utils.config_schema import ConfigError
+from welfareobs.utils.detection_cache import DetectionCache, DetectionConfig
+from welfareobs.utils.logger import get_logger
+from welfareobs.utils.metrics import REGISTRY
+
+
+log = get_logger(__name__)
+
+
+class ReplayDetectionHandler(AbstractHandler):
+    """
+    Drop-in replacement for DetectionHandler that streams recorded detections from the cache.
+    INPUT: single image frame in an array wrapper
+    OUTPUT: array of individuals List[Individual]
+    JSON config param is the same detection config filename used to record (it must contain record-cache)
+
+    Frames that were never recorded produce no detections (and are counted in `misses`).
+    """
+    CONFIG = DetectionConfig
+
+    def __init__(self, name: str, inputs: list[str], param: str):
+        super().__init__(name, inputs, param)
+        self.__current_frames = None
+        self.__buffer: list[Individual] = []
+        self.__cache: DetectionCache|None = None
+        self.__misses: int = 0
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    def setup(self):
+        cnf: DetectionConfig = self.config
+        if cnf.record_cache == "":
+            raise ConfigError([f"{self.param}: missing `record-cache`"])
+        self.__cache = DetectionCache(cnf.record_cache, DetectionCache.model_hash(cnf, DetectionCache.memo(cnf)))
+
+    def run(self):
+        output: list[Individual] = []
+        for frame in self.__current_frames:
+            individuals = self.__cache.get(frame)
+            if individuals is None:
+                self.__misses += 1
+                REGISTRY.inc("welfareobs_detection_cache_misses", 1, "Frames not in the detection cache", job=self.name)
+                continue
+            REGISTRY.inc("welfareobs_detection_cache_hits", 1, "Frames replayed from the detection cache", job=self.name)
+            output.extend(individuals)
+        self.__buffer = output
+
+    def teardown(self):
+        if self.__cache is not None:
+            self.__cache.close()
+        if self.__misses > 0:
+            log.warning("%s: %d frames were not in the detection cache", self.name, self.__misses)
+
+    def set_inputs(self, values: list):
+        """
+        Takes frame from multiple cameras
+        """
+        self.__current_frames = values
+
+    def get_output(self) -> any:
+        """
+        Returns a list of individuals (recorded predictions)
+        """
+        return self.__buffer
@@ -19,9 +19,31 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 """
-import csv
+import math
 from welfareobs.handlers.abstract_handler import AbstractHandler
 from welfareobs.models.intersect import Intersect
+from dataclasses import dataclass, field
+from welfareobs.utils.rotating_writer import RotatingWriter
+from welfareobs.utils.position_store import PositionStore
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RotatingIntersectConfig:
+    filename: str
+    format: str = "csv"
+    rotate: str = "none"
+    flush_rows: int = 1000
+    flush_seconds: float = 10.0
+
+
+@dataclass(frozen=True, slots=True)
+class PositionStoreConfig:
+    filename: str
+    individuals: list[str] = field(default_factory=list)
 
 
 class SaveIntersectHandler(AbstractHandler):
@@ -29,33 +51,191 @@ class SaveIntersectHandler(AbstractHandler):
     INPUT: List[Intersect] list of intersect (one for each individual)
     OUTPUT: Nothing
     JSON config param is CSV output filename
+
+    The CSV is kept open for the life of the pipeline and rows are buffered (flushed every 100 rows or
+    10 seconds, and on teardown).
     """
     def __init__(self, name: str, inputs: list[str], param: str):
         super().__init__(name, inputs, param)
         self.__filename = param
         self.__data = None
         self.__sample_run = 1  # sample runs start at 1
+        self.__writer: RotatingWriter|None = None
 
     def setup(self):
-        pass
+        self.__writer = RotatingWriter(
+            self.__filename,
+            columns=['sample', 'identity', 'intersect', 'timestamp'],
+            flush_rows=100,
+            flush_seconds=10.0
+        )
 
     def __render(self, src: list) -> str:
         return " ".join([f"( {int(x)} | {int(y)} )" for x, y in src])
 
     def run(self):
-        with open(self.__filename, 'a') as csvfile:
-            writer = csv.writer(csvfile)
-            if not csvfile.tell():  # Check if file is empty
-                writer.writerow(['sample', 'identity', 'intersect', 'timestamp'])
-            if len(self.__data) > 0:
-                print(f" - Writing sample {self.__sample_run} with {len(self.__data[0])} individuals")
-                for item in self.__data[0]:
-                    writer.writerow([self.__sample_run, item.identity, self.__render(item.intersect), item.timestamp.strftime('%Y-%m-%d %H:%M:%S')])
-            self.__sample_run += 1
+        if len(self.__data) > 0:
+            log.debug("Writing sample %d with %d individuals", self.__sample_run, len(self.__data[0]))
+            for item in self.__data[0]:
+                self.__writer.write(
+                    [self.__sample_run, item.identity, self.__render(item.intersect), item.timestamp.isoformat(" ", "seconds")],
+                    item.timestamp
+                )
+        self.__writer.flush_if_due()
+        self.__sample_run += 1
+
+    def teardown(self):
+        if self.__writer is not None:
+            self.__writer.close()
+
+    def set_inputs(self, values: list):
+        self.__data = values
+
+    def get_output(self) -> any:
+        pass
+
+
+class RotatingIntersectHandler(AbstractHandler):
+    """
+    INPUT: List[Intersect] list of intersect (one for each individual)
+    OUTPUT: Nothing
+    JSON config param is a config JSON filename
+
+    configuration file looks like this:
+    {
+      "filename": "/project/output/final-output.parquet",
+      "format": "parquet",
+      "rotate": "hour",
+      "flush-rows": "1000",
+      "flush-seconds": "30"
+    }
+
+    format is csv or parquet, rotate is none, hour or day (rotated on the intersect timestamp, so
+    final-output.parquet becomes final-output-2025031010.parquet). Parquet columns are typed (see SCHEMA)
+    and one row group is written per flush, so a day of data can be read with pyarrow.dataset or pandas
+    without parsing text.
+    """
+    CONFIG = RotatingIntersectConfig
+    COLUMNS = ['sample', 'identity', 'timestamp', 'intersect_x', 'intersect_z',
+               'location_x', 'location_z', 'uncertainty', 'confidence']
+
+    def __init__(self, name: str, inputs: list[str], param: str):
+        super().__init__(name, inputs, param)
+        self.__data = None
+        self.__sample_run = 1  # sample runs start at 1
+        self.__writer: RotatingWriter|None = None
+        self.__format: str = "csv"
+
+    @staticmethod
+    def schema():
+        import pyarrow as pa
+        return pa.schema([
+            ('sample', pa.int64()),
+            ('identity', pa.int64()),
+            ('timestamp', pa.timestamp('ms')),
+            ('intersect_x', pa.list_(pa.float32())),
+            ('intersect_z', pa.list_(pa.float32())),
+            ('location_x', pa.float32()),
+            ('location_z', pa.float32()),
+            ('uncertainty', pa.float32()),
+            ('confidence', pa.float32()),
+        ])
+
+    def setup(self):
+        cnf: RotatingIntersectConfig = self.config
+        self.__format = cnf.format
+        self.__writer = RotatingWriter(
+            cnf.filename,
+            columns=RotatingIntersectHandler.COLUMNS,
+            fmt=self.__format,
+            rotate=cnf.rotate,
+            flush_rows=cnf.flush_rows,
+            flush_seconds=cnf.flush_seconds,
+            schema=RotatingIntersectHandler.schema() if self.__format == "parquet" else None
+        )
+
+    def __row(self, item: Intersect) -> list:
+        xs = [float(x) for x, _ in item.intersect]
+        zs = [float(z) for _, z in item.intersect]
+        location_x, location_z = item.location if item.location is not None else (None, None)
+        uncertainty = item.uncertainty
+        if self.__format == "csv":
+            xs = " ".join([str(int(x)) for x in xs])
+            zs = " ".join([str(int(z)) for z in zs])
+        return [self.__sample_run, int(item.identity), item.timestamp, xs, zs,
+                location_x, location_z, uncertainty, float(item.confidence)]
+
+    def run(self):
+        if len(self.__data) > 0:
+            for item in self.__data[0]:
+                self.__writer.write(self.__row(item), item.timestamp)
+        self.__writer.flush_if_due()
+        self.__sample_run += 1
 
     def teardown(self):
+        if self.__writer is not None:
+            self.__writer.close()
+
+    def set_inputs(self, values: list):
+        self.__data = values
+
+    def get_output(self) -> any:
         pass
 
+
+class PositionStoreHandler(AbstractHandler):
+    """
+    INPUT: List[Intersect] list of intersect (one for each individual)
+    OUTPUT: Nothing
+    JSON config param is a config JSON filename
+
+    configuration file looks like this:
+    {
+      "filename": "/project/output/positions.db",
+      "individuals": ["Zarafa", "Ebo", "Jimiyu", "Kito"]
+    }
+
+    Stores one position per individual per sample in a SQLite (WAL) database, one transaction per
+    iteration. The position is the fused aggregator location, or the mean of the intersect points if
+    there is no fused location. Query it with welfareobs.utils.position_store.PositionStore.
+    """
+    CONFIG = PositionStoreConfig
+
+    def __init__(self, name: str, inputs: list[str], param: str):
+        super().__init__(name, inputs, param)
+        self.__data = None
+        self.__sample_run = 1  # sample runs start at 1
+        self.__store: PositionStore|None = None
+
+    def setup(self):
+        cnf: PositionStoreConfig = self.config
+        self.__store = PositionStore(cnf.filename)
+        if len(cnf.individuals) > 0:
+            self.__store.set_names(cnf.individuals)
+
+    @staticmethod
+    def position(item: Intersect) -> (float|None, float|None):
+        if item.location is not None and not any(math.isnan(o) for o in item.location):
+            return float(item.location[0]), float(item.location[1])
+        points = [(x, z) for x, z in item.intersect if not (math.isnan(x) or math.isnan(z))]
+        if len(points) == 0:
+            return None, None
+        return sum(x for x, _ in points) / len(points), sum(z for _, z in points) / len(points)
+
+    def run(self):
+        if len(self.__data) > 0:
+            rows = []
+            for item in self.__data[0]:
+                x, z = PositionStoreHandler.position(item)
+                uncertainty = None if item.uncertainty is None or math.isnan(item.uncertainty) else float(item.uncertainty)
+                rows.append((self.__sample_run, item.identity, item.timestamp, x, z, uncertainty, float(item.confidence)))
+            self.__store.insert(rows)
+        self.__sample_run += 1
+
+    def teardown(self):
+        if self.__store is not None:
+            self.__store.close()
+
     def set_inputs(self, values: list):
         self.__data = values
 
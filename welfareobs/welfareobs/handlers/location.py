@@ -25,9 +25,18 @@ from PIL import Image
 import numpy as np
 from welfareobs.models.individual import Individual
 from welfareobs.models.intersect import Intersect
-from welfareobs.utils.config import Config
+from dataclasses import dataclass
 from welfareobs.utils.projection_transformer import ProjectionTransformer
-from welfareobs.utils.matplotlib_image_wrapper import MatPlotLibImageWrapper
+
+
+@dataclass(frozen=True, slots=True)
+class LocationConfig:
+    camera_name: str
+    camera_projection_filename: str
+    y_mask_clipping_threshold: int = 0
+    target_width: int|None = None
+    target_height: int|None = None
+    debug_enable: bool = False
 
 
 class LocationHandler(AbstractHandler):
@@ -50,6 +59,8 @@ class LocationHandler(AbstractHandler):
     The name is defined in the main configuration.
     
     """
+    CONFIG = LocationConfig
+
     def __init__(self, name: str, inputs: list[str], param: str):
         super().__init__(name, inputs, param)
         self.__individual_detections: list[Individual]|None = None
@@ -58,16 +69,29 @@ class LocationHandler(AbstractHandler):
         self.__debug_enable = False
         self.__camera_name_filter = ""
 
+    def reload_files(self) -> list[str]:
+        return [self.config.camera_projection_filename]
+
+    def reload(self, filename: str) -> callable:
+        # recalibrated camera: load and resize the new LUT off the loop, then swap the transformer
+        cnf: LocationConfig = self.config
+        pt = ProjectionTransformer()
+        pt.load(filename, target_w=cnf.target_width, target_h=cnf.target_height)
+
+        def swap():
+            self.__pt = pt
+        return swap
+
     def setup(self):
-        cnf: Config = Config(self.param)
+        cnf: LocationConfig = self.config
         self.__pt.load(
-            cnf.as_string("camera-projection-filename"), 
-            target_w=cnf.as_int("target-width"),
-            target_h=cnf.as_int("target-height")
+            cnf.camera_projection_filename,
+            target_w=cnf.target_width,
+            target_h=cnf.target_height
         )
-        self.__clipping_threshold = cnf.as_int("y-mask-clipping-threshold")
-        self.__debug_enable = cnf.as_bool("debug-enable")
-        self.__camera_name_filter = cnf.as_string("camera-name")
+        self.__clipping_threshold = cnf.y_mask_clipping_threshold
+        self.__debug_enable = cnf.debug_enable
+        self.__camera_name_filter = cnf.camera_name
     
     def run(self):
         pass
@@ -103,16 +127,17 @@ class LocationHandler(AbstractHandler):
         i=0
         for detection in self.__individual_detections:
             if self.valid_camera(detection):
+                points = self.get_xy_mask_lower_intersect(
+                    detection.mask,
+                    self.__clipping_threshold
+                )
                 output.append(
                     Intersect(
                         identity=detection.identity,
-                        intersect=self.__pt.get_xz_array(
-                            self.get_xy_mask_lower_intersect(
-                                detection.mask, 
-                                self.__clipping_threshold
-                            )
-                        ),
-                        timestamp=detection.timestamp
+                        intersect=self.__pt.get_xz_array(points),
+                        timestamp=detection.timestamp,
+                        confidence=float(detection.confidence),
+                        weights=self.__pt.get_weight_array(points)
                     )
                 )
         if self.__debug_enable:
@@ -120,6 +145,8 @@ class LocationHandler(AbstractHandler):
         return output
 
     def render_output(self):
+        # debug only, matplotlib, cv2 and sympy are imported on first use
+        from welfareobs.utils.matplotlib_image_wrapper import MatPlotLibImageWrapper
         mw = MatPlotLibImageWrapper(self.__pt.warped_grid_image.copy())  #NB you need to deep copy the numpy array
         i=0
         for detection in self.__individual_detections:
@@ -19,30 +19,34 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 """
-import pickle
 from welfareobs.handlers.abstract_handler import AbstractHandler
+from welfareobs.utils.payload_file import PayloadWriter
 
 
 class PayloadCreateHandler(AbstractHandler):
     """
     INPUT: anything
-    OUTPUT: Nothing (writes pkl file to disk)
+    OUTPUT: Nothing (appends a record to the payload file on disk)
     JSON config param is output filename
+
+    One record is appended per iteration (see welfareobs.utils.payload_file), the file is truncated
+    on setup. Frame/Individual/Intersect and numpy arrays are stored as raw buffers, anything else is pickled.
     """
     def __init__(self, name: str, inputs: list[str], param: str):
         super().__init__(name, inputs, param)
         self.__filename = param
         self.__data = None
+        self.__writer: PayloadWriter|None = None
 
     def setup(self):
-        pass
+        self.__writer = PayloadWriter(self.__filename)
 
     def run(self):
-        with open(self.__filename, 'wb') as file:
-            pickle.dump(self.__data, file)
+        self.__writer.write(self.__data)
 
     def teardown(self):
-        pass
+        if self.__writer is not None:
+            self.__writer.close()
 
     def set_inputs(self, values: list):
         self.__data = values
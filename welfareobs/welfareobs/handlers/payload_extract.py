@@ -19,28 +19,53 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 """
+import os
 import pickle
 
 from welfareobs.handlers.abstract_handler import AbstractHandler
+from welfareobs.utils.payload_file import PayloadReader
 
 
 class PayloadExtractHandler(AbstractHandler):
     """
     INPUT: nothing
-    OUTPUT: reconstructs whatever was pkl'ed
+    OUTPUT: reconstructs whatever was saved by PayloadCreateHandler
     JSON config param is input filename
+
+    Records are replayed in order, one per iteration, wrapping back to the first record at the end of the
+    file (like FauxCameraHandler). Arrays are memory-mapped views, so they are read-only.
+    Legacy payloads (a single pkl with no .idx index) are still loaded with pickle.
     """
     def __init__(self, name: str, inputs: list[str], param: str):
         super().__init__(name, inputs, param)
         self.__filename = param
         self.__data = None
+        self.__reader: PayloadReader|None = None
+        self.__index = 0
 
     def setup(self):
-        pass
+        if os.path.exists(f"{self.__filename}.idx") or not os.path.exists(self.__filename):
+            self.__reader = PayloadReader(self.__filename)
+        self.__index = 0
 
     def run(self):
-        with open(self.__filename, 'rb') as file:
-            self.__data = pickle.load(file)
+        if self.__reader is None:
+            with open(self.__filename, 'rb') as file:
+                self.__data = pickle.load(file)
+            return
+        if len(self.__reader) == 0:
+            self.__data = None
+            return
+        if self.__index >= len(self.__reader):
+            self.__index = 0
+        self.__data = self.__reader[self.__index]
+        self.__index += 1
+
+    def seek(self, index: int):
+        """
+        Replay from record N
+        """
+        self.__index = index
 
     def teardown(self):
         pass
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: registry.py
+Description: Handler manifest and lazy handler class resolution
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import importlib
+import threading
+import time
+from importlib.metadata import entry_points
+
+
+"""
+A pipeline task names its handler either by a short name from the manifest below (or from a
+"welfareobs.handlers" entry point of an installed package) or by its <package>.<class> path:
+    "detection-1": {"handler": "detection", ...}
+    "detection-1": {"handler": "welfareobs.handlers.detection.DetectionHandler", ...}
+
+Nothing is imported until a handler is resolved, and each module is imported once. The handler modules
+keep their heavy dependencies (torch, detectron2, rtsp, matplotlib) inside setup(), so resolving a
+handler to validate its config is cheap.
+"""
+ENTRY_POINT_GROUP = "welfareobs.handlers"
+MANIFEST: dict[str, str] = {
+    "camera": "welfareobs.handlers.camera.CameraHandler",
+    "faux-camera": "welfareobs.handlers.camera.FauxCameraHandler",
+    "detection": "welfareobs.handlers.detection.DetectionHandler",
+    "detection-replay": "welfareobs.handlers.detection_replay.ReplayDetectionHandler",
+    "location": "welfareobs.handlers.location.LocationHandler",
+    "aggregator": "welfareobs.handlers.aggregator.AggregatorHandler",
+    "save-intersect": "welfareobs.handlers.filesystem.SaveIntersectHandler",
+    "rotating-intersect": "welfareobs.handlers.filesystem.RotatingIntersectHandler",
+    "position-store": "welfareobs.handlers.filesystem.PositionStoreHandler",
+    "payload-create": "welfareobs.handlers.payload_create.PayloadCreateHandler",
+    "payload-extract": "welfareobs.handlers.payload_extract.PayloadExtractHandler",
+}
+_classes: dict[str, type] = {}
+_import_ns: dict[str, int] = {}  # handler path -> time spent importing its module (first resolve only)
+_lock = threading.Lock()
+
+
+def path(name: str) -> str:
+    """
+    :param name: short handler name or <package>.<class> path
+    :return: <package>.<class> path
+    """
+    if name in MANIFEST:
+        return MANIFEST[name]
+    if "." not in name:
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            if ep.name == name:
+                return ep.value.replace(":", ".")
+    return name
+
+
+def resolve(name: str) -> type:
+    """
+    Import (once) and return a handler class
+    :param name: short handler name or <package>.<class> path
+    :return: handler class
+    :raises ImportError, AttributeError, ValueError: if the handler cannot be found
+    """
+    key = path(name)
+    cls = _classes.get(key)
+    if cls is not None:
+        return cls
+    with _lock:
+        if key not in _classes:
+            module_name, class_name = key.rsplit(".", 1)
+            start = time.perf_counter_ns()
+            module = importlib.import_module(module_name)
+            _import_ns[key] = time.perf_counter_ns() - start
+            _classes[key] = getattr(module, class_name)
+        return _classes[key]
+
+
+def import_times() -> dict[str, float]:
+    """
+    :return: handler path -> milliseconds spent importing it (including everything its module imported)
+    """
+    return {key: round(ns / 1e6, 3) for key, ns in _import_ns.items()}
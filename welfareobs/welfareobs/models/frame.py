@@ -28,3 +28,4 @@ class Frame:
     image: any
     camera_name: str
     timestamp: datetime
+    filename: str | None = None  # source file (faux cameras only), used to key the detection cache
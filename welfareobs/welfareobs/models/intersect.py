@@ -21,13 +21,22 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 from datetime import datetime
 from dataclasses import dataclass
+import numpy as np
 
 
 @dataclass
 class Intersect:
     """
     A data class that represents intersect of an individual animal
+
+    confidence and weights are used by the aggregator to fuse cameras; weights has one
+    entry per intersect point (LUT weight at the source pixel). location and uncertainty
+    are only populated on the aggregator output.
     """
     identity: str
     intersect: list[tuple]
     timestamp: datetime
+    confidence: float = 1.0
+    weights: np.ndarray | None = None
+    location: tuple | None = None
+    uncertainty: float | None = None
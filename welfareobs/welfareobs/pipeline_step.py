@@ -26,6 +26,12 @@ import time
 from queue import Queue
 from welfareobs.handlers.abstract_handler import AbstractHandler
 from welfareobs.utils.performance_monitor import PerformanceMonitor
+from welfareobs.utils.logger import get_logger, every
+from welfareobs.utils.handler_timing import HandlerTiming
+from welfareobs.utils.tracer import Tracer
+
+
+log = get_logger(__name__)
 
 
 class PipelineStep(object):
@@ -38,13 +44,19 @@ class PipelineStep(object):
                  label: str,
                  performance_history_size: int = 1,
                  thread_pool_size: int = 5,
+                 exact_statistics: bool = False,
+                 timing: HandlerTiming|None = None,
+                 tracer: Tracer|None = None,
                  ):
         self.__threadpool_size:int = thread_pool_size
         self.__jobs: [AbstractHandler] = []
         self.__label:str = label
+        self.__timing: HandlerTiming|None = timing
+        self.__tracer: Tracer|None = tracer
         self.__performance_monitor: PerformanceMonitor = PerformanceMonitor(
             label=label,
-            history_size=performance_history_size
+            history_size=performance_history_size,
+            exact=exact_statistics
         )
 
     @property
@@ -62,17 +74,30 @@ class PipelineStep(object):
     def jobs(self) -> [AbstractHandler]:
         return self.__jobs
 
+    @property
+    def parallel(self) -> bool:
+        return self.__threadpool_size >= 1
+
+    def __run_job(self, job: AbstractHandler):
+        if self.__timing is None:
+            job.run()
+        else:
+            self.__timing.timed(job.name, "run", job.run)
+
     def run(self):
+        start = time.perf_counter_ns()
         self.__performance_monitor.track_start()
         if self.__threadpool_size < 1:
             for job in self.__jobs:
-                job.run()
+                self.__run_job(job)
         else:
             with concurrent.futures.ThreadPoolExecutor(max_workers=self.__threadpool_size) as executor:
                 futures = []
                 for job in self.__jobs:
-                    futures.append(executor.submit(job.run))
+                    futures.append(executor.submit(self.__run_job, job))
                 while any(not f.done() for f in futures):
                     pass
         self.__performance_monitor.track_end()
-        print(str(self.__performance_monitor))
+        if self.__tracer is not None:
+            self.__tracer.complete(self.__label, "step", start)
+        log.info("%s", self.__performance_monitor, extra=every(10.0, key=self.__label))
@@ -19,83 +19,287 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 """
+import contextlib
+import gc
+import signal
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from welfareobs.utils.config import Config
+from welfareobs.utils.config_schema import Pipeline, load_pipeline
 from welfareobs.handlers.abstract_handler import AbstractHandler
 from welfareobs.pipeline_step import PipelineStep
 from welfareobs.utils.performance_monitor import PerformanceMonitor
+from welfareobs.utils.handler_timing import HandlerTiming
+from welfareobs.utils.metrics import REGISTRY, MetricsServer
+from welfareobs.utils.tracer import Tracer
+from welfareobs.utils.memory_accountant import MemoryAccountant, PRESSURE_HARD
+from welfareobs.utils.logger import get_logger
+from welfareobs.utils.startup_profile import StartupProfile
+from welfareobs.utils.hot_reload import HotReloader
 import time
 from datetime import timedelta
 
 
+log = get_logger(__name__)
+
+
 class Runner(object):
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, startup: StartupProfile|None = None):
         self.__config: Config = config
+        self.__startup: StartupProfile|None = startup
+        # validates the pipeline and every handler config up front, raises ConfigError (a SyntaxError)
+        # listing every problem found
+        with self.__phase("validate"):
+            self.__pipeline: Pipeline = load_pipeline(config)
+        settings = self.__pipeline.settings
         self.__job_map: {str: AbstractHandler} = {}
         self.__pipeline_steps: [PipelineStep] = []
         self.__performance_history_size: int = 1
+        self.__performance_exact_statistics: bool = False
+        self.__performance_filename: str = ""
+        self.__performance_snapshot_seconds: int = 0
+        self.__trace_filename: str = settings.trace_filename
+        self.__tracer: Tracer|None = None
+        if self.__trace_filename != "":
+            # keeps the last N events (about 1M events is ~100MB of JSON)
+            self.__tracer = Tracer(settings.trace_capacity, settings.trace_dump_seconds)
+        self.__previous_sigusr1 = None
+        if self.__tracer is not None and hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+            # kill -USR1 <pid> writes the trace of a running pipeline (at the end of the current iteration)
+            self.__previous_sigusr1 = signal.signal(signal.SIGUSR1, lambda signum, frame: self.__tracer.request_dump())
+        self.__memory: MemoryAccountant|None = None
+        if settings.memory_accounting or settings.memory_budget_mb > 0:
+            # RSS per step and the budget are cheap, memory-accounting adds tracemalloc per handler call
+            self.__memory = MemoryAccountant(
+                budget_mb=settings.memory_budget_mb,
+                soft_fraction=settings.memory_soft_fraction,
+                trace=settings.memory_accounting
+            )
+        self.__pressure: int = 0
+        self.__shed_last: bool = False
+        self.__timing: HandlerTiming = HandlerTiming(self.__tracer, self.__memory)
+        self.__metrics_port: int = 0
+        self.__metrics_server: MetricsServer|None = None
         self.__thread_pool_size: int = 5
+        self.__setup_threads: int = settings.setup_threads
+        self.__reloader: HotReloader|None = None
+        self.__hot_reload: bool = settings.hot_reload
+        self.__hot_reload_seconds: float = settings.hot_reload_seconds
+        self.__ready_seconds: float = 0.0
         self.__pipeline_label: str = ""
         self.__last_execution_time = 0
         self.__number_of_execution_runs = 0
         self.__overall_execution_time = 0
-        self.__validate()  # will raise SyntaxError on invalid config
-        self.__parse()
+        with self.__phase("build"):
+            self.__parse()
         self.__performance_monitor: PerformanceMonitor = PerformanceMonitor(
             label=self.__pipeline_label,
-            history_size=100
+            history_size=self.__performance_history_size,
+            exact=self.__performance_exact_statistics,
+            # the raw times are only kept for the performance file (snapshots or the final save)
+            keep_history=self.__performance_filename != ""
         )
+        if self.__metrics_port > 0:
+            self.__register_metrics()
         self.__loop = threading.Event()
         self.__loop.set()
         self.__hnd = None
         self.__has_setup = False
         self.__has_torndown = False
 
+    @property
+    def pipeline(self) -> Pipeline:
+        """Validated, typed pipeline configuration"""
+        return self.__pipeline
+
     @property
     def performance(self) -> PerformanceMonitor:
         return self.__performance_monitor
 
-    def __setup(self):
-        for job in self.__job_map.values():
-            print(f"{job.name} calling setup")
+    @property
+    def timing(self) -> HandlerTiming:
+        return self.__timing
+
+    @property
+    def tracer(self) -> Tracer|None:
+        return self.__tracer
+
+    @property
+    def memory(self) -> MemoryAccountant|None:
+        return self.__memory
+
+    @property
+    def reloader(self) -> HotReloader|None:
+        return self.__reloader
+
+    @property
+    def ready_seconds(self) -> float:
+        """Seconds from the start of setup until every handler was set up and warmed up (0 before)"""
+        return self.__ready_seconds
+
+    @property
+    def snapshots_enabled(self) -> bool:
+        return self.__performance_snapshot_seconds > 0 and self.__performance_filename != ""
+
+    def __register_metrics(self):
+        # summaries are read from the monitors when scraped, nothing is pushed from the pipeline loop
+        REGISTRY.monitor("welfareobs_pipeline_seconds", self.__performance_monitor, "Pipeline iteration time",
+                         pipeline=self.__pipeline_label)
+        for ps in self.__pipeline_steps:
+            REGISTRY.monitor("welfareobs_step_seconds", ps.performance, "Pipeline step time", step=ps.label)
+        for (job, phase), monitor in self.__timing.monitors.items():
+            REGISTRY.monitor("welfareobs_handler_seconds", monitor, "Handler call time", scale=1e-3, job=job, phase=phase)
+        REGISTRY.monitor("welfareobs_critical_path_seconds", self.__timing.critical_path,
+                         "Critical path per iteration", scale=1e-3, pipeline=self.__pipeline_label)
+
+    def __phase(self, name: str):
+        return self.__startup.phase(name) if self.__startup is not None else contextlib.nullcontext()
+
+    def __setup_job(self, job: AbstractHandler):
+        log.info("%s calling setup", job.name)
+        start = time.perf_counter_ns()
+        with self.__phase(f"setup {job.name}"):
             job.setup()
+        if self.__tracer is not None:
+            self.__tracer.complete(job.name, "setup", start)
+
+    def __setup(self):
+        #
+        # Handlers do not depend on each other during setup, so model, checkpoint and LUT loads (mostly I/O and
+        # native code that releases the GIL) overlap. Warm-up runs afterwards, one handler at a time, so
+        # handlers sharing a GPU do not compete.
+        #
+        start = time.perf_counter()
+        jobs = list(self.__job_map.values())
+        if self.__setup_threads > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.__setup_threads, len(jobs)), thread_name_prefix="setup") as pool:
+                list(pool.map(self.__setup_job, jobs))  # re-raises the first setup error
+        else:
+            for job in jobs:
+                self.__setup_job(job)
+        for job in jobs:
+            if type(job).warmup is not AbstractHandler.warmup:
+                with self.__phase(f"warmup {job.name}"):
+                    job.warmup()
+        self.__ready_seconds = time.perf_counter() - start
+        if self.__startup is not None:
+            self.__startup.mark("ready")
+        log.info("Ready in %.3fs (%d jobs, setup-threads=%d)", self.__ready_seconds, len(jobs), self.__setup_threads)
+        if self.__metrics_port > 0:
+            REGISTRY.set("welfareobs_ready_seconds", self.__ready_seconds, "Time to set up and warm up the handlers",
+                         pipeline=self.__pipeline_label)
+            self.__metrics_server = MetricsServer(REGISTRY, self.__metrics_port)
+            self.__metrics_server.start()
+        if self.__hot_reload:
+            self.__reloader = HotReloader(jobs, self.__hot_reload_seconds)
+            self.__reloader.start()
         self.__has_setup = True
 
     def __teardown(self):
+        if self.__reloader is not None:
+            self.__reloader.stop()
         for job in self.__job_map.values():
             job.teardown()
+        if self.__metrics_server is not None:
+            self.__metrics_server.stop()
+        if self.snapshots_enabled:
+            # the last background snapshot finishes first, then the final one covers the whole run
+            self.__performance_monitor.wait()
+            self.__performance_monitor.snapshot(self.__performance_filename, background=False)
+        if self.__tracer is not None:
+            self.__tracer.wait()
+            self.__tracer.dump(self.__trace_filename)
+            if self.__previous_sigusr1 is not None and threading.current_thread() is threading.main_thread():
+                signal.signal(signal.SIGUSR1, self.__previous_sigusr1)
+            log.info("Wrote %d trace events to %s", len(self.__tracer), self.__trace_filename)
         self.__has_torndown = True
 
+    def __shed(self) -> bool:
+        """
+        Pass memory pressure changes on to the handlers and decide whether to shed this iteration. Under hard
+        pressure every other iteration is shed (after a gc) so the pipeline still makes progress.
+        :return: True to skip the pipeline steps this iteration
+        """
+        level = self.__memory.pressure()
+        if level != self.__pressure:
+            log.warning("Memory pressure %d -> %d (rss=%.0fMB)", self.__pressure, level, self.__memory.rss / 1048576)
+            for job in self.__job_map.values():
+                job.set_memory_pressure(level)
+            self.__pressure = level
+        if level == PRESSURE_HARD and not self.__shed_last:
+            gc.collect()
+            self.__memory.shed_iteration()
+            self.__memory.sample("shed")
+            self.__shed_last = True
+        else:
+            self.__shed_last = False
+        return self.__shed_last
+
     def run(self, run_count:None|int=None, seconds_duration:None|int=None):
         if not self.__has_setup:
-            print("Calling setup")
+            log.info("Calling setup")
             self.__setup()
         if self.__has_torndown:
             raise RuntimeError("Already torn down")
         end_time = -1
         if seconds_duration is not None:
             end_time = time.time() + seconds_duration
+        next_snapshot = time.time() + self.__performance_snapshot_seconds
         trigger: bool = True
         while trigger:
+            if self.__reloader is not None:
+                # reloads are built off-thread, only the swap happens here (no step is running)
+                self.__reloader.apply()
+            shed = self.__memory is not None and self.__shed()
+            iteration_start = time.perf_counter_ns()
             self.__performance_monitor.track_start()
-            for ps in self.__pipeline_steps:
+            for ps in [] if shed else self.__pipeline_steps:
                 for job in ps.jobs:
                     src_jobs = [self.__job_map[o] for o in job.required_jobs_for_inputs()]
-                    job.set_inputs([o.get_output() for o in src_jobs])
+                    inputs = [self.__timing.timed(o.name, "get_output", o.get_output) for o in src_jobs]
+                    self.__timing.timed(job.name, "set_inputs", job.set_inputs, inputs)
                 ps.run()
+                if self.__memory is not None:
+                    self.__memory.sample(ps.label)
+            if not shed:
+                self.__timing.end_iteration()
+                if self.__startup is not None:
+                    # time to first frame, reported once
+                    self.__startup.mark("first-frame")
+                    log.info("%s", self.__startup)
+                    self.__startup = None
+            if self.__tracer is not None:
+                # a shed iteration is marked as such and does not advance the iteration number
+                self.__tracer.complete("shed" if shed else "iteration", "runner", iteration_start)
+                if not shed:
+                    self.__tracer.next_iteration()
             # this is used to allow async continuous run with graceful shutdown
             trigger = self.__loop.is_set()
-            # alternatively, if we are performing a sync-finite-sequence then count-down 
-            if run_count is not None:
+            # alternatively, if we are performing a sync-finite-sequence then count-down (shed iterations
+            # ran no steps, so they don't count)
+            if run_count is not None and not shed:
                 run_count -= 1
                 if run_count == 0:
                     trigger = False
             if seconds_duration is not None:
                 if time.time() >= end_time:
                     trigger = False
-            self.__performance_monitor.track_end()
+            if not shed:
+                self.__performance_monitor.track_end()
+            if self.__metrics_server is not None and self.__performance_monitor.last > 0:
+                REGISTRY.set("welfareobs_fps", 1.0 / self.__performance_monitor.last, "Pipeline iterations per second",
+                             pipeline=self.__pipeline_label)
+                if self.__memory is not None:
+                    REGISTRY.set("welfareobs_rss_bytes", self.__memory.rss, "Resident set size",
+                                 pipeline=self.__pipeline_label)
+            if self.__tracer is not None and self.__tracer.dump_if_due(self.__trace_filename):
+                log.info("Writing %d trace events to %s", len(self.__tracer), self.__trace_filename)
+            if self.snapshots_enabled and time.time() >= next_snapshot:
+                # copies the history, the file is written off the loop
+                self.__performance_monitor.snapshot(self.__performance_filename)
+                next_snapshot = time.time() + self.__performance_snapshot_seconds
         self.__teardown()
 
     def run_once(self):
@@ -123,51 +327,36 @@ class Runner(object):
 
     def __parse(self):
         #
-        # Parse the JSON into a pipeline of jobs
+        # Build the pipeline of jobs from the validated configuration
         #
-        steps = self.__config.as_list("pipeline")
-        self.__pipeline_label = self.__config.as_string("settings.configuration-name")
-        self.__thread_pool_size = self.__config.as_int("settings.threadpool-size")
-        self.__performance_history_size = self.__config.as_int("settings.performance-history-size")
-        for step in steps:
+        settings = self.__pipeline.settings
+        self.__pipeline_label = settings.configuration_name
+        self.__thread_pool_size = settings.threadpool_size
+        self.__performance_history_size = settings.performance_history_size
+        # streaming statistics (over the whole run, no raw times kept) unless exact statistics over the
+        # history window are asked for
+        self.__performance_exact_statistics = settings.performance_exact_statistics
+        # periodically overwrite the performance file during the run (not just at exit)
+        self.__performance_filename = settings.performance_csv_filename
+        self.__performance_snapshot_seconds = settings.performance_snapshot_seconds
+        # serve OpenMetrics on this port while running (0 / missing disables the endpoint)
+        self.__metrics_port = settings.metrics_port
+        for step, tasks in self.__pipeline.steps:
             ps: PipelineStep = PipelineStep(
                 label=step,
                 performance_history_size=self.__performance_history_size,
-                thread_pool_size=self.__thread_pool_size
+                thread_pool_size=self.__thread_pool_size,
+                exact_statistics=self.__performance_exact_statistics,
+                timing=self.__timing,
+                tracer=self.__tracer
             )
-            tasks = self.__config[step]
-            for task in tasks:
-                job_hnd = self.__config.instance(f"{task}.handler")
-                job = job_hnd(
-                    task,
-                    inputs=self.__config.as_list(f"{task}.input"),
-                    param=self.__config[f"{task}.config"])
-                self.__job_map[task] = job
+            for name in tasks:
+                task = self.__pipeline.tasks[name]
+                job_hnd = self.__config.instance(f"{name}.handler")
+                job = job_hnd(name, inputs=task.inputs, param=task.param)
+                if task.config is not None:
+                    job.configure(task.config)
+                self.__job_map[name] = job
                 ps.add_job(job)
+            self.__timing.register(step, [job.name for job in ps.jobs], parallel=ps.parallel)
             self.__pipeline_steps.append(ps)
-
-    def __validate(self):
-        #
-        # Does not validate input or config parameters, if these don't exist, it's up to the handler to die gracefully.
-        #
-        if not self.__config.as_bool("settings.configuration-name"):
-            raise SyntaxError("Missing settings.configuration-name")
-        temp = self.__config["settings.threadpool-size"]
-        if not self.__config.as_bool("settings.performance-history-size"):
-            raise SyntaxError("Missing settings.performance-history-size")
-        steps = self.__config.as_list("pipeline")
-        if len(steps) < 1:
-            raise SyntaxError("`pipeline` element must exist and contain an array of at least one element")
-        for step in steps:
-            if not self.__config.as_bool(step):
-                raise SyntaxError(f"`{step}` element must exist")
-            tasks = self.__config.as_list(step)
-            if len(tasks) < 1:
-                raise SyntaxError(f"`{step}` element must exist and contain an array of at least one task")
-            for task in tasks:
-                if not self.__config.as_bool(task):
-                    raise SyntaxError(f"`{task}` element must exist")
-                if not self.__config.as_bool(f"{task}.handler"):
-                    raise SyntaxError(f"`{task}` element must contain a valid handler")
-                if not self.__config.validate_instance(f"{task}.handler"):
-                    raise SyntaxError(f"`{task}` element must contain a valid handler in <package>.<class> format")
@@ -23,6 +23,11 @@ import json
 import importlib
 import sys
 import os
+from welfareobs.handlers import registry
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
 
 
 class Config(object):
@@ -35,8 +40,20 @@ class Config(object):
         self.__data = {}
         self.__filename = filename
         self.__ad_path = add_path
+        # once, not on every handler lookup (it used to grow by an entry per task)
+        if add_path not in sys.path:
+            sys.path.insert(0, add_path)
         with open(filename, "r") as file:
             self.__data = json.load(file)
+        # every dotted key path resolved once, so lookups are a single dict access
+        self.__flat: dict[str, any] = {}
+        self.__flatten(self.__data, "")
+
+    def __flatten(self, src: dict, prefix: str):
+        for key, value in src.items():
+            self.__flat[prefix + key] = value
+            if isinstance(value, dict):
+                self.__flatten(value, f"{prefix}{key}.")
 
     def __getitem__(self, src_key: str) -> any:
         """
@@ -44,10 +61,14 @@ class Config(object):
         :param src_key: dot notation hierarchical key
         :return: value (or resulting child dict) or key error if the key cannot be found
         """
+        try:
+            return self.__flat[src_key]
+        except KeyError:
+            pass
         keys = src_key.split('.')
         value = self.__data
         for key in keys:
-            if key in value:
+            if isinstance(value, dict) and key in value:
                 value = value[key]
             else:
                 raise KeyError(f"Key '{key}' in {src_key} not found in the config file {self.__filename}")
@@ -59,14 +80,7 @@ class Config(object):
         :param key: dot notation hierarchical key
         :return: bool if the key can be navigated in the JSON heirarchy
         """
-        keys = src_key.split('.')
-        value = self.__data
-        for key in keys:
-            if key in value:
-                value = value[key]
-            else:
-                return False
-        return True
+        return src_key in self.__flat
     
     def as_list(self, key: str) -> [str]:
         """
@@ -127,14 +141,9 @@ class Config(object):
                  any other value will be interpreted as True
                  if the key does not exist, it will also return False
         """
-        keys = src_key.split('.')
-        value = self.__data
-        for key in keys:
-            if key in value:
-                value = value[key]
-            else:
-                return False
-        return str(value).lower().strip() not in ["0", "false"]
+        if src_key not in self.__flat:
+            return False
+        return str(self.__flat[src_key]).lower().strip() not in ["0", "false"]
 
     def validate_instance(self, key: str):
         """
@@ -142,15 +151,13 @@ class Config(object):
         :param key: dot notation hierarchical key
         :return: True if referenced key can be 'reflected', otherwise, False
         """
-        sys.path.insert(0, self.__ad_path)
-        module_name, class_name = self[key].rsplit(".", 1)
         try:
-            module = importlib.import_module(module_name)
-            hasattr(module, class_name)
+            module_name, class_name = registry.path(self[key]).rsplit(".", 1)
+            importlib.import_module(module_name)
             return True
-        except (KeyError, ImportError, AttributeError) as ex:
-            print(ex)
-            raise SyntaxError(str(ex), ex)
+        except (KeyError, ImportError, AttributeError, ValueError) as ex:
+            # False is the answer, the caller reports it
+            log.debug("%s can not be reflected: %s", key, ex)
             return False
 
     def instance(self, key: str):
@@ -158,12 +165,7 @@ class Config(object):
         Reflection to get an handle to class that can be instantiated.
         :param key: dot notation hierarchical key
         :return: Return a class that can be instantiated.
-                 The format for the value should be akin to "module.Class"
-                 Will dynamically import the module specified to be able
-                 to provide the class.
-        """
-        sys.path.insert(0, self.__ad_path)
-        module_name, class_name = self[key].rsplit(".", 1)
-        module = importlib.import_module(module_name)
-        cls = getattr(module, class_name)
-        return cls
+                 The value is a handler name from the manifest (see handlers/registry.py) or akin
+                 to "module.Class". The module is imported on first use only.
+        """
+        return registry.resolve(self[key])
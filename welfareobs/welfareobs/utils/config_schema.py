@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: config_schema.py
+Description: Typed, validated configuration objects for the pipeline and handler configs
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import dataclasses
+import json
+import types
+import typing
+from dataclasses import dataclass, field
+from welfareobs.utils.config import Config
+
+
+"""
+A schema is a frozen, slotted dataclass. Each field maps to the JSON key with the underscores replaced by
+hyphens (or field(metadata={"key": ...})). Fields without a default are required. Values are converted by
+the field annotation: str, int, float, bool ("0"/"false" are False, as Config.as_bool), list[str] (a single
+string becomes a one element list), dict, or X|None (missing or empty string is None).
+
+Handlers declare their schema with a CONFIG class attribute. load_pipeline() parses the pipeline and every
+handler config it references once, collects every problem it finds and raises a single ConfigError, so the
+hot path reads plain attributes instead of dotted keys.
+"""
+
+
+class ConfigError(SyntaxError):
+    def __init__(self, errors: list[str]):
+        super().__init__(f"{len(errors)} configuration error(s):\n  " + "\n  ".join(errors))
+        self.errors: list[str] = errors
+
+
+def _key(f: dataclasses.Field) -> str:
+    return f.metadata.get("key", f.name.replace("_", "-"))
+
+
+def _convert(value: any, annotation: any) -> any:
+    if isinstance(annotation, types.UnionType) or typing.get_origin(annotation) is typing.Union:
+        args = [o for o in typing.get_args(annotation) if o is not type(None)]
+        if value is None or value == "":
+            return None
+        return _convert(value, args[0])
+    origin = typing.get_origin(annotation)
+    if annotation is bool:
+        return str(value).lower().strip() not in ["0", "false"]
+    if annotation is int:
+        return int(value)
+    if annotation is float:
+        return float(value)
+    if annotation is str:
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"expected a string, got {type(value).__name__}")
+        return str(value)
+    if origin is list or annotation is list:
+        if isinstance(value, str):
+            return [value]
+        if not isinstance(value, list):
+            raise ValueError(f"expected a list, got {type(value).__name__}")
+        return [str(o) for o in value]
+    if origin is dict or annotation is dict:
+        if not isinstance(value, dict):
+            raise ValueError(f"expected an object, got {type(value).__name__}")
+        return value
+    return value
+
+
+def parse(cls: type, src: dict, where: str, errors: list[str]) -> any:
+    """
+    Parse a dict into a schema dataclass
+    :param cls: schema dataclass
+    :param src: JSON object
+    :param where: location used in error messages (filename or key)
+    :param errors: problems are appended here
+    :return: instance of cls, or None if there were errors
+    """
+    if not isinstance(src, dict):
+        errors.append(f"{where}: expected an object")
+        return None
+    count = len(errors)
+    hints = typing.get_type_hints(cls)
+    values = {}
+    keys = set()
+    for f in dataclasses.fields(cls):
+        key = _key(f)
+        keys.add(key)
+        if key not in src:
+            if f.default is dataclasses.MISSING and f.default_factory is dataclasses.MISSING:
+                errors.append(f"{where}: missing `{key}`")
+            continue
+        try:
+            values[f.name] = _convert(src[key], hints[f.name])
+        except (TypeError, ValueError) as ex:
+            errors.append(f"{where}: `{key}` is invalid ({ex})")
+    for key in src.keys():
+        if key not in keys:
+            errors.append(f"{where}: unknown key `{key}`")
+    if len(errors) > count:
+        return None
+    return cls(**values)
+
+
+def parse_file(cls: type, filename: str, errors: list[str]|None = None) -> any:
+    """
+    Parse a JSON file into a schema dataclass
+    :param errors: problems are appended here, if None a ConfigError is raised instead
+    :return: instance of cls (None if there were errors and errors was given)
+    """
+    raise_errors = errors is None
+    errors = [] if errors is None else errors
+    output = None
+    try:
+        with open(filename, "r") as file:
+            output = parse(cls, json.load(file), filename, errors)
+    except OSError as ex:
+        errors.append(f"{filename}: {ex.strerror}")
+    except json.JSONDecodeError as ex:
+        errors.append(f"{filename}: invalid JSON ({ex})")
+    if raise_errors and len(errors) > 0:
+        raise ConfigError(errors)
+    return output
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    configuration_name: str
+    performance_history_size: int
+    threadpool_size: int
+    setup_threads: int = 4
+    hot_reload: bool = False
+    hot_reload_seconds: float = 2.0
+    run_count: int|None = None
+    run_seconds: int|None = None
+    performance_csv_filename: str = ""
+    performance_exact_statistics: bool = False
+    performance_snapshot_seconds: int = 0
+    handler_timing_filename: str = ""
+    metrics_port: int = 0
+    log_level: str = "INFO"
+    log_levels: dict = field(default_factory=dict)
+    log_json_filename: str = ""
+    trace_filename: str = ""
+    trace_capacity: int = 100000
+    trace_dump_seconds: int = 0
+    memory_accounting: bool = False
+    memory_budget_mb: float = 0.0
+    memory_soft_fraction: float = 0.9
+    memory_report_filename: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class Task:
+    name: str
+    handler: str
+    inputs: list[str]
+    param: str
+    config: any = None  # handler CONFIG instance (None for handlers whose param is not a config file)
+
+
+@dataclass(frozen=True, slots=True)
+class Pipeline:
+    settings: Settings
+    steps: list[tuple[str, list[str]]]
+    tasks: dict[str, Task]
+
+
+def load_pipeline(cnf: Config) -> Pipeline:
+    """
+    Validate the pipeline config and every handler config it references in one pass
+    :param cnf: pipeline Config
+    :return: Pipeline
+    :raises ConfigError: with every problem found
+    """
+    errors: list[str] = []
+    settings = parse(Settings, cnf["settings"] if cnf.exists("settings") else {}, "settings", errors)
+    steps: list[tuple[str, list[str]]] = []
+    tasks: dict[str, Task] = {}
+    names = cnf.as_list("pipeline")
+    if len(names) < 1:
+        errors.append("`pipeline` element must exist and contain an array of at least one element")
+    for step in names:
+        jobs = cnf.as_list(step)
+        if len(jobs) < 1:
+            errors.append(f"`{step}` element must exist and contain an array of at least one task")
+        steps.append((step, jobs))
+        for task in jobs:
+            if not cnf.exists(task) or not isinstance(cnf[task], dict):
+                errors.append(f"`{task}` element must exist")
+                continue
+            handler = cnf.as_string(f"{task}.handler")
+            param = cnf.as_string(f"{task}.config")
+            try:
+                handler_class = cnf.instance(f"{task}.handler")
+            except (KeyError, ImportError, AttributeError, ValueError) as ex:
+                errors.append(f"`{task}` element must contain a valid handler in <package>.<class> format ({ex})")
+                continue
+            schema = getattr(handler_class, "CONFIG", None)
+            config = None
+            if schema is not None:
+                config = parse_file(schema, param, errors)
+            tasks[task] = Task(task, handler, cnf.as_list(f"{task}.input"), param, config)
+    declared = {task for _, jobs in steps for task in jobs}
+    for task in tasks.values():
+        for name in task.inputs:
+            if name not in declared:
+                errors.append(f"`{task.name}` input `{name}` is not a task in the pipeline")
+    if len(errors) > 0:
+        raise ConfigError(errors)
+    return Pipeline(settings, steps, tasks)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: detection_cache.py
+Description: On-disk cache of detection outputs keyed by source frame and model configuration
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from welfareobs.models.frame import Frame
+from welfareobs.models.individual import Individual
+from welfareobs.utils.model_cache import file_sha256
+from welfareobs.utils.logger import get_logger
+from welfareobs.utils.payload_file import PayloadReader, PayloadWriter
+
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class DetectionConfig:
+    """
+    Detection handler config (shared by DetectionHandler and ReplayDetectionHandler, see detection.py)
+    """
+    dimensions: int
+    reid_model_root: str
+    reid_timm_backbone: str
+    segmentation_checkpoint: str
+    pytorch_device: str = "cuda"
+    debug_enable: bool = False
+    record_cache: str = ""
+    profile_output: str = ""
+    profile_skip: int = 0
+    profile_iterations: int = 20
+    profile_memory: bool = False
+    warmup_iterations: int = 0
+    model_cache: str = ""
+
+
+class DetectionCache(object):
+    """
+    Layout:
+        <root>/<model hash>/detections.bin(.idx)  payload records, one list[Individual] per frame
+        <root>/<model hash>/keys.tsv              frame key -> record number (appended, last entry wins)
+
+    The model hash covers the detection config keys that change the output plus the contents of the
+    weights/gallery files, so retraining, a new gallery or changing the config records into a fresh cache,
+    while touching or copying the files keeps it.
+    """
+    # no paths: a model root copied to another device replays the same recording
+    MODEL_KEYS = ["dimensions", "reid_timm_backbone", "pytorch_device"]
+    WEIGHT_KEYS = ["dimensions", "reid_timm_backbone"]
+
+    def __init__(self, root: str, model_hash: str, writable: bool = False):
+        self.__root = os.path.join(root, model_hash)
+        self.__writable = writable
+        self.__keys: dict[str, int] = {}
+        self.__writer: PayloadWriter|None = None
+        self.__key_file = None
+        if writable:
+            os.makedirs(self.__root, exist_ok=True)
+        keys_filename = os.path.join(self.__root, "keys.tsv")
+        if os.path.exists(keys_filename):
+            with open(keys_filename, "r") as file:
+                for line in file:
+                    key, record = line.rstrip("\n").rsplit("\t", 1)
+                    self.__keys[key] = int(record)
+        if writable:
+            self.__writer = PayloadWriter(os.path.join(self.__root, "detections.bin"), append=True)
+            self.__key_file = open(keys_filename, "a")
+        self.__reader = PayloadReader(os.path.join(self.__root, "detections.bin"))
+        log.info("Detection cache %s: %d frames", self.__root, len(self.__keys))
+
+    @staticmethod
+    def model_hash(cnf: DetectionConfig, memo: str|None = None) -> str:
+        """
+        Hash of the detection configuration and the contents of the files it points to (weights and
+        gallery, the detections depend on both)
+        :param cnf: detection handler configuration
+        :param memo: JSON file remembering file hashes by size and mtime (see file_sha256)
+        :return: hex digest
+        """
+        digest = hashlib.sha256()
+        for key in DetectionCache.MODEL_KEYS:
+            digest.update(f"{key.replace('_', '-')}={getattr(cnf, key)}\n".encode("utf-8"))
+        root = cnf.reid_model_root
+        for filename in [cnf.segmentation_checkpoint,
+                         os.path.join(root, "checkpoint.pth"),
+                         os.path.join(root, "similarity.pkl"),
+                         os.path.join(root, "similarity.npy"),
+                         os.path.join(root, "similarity.json")]:
+            if os.path.exists(filename):
+                digest.update(f"{os.path.basename(filename)}:{file_sha256(filename, memo)}\n".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def memo(cnf: DetectionConfig) -> str:
+        """
+        :return: file hash memo of a record cache (pass to model_hash)
+        """
+        return os.path.join(cnf.record_cache, "hashes.json")
+
+    @staticmethod
+    def weights_hash(cnf: DetectionConfig, hash_file: callable = file_sha256) -> str:
+        """
+        Model cache key: the config keys that shape the model and the contents of the segmentation
+        checkpoint and checkpoint.pth. The gallery is not part of the model (it is hot reloaded), and paths
+        and mtimes are left out so the model root can be copied between devices.
+        :param hash_file: filename -> sha256 (ModelCache.hash_file remembers them)
+        :return: hex digest
+        """
+        digest = hashlib.sha256()
+        for key in DetectionCache.WEIGHT_KEYS:
+            digest.update(f"{key}={getattr(cnf, key)}\n".encode("utf-8"))
+        for filename in [cnf.segmentation_checkpoint, os.path.join(cnf.reid_model_root, "checkpoint.pth")]:
+            digest.update(f"{os.path.basename(filename)}:{hash_file(filename)}\n".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def key(frame: Frame) -> str:
+        if frame.filename is not None:
+            return frame.filename
+        return f"{frame.camera_name}@{frame.timestamp}"
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __contains__(self, frame: Frame) -> bool:
+        return DetectionCache.key(frame) in self.__keys
+
+    def get(self, frame: Frame) -> list[Individual]|None:
+        """
+        Cached detections for a frame, re-stamped with the frame camera and timestamp
+        :param frame: source frame
+        :return: list of individuals or None if the frame has not been recorded
+        """
+        record = self.__keys.get(DetectionCache.key(frame))
+        if record is None:
+            return None
+        individuals: list[Individual] = self.__reader[record]
+        for individual in individuals:
+            individual.camera_name = frame.camera_name
+            individual.timestamp = frame.timestamp
+        return individuals
+
+    def put(self, frame: Frame, individuals: list[Individual]):
+        if not self.__writable:
+            raise RuntimeError(f"Detection cache {self.__root} is read only")
+        key = DetectionCache.key(frame)
+        self.__keys[key] = self.__writer.write(individuals)
+        self.__key_file.write(f"{key}\t{self.__keys[key]}\n")
+        self.__key_file.flush()
+
+    def close(self):
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__key_file.close()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: gallery.py
+Description: Memory-mappable float16 ReID gallery and a content-addressed embedding cache
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+
+"""
+Gallery layout (written by train_model.py next to checkpoint.pth):
+    <root>/similarity.npy   float16 (individuals x embedding) array, np.load(..., mmap_mode="r")
+    <root>/similarity.json  {"labels": [one identity per row], "dimensions": embedding size, "count": rows}
+
+similarity.pkl (a pickled wildlife-tools FeatureDataset) is still read when there is no similarity.npy.
+"""
+GALLERY_NAME = "similarity"
+
+
+def image_hash(filename: str) -> str:
+    """
+    Content hash of an image file (renaming or moving an image keeps its embedding)
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_gallery(root: str, features: np.ndarray, labels: list[str], name: str = GALLERY_NAME):
+    """
+    Write a gallery (rows of features with one label each)
+    """
+    if len(features) != len(labels):
+        raise ValueError(f"{len(features)} features but {len(labels)} labels")
+    features = np.asarray(features, dtype=np.float16)
+    # the label index first: a hot reload watches the .npy, so the index is complete once that changes
+    with open(os.path.join(root, f"{name}.json"), "w") as file:
+        json.dump({"labels": [str(o) for o in labels], "dimensions": int(features.shape[1]), "count": len(labels)}, file)
+    np.save(os.path.join(root, f"{name}.npy"), features)
+
+
+class Gallery(object):
+    """
+    Read side of the gallery. Quacks like the wildlife-tools FeatureDataset as ReIdHead uses it
+    (features, labels_string). features, the float32 rows the similarity is computed against, is built
+    here: a gallery is loaded in setup, or by reload() on the hot reload thread, so the swapped-in gallery
+    never converts anything on the pipeline thread. The float16 file is only read through the map for
+    the conversion (page cache, which the kernel can drop), so the resident copy is the float32 one that
+    the pickled FeatureDataset held before.
+    """
+    def __init__(self, root: str, name: str = GALLERY_NAME):
+        with open(os.path.join(root, f"{name}.json"), "r") as file:
+            index = json.load(file)
+        self.__array: np.ndarray = np.load(os.path.join(root, f"{name}.npy"), mmap_mode="r")
+        if len(self.__array) != index["count"]:
+            raise ValueError(f"{root}/{name}: {len(self.__array)} rows but {index['count']} labels")
+        self.labels_string: np.ndarray = np.array(index["labels"])
+        self.features: np.ndarray = np.asarray(self.__array, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.labels_string)
+
+    @property
+    def array(self) -> np.ndarray:
+        """float16, memory mapped"""
+        return self.__array
+
+
+def gallery_filename(root: str) -> str:
+    """
+    :return: the gallery file load_gallery() reads for a ReID model root
+    """
+    filename = os.path.join(root, f"{GALLERY_NAME}.npy")
+    return filename if os.path.exists(filename) else os.path.join(root, f"{GALLERY_NAME}.pkl")
+
+
+def gallery_filenames(root: str) -> list[str]:
+    """
+    :return: both gallery files a ReID model root can hold (the .npy that save_gallery writes and the legacy
+        .pkl), whether they exist yet or not. A hot reload watches both, so a .npy written after setup (the
+        first rebuild after a .pkl-only root) is picked up, and load_gallery chooses which to read.
+    """
+    return [os.path.join(root, f"{GALLERY_NAME}.npy"), os.path.join(root, f"{GALLERY_NAME}.pkl")]
+
+
+def load_gallery(root: str):
+    """
+    :param root: ReID model root
+    :return: Gallery, or a FeatureDataset when only similarity.pkl exists
+    """
+    if gallery_filename(root).endswith(".npy"):
+        return Gallery(root)
+    from wildlife_tools.data import FeatureDataset
+    return FeatureDataset.from_file(os.path.join(root, f"{GALLERY_NAME}.pkl"))
+
+
+class EmbeddingCache(object):
+    """
+    Layout:
+        <root>/<model key>/embeddings.f16  float16 rows, appended
+        <root>/<model key>/index.tsv       image hash -> row (appended, last entry wins)
+        <root>/<model key>/meta.json       dimensions and whatever describes the model
+
+    The model key covers the backbone, the checkpoint contents and the input transform (see model_key),
+    so an image is embedded once per trained model and rebuilding a gallery after adding images only
+    embeds the new ones.
+    """
+    def __init__(self, root: str, key: str, meta: dict|None = None):
+        self.__root = os.path.join(root, key)
+        os.makedirs(self.__root, exist_ok=True)
+        self.__rows: dict[str, int] = {}
+        self.__dimensions: int = 0
+        meta_filename = os.path.join(self.__root, "meta.json")
+        if os.path.exists(meta_filename):
+            with open(meta_filename, "r") as file:
+                self.__dimensions = json.load(file)["dimensions"]
+        self.__meta = meta or {}
+        index_filename = os.path.join(self.__root, "index.tsv")
+        if os.path.exists(index_filename):
+            with open(index_filename, "r") as file:
+                for line in file:
+                    key, row = line.rstrip("\n").split("\t")
+                    self.__rows[key] = int(row)
+        # rows past the end of the data file (a crash between the two appends) are dropped
+        count = self.__count()
+        self.__rows = {k: v for k, v in self.__rows.items() if v < count}
+
+    def __count(self) -> int:
+        filename = os.path.join(self.__root, "embeddings.f16")
+        if self.__dimensions == 0 or not os.path.exists(filename):
+            return 0
+        return os.path.getsize(filename) // (2 * self.__dimensions)
+
+    def __len__(self):
+        return len(self.__rows)
+
+    def __contains__(self, image: str) -> bool:
+        return image in self.__rows
+
+    @staticmethod
+    def model_key(backbone: str, checkpoint: str|None, dimensions: int, transform: str = "") -> str:
+        """
+        :param backbone: timm model name
+        :param checkpoint: fine-tuned weights file (hashed by content), None for the pretrained backbone
+        :param dimensions: input size
+        :param transform: description of the input transform (repr of the torchvision Compose)
+        :return: hex digest
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{backbone}\n{dimensions}\n{transform}\n".encode("utf-8"))
+        if checkpoint is not None:
+            digest.update(image_hash(checkpoint).encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def get(self, images: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param images: image hashes
+        :return: (bool array of which images are cached, float32 array of their embeddings in order)
+        """
+        found = np.array([o in self.__rows for o in images], dtype=bool)
+        if not found.any():
+            return found, np.zeros((0, self.__dimensions), dtype=np.float32)
+        data = np.memmap(os.path.join(self.__root, "embeddings.f16"), dtype=np.float16, mode="r",
+                         shape=(self.__count(), self.__dimensions))
+        rows = [self.__rows[o] for o, hit in zip(images, found) if hit]
+        return found, np.asarray(data[rows], dtype=np.float32)
+
+    def put(self, images: list[str], embeddings: np.ndarray):
+        """
+        Append embeddings (one row per image hash)
+        """
+        if len(images) == 0:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float16)
+        if self.__dimensions == 0:
+            self.__dimensions = int(embeddings.shape[1])
+            with open(os.path.join(self.__root, "meta.json"), "w") as file:
+                json.dump({**self.__meta, "dimensions": self.__dimensions}, file, indent=2)
+        elif embeddings.shape[1] != self.__dimensions:
+            raise ValueError(f"expected {self.__dimensions} dimensions, got {embeddings.shape[1]}")
+        start = self.__count()
+        with open(os.path.join(self.__root, "embeddings.f16"), "ab") as file:
+            file.write(embeddings.tobytes())
+        with open(os.path.join(self.__root, "index.tsv"), "a") as file:
+            for offset, image in enumerate(images):
+                file.write(f"{image}\t{start + offset}\n")
+                self.__rows[image] = start + offset
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: handler_timing.py
+Description: Per-job, per-phase timing of handler calls with critical path reporting
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import time
+from welfareobs.utils.performance_monitor import PerformanceMonitor
+from welfareobs.utils.tracer import Tracer
+from welfareobs.utils.memory_accountant import MemoryAccountant
+
+
+class HandlerTiming(object):
+    """
+    Times every handler call (get_output, set_inputs and run) with perf_counter_ns and keeps a streaming
+    PerformanceMonitor (no raw history) per job and phase. The monitors here are in milliseconds (the
+    monitor rounds its statistics to 3 places).
+
+    Per iteration the critical path is the serial runner-thread work (get_output/set_inputs, which is where
+    the faux camera and location handlers do their work) plus, for each step, the slowest job's run (or the
+    sum of the runs when the step is not threaded).
+
+    When a Tracer is given every timed call is also recorded as a trace event, and when a MemoryAccountant
+    is given its heap growth is attributed to the job/phase.
+    """
+    PHASES = ["get_output", "set_inputs", "run"]
+
+    def __init__(self, tracer: Tracer|None = None, memory: MemoryAccountant|None = None):
+        self.__tracer: Tracer|None = tracer
+        self.__memory: MemoryAccountant|None = memory if memory is not None and memory.tracing else None
+        self.__steps: list[tuple[str, list[str], bool]] = []
+        self.__monitors: dict[tuple[str, str], PerformanceMonitor] = {}
+        self.__current: dict[tuple[str, str], int] = {}
+        self.__critical_path: PerformanceMonitor = PerformanceMonitor("critical-path", history_size=0)
+        self.__critical_counts: dict[str, int] = {}
+        self.__worst: tuple[float, int, list] = (0.0, 0, [])
+        self.__iterations: int = 0
+
+    def register(self, step: str, jobs: list[str], parallel: bool = True):
+        """
+        Register a pipeline step (in pipeline order)
+        :param step: step label
+        :param jobs: job names in the step
+        :param parallel: True if the step runs its jobs in a thread pool
+        :return: None
+        """
+        self.__steps.append((step, jobs, parallel))
+        for job in jobs:
+            self.__critical_counts[job] = 0
+            for phase in HandlerTiming.PHASES:
+                self.__monitors[(job, phase)] = PerformanceMonitor(f"{job}.{phase}", history_size=0)
+                self.__current[(job, phase)] = 0
+
+    def timed(self, job: str, phase: str, fn, *args):
+        """
+        Call fn(*args) and attribute the elapsed time to job/phase
+        :return: whatever fn returns
+        """
+        if self.__memory is not None:
+            self.__memory.before()
+        start = time.perf_counter_ns()
+        try:
+            return fn(*args)
+        finally:
+            end = time.perf_counter_ns()
+            if self.__memory is not None:
+                self.__memory.after(job, phase)
+            self.__current[(job, phase)] += end - start
+            if self.__tracer is not None:
+                self.__tracer.complete(job, phase, start, end)
+
+    def end_iteration(self):
+        """
+        Fold the current iteration into the statistics (call once per Runner loop)
+        """
+        serial_ns = 0
+        path_ns = 0
+        path = []
+        for step, jobs, parallel in self.__steps:
+            runs = [(self.__current[(job, "run")], job) for job in jobs]
+            if parallel:
+                slowest_ns, slowest = max(runs)
+                path_ns += slowest_ns
+                path.append((step, slowest, slowest_ns / 1e6))
+                self.__critical_counts[slowest] += 1
+            else:
+                path_ns += sum(o[0] for o in runs)
+                path.extend((step, job, ns / 1e6) for ns, job in runs)
+                for _, job in runs:
+                    self.__critical_counts[job] += 1
+        for key, elapsed_ns in self.__current.items():
+            if elapsed_ns == 0:
+                continue  # not called this iteration (e.g. get_output of a job nothing consumes)
+            if key[1] != "run":
+                serial_ns += elapsed_ns
+            self.__monitors[key].add(elapsed_ns / 1e6)
+            self.__current[key] = 0
+        path.insert(0, ("runner", "get_output/set_inputs", serial_ns / 1e6))
+        total_ms = (serial_ns + path_ns) / 1e6
+        self.__critical_path.add(total_ms)
+        if total_ms > self.__worst[0]:
+            self.__worst = (total_ms, self.__iterations, path)
+        self.__iterations += 1
+
+    @property
+    def iterations(self) -> int:
+        return self.__iterations
+
+    @property
+    def monitors(self) -> dict[tuple[str, str], PerformanceMonitor]:
+        """(job, phase) -> monitor (milliseconds)"""
+        return self.__monitors
+
+    @property
+    def critical_path(self) -> PerformanceMonitor:
+        """Critical path per iteration (milliseconds)"""
+        return self.__critical_path
+
+    def report(self, top: int = 10) -> dict:
+        """
+        Structured report
+        :param top: number of job/phase contributors to list
+        :return: dict (JSON serialisable)
+        """
+        total = sum(o.overall_execution_time for o in self.__monitors.values())
+        contributors = sorted(self.__monitors.items(), key=lambda o: o[1].overall_execution_time, reverse=True)
+        return {
+            "iterations": self.__iterations,
+            "top": [
+                {
+                    "job": job,
+                    "phase": phase,
+                    "total_s": round(monitor.overall_execution_time / 1e3, 6),
+                    "share": round(monitor.overall_execution_time / total, 4) if total > 0 else 0.0,
+                    "mean_ms": round(monitor.overall_execution_time / max(1, monitor.number_of_executions), 3),
+                    "p50_ms": monitor.median,
+                    "p95_ms": monitor.p95,
+                    "p99_ms": monitor.p99,
+                }
+                for (job, phase), monitor in contributors[:top]
+            ],
+            "critical_path": {
+                "mean_ms": self.__critical_path.average,
+                "p99_ms": self.__critical_path.p99,
+                "jobs": dict(sorted(self.__critical_counts.items(), key=lambda o: o[1], reverse=True)),
+                "worst": {
+                    "iteration": self.__worst[1],
+                    "ms": round(self.__worst[0], 3),
+                    "path": [{"step": step, "job": job, "ms": round(ms, 3)} for step, job, ms in self.__worst[2]]
+                }
+            }
+        }
+
+    def __str__(self):
+        report = self.report()
+        lines = [f"Handler timing over {report['iterations']} iterations",
+                 f"{'job':<24}{'phase':<12}{'total s':>10}{'share':>8}{'mean ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for o in report["top"]:
+            lines.append(f"{o['job']:<24}{o['phase']:<12}{o['total_s']:>10.3f}{o['share']:>8.1%}{o['mean_ms']:>10.3f}{o['p95_ms']:>10.3f}{o['p99_ms']:>10.3f}")
+        critical = report["critical_path"]
+        lines.append(f"critical path: mean={critical['mean_ms']}ms p99={critical['p99_ms']}ms worst={critical['worst']['ms']}ms (iteration {critical['worst']['iteration']})")
+        lines.append("  " + " -> ".join(f"{o['job']} {o['ms']}ms" for o in critical["worst"]["path"]))
+        return "\n".join(lines)
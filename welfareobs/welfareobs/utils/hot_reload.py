@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: hot_reload.py
+Description: Watch handler data files (gallery, calibrations), rebuild off-thread, swap between iterations
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import os
+import queue
+import signal
+import threading
+from welfareobs.handlers.abstract_handler import AbstractHandler
+from welfareobs.utils.logger import get_logger
+from welfareobs.utils.metrics import REGISTRY
+
+
+log = get_logger(__name__)
+
+
+class HotReloader(object):
+    """
+    A watcher thread polls the files each handler lists in reload_files(). When a file has changed and then
+    stayed unchanged for one poll (so a half copied file is never read), the watcher calls the handler's
+    reload(filename) on its own thread. That builds the new state (unpickling a gallery, resizing a LUT)
+    and returns a swap function. The swaps are queued and apply() runs them on the runner thread between
+    iterations. A swap is a reference assignment, so the loop never waits on a reload.
+
+    SIGHUP (where available, when started on the main thread) reloads every watched file straight away.
+    If a reload fails, the handler keeps its current state and the error is logged.
+    """
+    def __init__(self, jobs: list[AbstractHandler], poll_seconds: float = 2.0):
+        self.__jobs: list[AbstractHandler] = jobs
+        self.__poll_seconds: float = poll_seconds
+        self.__stats: dict[str, tuple[int, int]|None] = {}
+        self.__pending: dict[str, tuple[int, int]] = {}
+        self.__swaps: queue.SimpleQueue = queue.SimpleQueue()
+        self.__stop = threading.Event()
+        self.__force = threading.Event()
+        self.__thread: threading.Thread|None = None
+        self.__reloads: int = 0
+        self.__previous_handler = None
+
+    @property
+    def reloads(self) -> int:
+        """Reloads swapped in so far"""
+        return self.__reloads
+
+    @staticmethod
+    def __stat(filename: str) -> tuple[int, int]|None:
+        try:
+            stat = os.stat(filename)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def __watched(self) -> list[tuple[AbstractHandler, str]]:
+        return [(job, filename) for job in self.__jobs for filename in job.reload_files()]
+
+    def start(self):
+        for _, filename in self.__watched():
+            self.__stats[filename] = HotReloader.__stat(filename)
+        if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+            self.__previous_handler = signal.signal(signal.SIGHUP, lambda signum, frame: self.__force.set())
+        self.__thread = threading.Thread(target=self.__watch, name="hot-reload", daemon=True)
+        self.__thread.start()
+        log.info("Watching %d files for hot reload", len(self.__stats))
+
+    def stop(self):
+        self.__stop.set()
+        self.__force.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if self.__previous_handler is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, self.__previous_handler)
+            self.__previous_handler = None
+
+    def request(self):
+        """
+        Reload every watched file now (what SIGHUP does)
+        """
+        self.__force.set()
+
+    def __watch(self):
+        while not self.__stop.is_set():
+            self.__force.wait(self.__poll_seconds)
+            if self.__stop.is_set():
+                break
+            forced = self.__force.is_set()
+            self.__force.clear()
+            self.check(forced)
+
+    def check(self, force: bool = False):
+        """
+        One poll of the watched files (the watcher thread calls this, tests can call it directly)
+        :param force: reload every file whether it changed or not
+        """
+        for job, filename in self.__watched():
+            current = HotReloader.__stat(filename)
+            if current is None:
+                continue
+            if not force:
+                if current == self.__stats.get(filename):
+                    self.__pending.pop(filename, None)
+                    continue
+                if self.__pending.get(filename) != current:
+                    # changed since the last poll: wait until it has settled
+                    self.__pending[filename] = current
+                    continue
+            self.__pending.pop(filename, None)
+            self.__stats[filename] = current
+            try:
+                swap = job.reload(filename)
+            except Exception as ex:
+                log.error("%s failed to reload %s, keeping the current state: %s", job.name, filename, ex)
+                continue
+            if swap is not None:
+                self.__swaps.put((job.name, filename, swap))
+
+    def apply(self) -> int:
+        """
+        Swap in every reload that is ready (call between iterations, from the runner thread)
+        :return: number of reloads applied
+        """
+        applied = 0
+        while True:
+            try:
+                name, filename, swap = self.__swaps.get_nowait()
+            except queue.Empty:
+                return applied
+            swap()
+            applied += 1
+            self.__reloads += 1
+            REGISTRY.inc("welfareobs_reloads", 1, "Hot reloads swapped in", job=name)
+            log.info("%s reloaded %s", name, filename)
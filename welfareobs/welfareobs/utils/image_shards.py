@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: image_shards.py
+Description: Resized uint8 images in memory-mapped shards (decoded once, random access without decoding)
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+
+def rgb_array(image: Image.Image, size: int) -> np.ndarray:
+    """
+    :return: uint8 (size x size x 3) RGB, resized bilinear (antialiased when reducing)
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.BILINEAR)
+    return np.asarray(image)
+
+
+class ShardWriter(object):
+    """
+    Layout:
+        <directory>/shard-00000.npy  uint8 (rows x size x size x 3) RGB, one file per shard-size rows
+        <directory>/index.json       size, the row keys in order and the shard row counts
+
+    index.json is written last by close(), so an interrupted run leaves no readable store. Keys identify the
+    source of each row (the dataset checks them against its metadata).
+    """
+    def __init__(self, directory: str, size: int, shard_size: int = 1024, meta: dict|None = None):
+        self.__directory = directory
+        self.__size = size
+        self.__shard_size = shard_size
+        self.__meta = meta or {}
+        self.__keys: list[str] = []
+        self.__shards: list[int] = []
+        self.__buffer: np.ndarray = np.zeros((shard_size, size, size, 3), dtype=np.uint8)
+        self.__buffered: int = 0
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, "index.json")):
+            os.remove(os.path.join(directory, "index.json"))
+
+    def add(self, key: str, image: Image.Image|np.ndarray):
+        """
+        :param key: identifies the row's source
+        :param image: any size, converted to RGB and resized (see rgb_array), or an array rgb_array returned
+        """
+        if not isinstance(image, np.ndarray):
+            image = rgb_array(image, self.__size)
+        self.__buffer[self.__buffered] = image
+        self.__buffered += 1
+        self.__keys.append(key)
+        if self.__buffered == self.__shard_size:
+            self.__flush()
+
+    def __flush(self):
+        if self.__buffered == 0:
+            return
+        np.save(os.path.join(self.__directory, f"shard-{len(self.__shards):05d}.npy"), self.__buffer[:self.__buffered])
+        self.__shards.append(self.__buffered)
+        self.__buffered = 0
+
+    def close(self):
+        self.__flush()
+        with open(os.path.join(self.__directory, "index.json"), "w") as file:
+            json.dump({**self.__meta, "size": self.__size, "shards": self.__shards, "keys": self.__keys}, file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+def write_shards(directory: str, keys: list[str], load: callable, size: int, shard_size: int = 1024,
+                 workers: int = 8, meta: dict|None = None):
+    """
+    Decode and resize every image on a thread pool (PIL releases the GIL while decoding and resizing). At
+    most 4 x workers images are in flight, so memory stays bounded whatever the number of keys, and the
+    full size images never queue up: each worker hands back the resized array.
+    :param keys: one per row, in dataset order
+    :param load: returns the PIL image for a key
+    :param workers: decoding threads
+    """
+    def prepare(key: str) -> np.ndarray:
+        return rgb_array(load(key), size)
+
+    with ShardWriter(directory, size, shard_size, meta) as writer:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for key in keys:
+                if len(pending) >= 4 * workers:
+                    done, future = pending.popleft()
+                    writer.add(done, future.result())
+                pending.append((key, pool.submit(prepare, key)))
+            for done, future in pending:
+                writer.add(done, future.result())
+
+
+class ShardedImages(object):
+    """
+    Read side. Shards are memory mapped on first access in each process, so the dataset can be handed to
+    DataLoader workers (forked or spawned) before anything is mapped.
+    """
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "index.json"), "r") as file:
+            self.__index: dict = json.load(file)
+        self.__directory = directory
+        self.__starts: np.ndarray = np.cumsum([0] + self.__index["shards"])
+        self.__mapped: dict[int, np.ndarray] = {}
+
+    def __len__(self):
+        return int(self.__starts[-1])
+
+    @property
+    def size(self) -> int:
+        return self.__index["size"]
+
+    @property
+    def keys(self) -> list[str]:
+        return self.__index["keys"]
+
+    @property
+    def meta(self) -> dict:
+        return {k: v for k, v in self.__index.items() if k not in ("shards", "keys")}
+
+    def __getstate__(self):
+        # mappings are not pickled for worker processes, each maps on first use
+        return {"directory": self.__directory, "index": self.__index}
+
+    def __setstate__(self, state):
+        self.__directory = state["directory"]
+        self.__index = state["index"]
+        self.__starts = np.cumsum([0] + self.__index["shards"])
+        self.__mapped = {}
+
+    def __shard(self, shard: int) -> np.ndarray:
+        if shard not in self.__mapped:
+            self.__mapped[shard] = np.load(os.path.join(self.__directory, f"shard-{shard:05d}.npy"), mmap_mode="r")
+        return self.__mapped[shard]
+
+    def __getitem__(self, row: int) -> np.ndarray:
+        """
+        :return: uint8 (size x size x 3) RGB, a view of the mapping
+        """
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        shard = int(np.searchsorted(self.__starts, row, side="right")) - 1
+        return self.__shard(shard)[row - self.__starts[shard]]
+
+    def image(self, row: int) -> Image.Image:
+        return Image.fromarray(np.asarray(self[row]))
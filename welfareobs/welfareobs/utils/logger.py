@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: logger.py
+Description: Structured, rate limited logging (console and JSON-lines sinks)
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import json
+import logging
+import threading
+import time
+
+
+"""
+Usage in a module:
+
+    log = get_logger(__name__)
+    log.debug("Writing sample %d with %d individuals", sample, count)              # formatted only if enabled
+    log.info("Step %s took %.3fs", label, seconds, extra=every(10.0))             # at most once every 10s
+    log.info("Detections", extra={"fields": {"camera": name, "count": n}})        # structured fields
+
+Messages use %-style arguments so nothing is formatted unless a handler accepts the record. Rate limiting
+is keyed by logger, message template and an optional key; the number of suppressed records is attached to the next record
+that gets through.
+"""
+# standard LogRecord attributes, anything else on a record came from `extra`
+_RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__.keys()) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def every(seconds: float, key: str = "", fields: dict|None = None) -> dict:
+    """
+    `extra` for a rate limited record
+    :param seconds: minimum interval between records with the same logger, message template and key
+    :param key: separates rate limits that share a message template (e.g. one per pipeline step)
+    :param fields: optional structured fields
+    """
+    extra = {"rate_limit": seconds, "rate_key": key}
+    if fields is not None:
+        extra["fields"] = fields
+    return extra
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self.__lock = threading.Lock()
+        self.__last: dict[tuple, float] = {}
+        self.__suppressed: dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        seconds = getattr(record, "rate_limit", None)
+        if seconds is None:
+            return True
+        # the filter is shared by every sink, decide once per record
+        if hasattr(record, "_passed"):
+            return record._passed
+        key = (record.name, str(record.msg), getattr(record, "rate_key", ""))
+        now = time.monotonic()
+        with self.__lock:
+            record._passed = now - self.__last.get(key, -seconds) >= seconds
+            if record._passed:
+                self.__last[key] = now
+                record.suppressed = self.__suppressed.pop(key, 0)
+            else:
+                self.__suppressed[key] = self.__suppressed.get(key, 0) + 1
+        return record._passed
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, message plus any structured fields
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        output = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in ["fields", "rate_limit", "rate_key"] and not key.startswith("_"):
+                output[key] = value
+        output.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            output["exception"] = self.formatException(record.exc_info)
+        return json.dumps(output, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        output = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            output += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if getattr(record, "suppressed", 0) > 0:
+            output += f" (+{record.suppressed} suppressed)"
+        return output
+
+
+def configure(level: str = "INFO", levels: dict|None = None, json_filename: str|None = None, console: bool = True):
+    """
+    Configure the welfareobs loggers (call once from the entry point)
+    :param level: default level for welfareobs.*
+    :param levels: per module levels e.g. {"welfareobs.handlers.aggregator": "DEBUG"}
+    :param json_filename: optional JSON-lines sink
+    :param console: log to stderr
+    :return: None
+    """
+    root = logging.getLogger("welfareobs")
+    root.setLevel(level.upper())
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    rate_limit = RateLimitFilter()
+    if console:
+        handler = logging.StreamHandler()
+        handler.setFormatter(ConsoleFormatter())
+        handler.addFilter(rate_limit)
+        root.addHandler(handler)
+    if json_filename:
+        handler = logging.FileHandler(json_filename)
+        handler.setFormatter(JsonLinesFormatter())
+        handler.addFilter(rate_limit)
+        root.addHandler(handler)
+    for name, name_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(name_level.upper())
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: memory_accountant.py
+Description: RSS sampling per pipeline step, tracemalloc attribution per handler and a memory budget
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import os
+import resource
+import sys
+import tracemalloc
+
+
+PRESSURE_NONE = 0
+PRESSURE_SOFT = 1  # over the soft limit: handlers degrade (see AbstractHandler.set_memory_pressure)
+PRESSURE_HARD = 2  # over the budget: the runner sheds whole iterations until memory comes back down
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size (from /proc on linux, peak RSS elsewhere)
+    """
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryAccountant(object):
+    """
+    RSS is sampled after every pipeline step (cheap, a read of /proc/self/statm). With tracemalloc on, every
+    handler call also records the Python heap growth it left behind and the peak it reached during the call;
+    numpy and PIL buffers are traced too, torch/CUDA allocations are not. tracemalloc slows the pipeline down
+    noticeably, so it is meant for diagnosis runs, not production. Attribution is exact for threadpool-size 0;
+    with threaded steps concurrent jobs share the counters.
+
+    The budget only needs RSS. Pressure is soft above soft_fraction * budget and hard above the budget.
+    """
+    def __init__(self, budget_mb: float = 0.0, soft_fraction: float = 0.9, trace: bool = False):
+        self.__budget: int = int(budget_mb * 1024 * 1024)
+        self.__soft: int = int(self.__budget * soft_fraction)
+        self.__trace: bool = trace
+        self.__steps: dict[str, list[int]] = {}  # step -> [last, max]
+        self.__handlers: dict[tuple[str, str], list[int]] = {}  # (job, phase) -> [calls, net, max net, max peak]
+        self.__start: int = 0
+        self.__rss: int = rss_bytes()
+        self.__peak_rss: int = self.__rss
+        self.__shed: int = 0
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def tracing(self) -> bool:
+        return self.__trace
+
+    @property
+    def rss(self) -> int:
+        """Last sampled RSS (bytes)"""
+        return self.__rss
+
+    @property
+    def shed(self) -> int:
+        """Iterations shed because of memory pressure"""
+        return self.__shed
+
+    def sample(self, step: str) -> int:
+        """
+        Sample RSS after a step
+        :return: RSS bytes
+        """
+        self.__rss = rss_bytes()
+        self.__peak_rss = max(self.__peak_rss, self.__rss)
+        stats = self.__steps.setdefault(step, [0, 0])
+        stats[0] = self.__rss
+        stats[1] = max(stats[1], self.__rss)
+        return self.__rss
+
+    def before(self):
+        """
+        Call before a handler call (no-op unless tracing)
+        """
+        if self.__trace:
+            tracemalloc.reset_peak()
+            self.__start = tracemalloc.get_traced_memory()[0]
+
+    def after(self, job: str, phase: str):
+        """
+        Call after a handler call (no-op unless tracing)
+        """
+        if not self.__trace:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        stats = self.__handlers.setdefault((job, phase), [0, 0, 0, 0])
+        net = current - self.__start
+        stats[0] += 1
+        stats[1] += net
+        stats[2] = max(stats[2], net)
+        stats[3] = max(stats[3], peak - self.__start)
+
+    def pressure(self) -> int:
+        """
+        :return: PRESSURE_NONE, PRESSURE_SOFT or PRESSURE_HARD from the last RSS sample
+        """
+        if self.__budget <= 0 or self.__rss < self.__soft:
+            return PRESSURE_NONE
+        if self.__rss < self.__budget:
+            return PRESSURE_SOFT
+        return PRESSURE_HARD
+
+    def shed_iteration(self):
+        self.__shed += 1
+
+    def report(self, top: int = 10) -> dict:
+        """
+        :param top: number of handler calls to list (largest peak first)
+        :return: dict (JSON serialisable), sizes in MB
+        """
+        mb = 1024 * 1024
+        handlers = sorted(self.__handlers.items(), key=lambda o: o[1][3], reverse=True)
+        return {
+            "budget_mb": round(self.__budget / mb, 1),
+            "peak_rss_mb": round(self.__peak_rss / mb, 1),
+            "shed_iterations": self.__shed,
+            "steps": {step: {"rss_mb": round(last / mb, 1), "max_rss_mb": round(peak / mb, 1)}
+                      for step, (last, peak) in self.__steps.items()},
+            "handlers": [
+                {
+                    "job": job,
+                    "phase": phase,
+                    "calls": calls,
+                    "mean_net_mb": round(net / max(1, calls) / mb, 3),
+                    "max_net_mb": round(max_net / mb, 3),
+                    "max_peak_mb": round(max_peak / mb, 3)
+                }
+                for (job, phase), (calls, net, max_net, max_peak) in handlers[:top]
+            ]
+        }
+
+    def __str__(self):
+        report = self.report()
+        lines = [f"Memory: peak RSS {report['peak_rss_mb']}MB (budget {report['budget_mb']}MB), "
+                 f"{report['shed_iterations']} iterations shed"]
+        for step, stats in report["steps"].items():
+            lines.append(f"  {step:<24}rss={stats['rss_mb']}MB max={stats['max_rss_mb']}MB")
+        for o in report["handlers"]:
+            lines.append(f"  {o['job']:<24}{o['phase']:<12}peak={o['max_peak_mb']}MB net={o['mean_net_mb']}MB/call")
+        return "\n".join(lines)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: metrics.py
+Description: Lightweight metrics registry with an OpenMetrics (Prometheus) HTTP endpoint
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from welfareobs.utils.performance_monitor import PerformanceMonitor
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
+
+
+class MetricsRegistry(object):
+    """
+    Counters and gauges are pushed by the pipeline (a dict update under a lock). Summaries are pulled from
+    PerformanceMonitor objects only when the endpoint is scraped, so they cost nothing in the pipeline loop.
+    """
+    QUANTILES = [0.5, 0.95, 0.99]
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__families: dict[str, dict] = {}
+
+    def __family(self, name: str, kind: str, help_text: str) -> dict:
+        family = self.__families.get(name)
+        if family is None:
+            family = {"type": kind, "help": help_text, "samples": {}}
+            self.__families[name] = family
+        elif family["type"] != kind:
+            raise TypeError(f"Metric {name} is a {family['type']}, not a {kind}")
+        return family
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels):
+        """
+        Increment a counter (name without the _total suffix)
+        """
+        key = tuple(sorted(labels.items()))
+        with self.__lock:
+            samples = self.__family(name, "counter", help_text)["samples"]
+            samples[key] = samples.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, help_text: str = "", **labels):
+        """
+        Set a gauge
+        """
+        with self.__lock:
+            self.__family(name, "gauge", help_text)["samples"][tuple(sorted(labels.items()))] = value
+
+    def monitor(self, name: str, monitor: PerformanceMonitor, help_text: str = "", scale: float = 1.0, **labels):
+        """
+        Expose a PerformanceMonitor as a summary (quantiles, _sum and _count)
+        :param scale: multiplier to convert the monitor units to seconds (e.g. 1e-3 for milliseconds)
+        """
+        with self.__lock:
+            self.__family(name, "summary", help_text)["samples"][tuple(sorted(labels.items()))] = (monitor, scale)
+
+    @staticmethod
+    def __labels(labels: tuple, extra: tuple = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if len(pairs) == 0:
+            return ""
+        escape = lambda v: str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        return "{" + ",".join(f"{k}=\"{escape(v)}\"" for k, v in pairs) + "}"
+
+    def render(self) -> str:
+        """
+        :return: OpenMetrics text exposition
+        """
+        with self.__lock:
+            families = [(name, family["type"], family["help"], list(family["samples"].items()))
+                        for name, family in self.__families.items()]
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# TYPE {name} {kind}")
+            if help_text != "":
+                lines.append(f"# HELP {name} {help_text}")
+            for labels, value in samples:
+                if kind == "counter":
+                    lines.append(f"{name}_total{MetricsRegistry.__labels(labels)} {value}")
+                elif kind == "gauge":
+                    lines.append(f"{name}{MetricsRegistry.__labels(labels)} {value}")
+                else:
+                    monitor, scale = value
+                    for q in MetricsRegistry.QUANTILES:
+                        lines.append(f"{name}{MetricsRegistry.__labels(labels, (('quantile', q),))} {monitor.percentile(q * 100) * scale}")
+                    lines.append(f"{name}_sum{MetricsRegistry.__labels(labels)} {monitor.overall_execution_time * scale}")
+                    lines.append(f"{name}_count{MetricsRegistry.__labels(labels)} {monitor.number_of_executions}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+# default registry that handlers report into
+REGISTRY: MetricsRegistry = MetricsRegistry()
+
+
+class MetricsServer(object):
+    """
+    Serves registry.render() at /metrics from a daemon thread
+    """
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, port: int = 8008, host: str = "0.0.0.0"):
+        self.__registry = registry
+        self.__host = host
+        self.__port = port
+        self.__server: ThreadingHTTPServer|None = None
+        self.__thread: threading.Thread|None = None
+
+    @property
+    def port(self) -> int:
+        """Bound port (useful when constructed with port 0)"""
+        if self.__server is not None:
+            return self.__server.server_address[1]
+        return self.__port
+
+    def start(self):
+        registry = self.__registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ["/", "/metrics"]:
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", MetricsServer.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep scrapes out of the pipeline log
+
+        self.__server = ThreadingHTTPServer((self.__host, self.__port), Handler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="metrics", daemon=True)
+        self.__thread.start()
+        log.info("Serving metrics on http://%s:%d/metrics", self.__host, self.port)
+
+    def stop(self):
+        if self.__server is None:
+            return
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+        self.__server = None
+        self.__thread = None
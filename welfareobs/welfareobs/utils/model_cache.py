@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: model_cache.py
+Description: Local cache of fully assembled model weights (safetensors), so startup needs no hub access
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+
+class ModelCache(object):
+    """
+    Layout:
+        <root>/<key>/model.safetensors  every weight of the assembled model (Detectron2 and the fine-tuned
+                                        ReID backbone), written once after the first full build
+        <root>/<key>/meta.json          sha256 and size of the artefact plus whatever the caller needs to
+                                        rebuild the modules without the hub (e.g. the timm architecture)
+
+    The key is the caller's hash of the configuration and the contents of the source weight files
+    (DetectionCache.weights_hash), so retraining or changing the config assembles a fresh artefact, while
+    touching or copying the weights does not. Artefacts are written to a temporary directory and renamed
+    into place, so a crash never leaves a half written entry. Loading goes through safetensors, which maps
+    the file rather than unpickling it.
+
+    Each artefact records a slot (the caller's name for what it was built from, e.g. the model paths).
+    When a new artefact is stored, the older artefacts of the same slot are deleted, so retraining does
+    not leave multi-GB entries behind.
+    """
+    ARTEFACT = "model.safetensors"
+
+    def __init__(self, root: str):
+        self.__root = root
+        os.makedirs(root, exist_ok=True)
+
+    def directory(self, key: str) -> str:
+        return os.path.join(self.__root, key)
+
+    def get(self, key: str) -> dict|None:
+        """
+        :param key: model hash
+        :return: meta dict (with "filename" set to the artefact) or None if there is no complete artefact
+        """
+        directory = self.directory(key)
+        try:
+            with open(os.path.join(directory, "meta.json"), "r") as file:
+                meta = json.load(file)
+            filename = os.path.join(directory, ModelCache.ARTEFACT)
+            if os.path.getsize(filename) != meta["size"]:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        meta["filename"] = filename
+        return meta
+
+    def put(self, key: str, write: callable, meta: dict|None = None) -> dict:
+        """
+        Write an artefact
+        :param key: model hash
+        :param write: called with the artefact filename to write
+        :param meta: extra JSON serialisable values stored with the artefact
+        :return: meta dict as get() returns it
+        """
+        temp = tempfile.mkdtemp(prefix=f".{key}-", dir=self.__root)
+        try:
+            filename = os.path.join(temp, ModelCache.ARTEFACT)
+            write(filename)
+            output = {
+                **(meta or {}),
+                "key": key,
+                "size": os.path.getsize(filename),
+                "sha256": ModelCache.sha256(filename),
+                "created": datetime.now().isoformat(" ", "seconds")
+            }
+            with open(os.path.join(temp, "meta.json"), "w") as file:
+                json.dump(output, file, indent=2)
+            if os.path.isdir(self.directory(key)) and self.get(key) is None:
+                shutil.rmtree(self.directory(key), ignore_errors=True)  # truncated by a copy, replace it
+            try:
+                os.rename(temp, self.directory(key))
+            except OSError:
+                # another process assembled the same artefact first, keep theirs
+                pass
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+        if output.get("slot") is not None:
+            self.prune(output["slot"], key)
+        return self.get(key)
+
+    def prune(self, slot: str, keep: str) -> list[str]:
+        """
+        Delete the artefacts of a slot other than keep
+        :return: keys deleted
+        """
+        deleted = []
+        for key in os.listdir(self.__root):
+            if key == keep or key.startswith("."):
+                continue
+            try:
+                with open(os.path.join(self.directory(key), "meta.json"), "r") as file:
+                    if json.load(file).get("slot") != slot:
+                        continue
+            except (OSError, ValueError):
+                continue
+            shutil.rmtree(self.directory(key), ignore_errors=True)
+            deleted.append(key)
+        return deleted
+
+    def hash_file(self, filename: str) -> str:
+        """
+        sha256 of a source weight file, remembered (by path, size and mtime) in <root>/hashes.json
+        """
+        return file_sha256(filename, os.path.join(self.__root, "hashes.json"))
+
+    def verify(self, key: str) -> bool:
+        """
+        Re-hash an artefact (reads the whole file, use after copying a cache between machines)
+        """
+        meta = self.get(key)
+        return meta is not None and ModelCache.sha256(meta["filename"]) == meta["sha256"]
+
+    @staticmethod
+    def sha256(filename: str) -> str:
+        digest = hashlib.sha256()
+        with open(filename, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+def file_sha256(filename: str, memo: str|None = None) -> str:
+    """
+    Content hash of a file. With memo (a JSON file), the hash is remembered by path, size and mtime, so
+    an unchanged multi-GB checkpoint is only read once; a touched or copied file is hashed again and gives
+    the same digest.
+    """
+    stat = os.stat(filename)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    hashes: dict = {}
+    if memo is not None and os.path.exists(memo):
+        try:
+            with open(memo, "r") as file:
+                hashes = json.load(file)
+        except ValueError:
+            hashes = {}
+        entry = hashes.get(os.path.abspath(filename))
+        if entry is not None and entry[:2] == stamp:
+            return entry[2]
+    digest = ModelCache.sha256(filename)
+    if memo is not None:
+        hashes[os.path.abspath(filename)] = stamp + [digest]
+        # unique temporary name, handlers set up on parallel threads may write at once
+        temp = f"{memo}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(memo)), exist_ok=True)
+            with open(temp, "w") as file:
+                json.dump(hashes, file, indent=2)
+            os.replace(temp, memo)
+        except OSError:
+            pass  # read only (a replayed recording), the hash is just not remembered
+    return digest
+
+
+def save_model(cache: ModelCache, key: str, model, meta: dict|None = None) -> dict:
+    """
+    Store every weight of a torch model
+    """
+    from safetensors.torch import save_model as save
+    return cache.put(key, lambda filename: save(model, filename), meta)
+
+
+def load_model(model, meta: dict, device: str = "cpu"):
+    """
+    Load an artefact into a model built without weights (strict, every tensor must match)
+    """
+    from safetensors.torch import load_model as load
+    load(model, meta["filename"], strict=True, device=device)
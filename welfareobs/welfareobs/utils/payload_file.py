@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: payload_file.py
+Description: Append-only binary payload file for Frame/Individual/Intersect with memory-mapped random access
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import dataclasses
+import json
+import mmap
+import os
+import pickle
+import struct
+from datetime import datetime
+import numpy as np
+from welfareobs.models.frame import Frame
+from welfareobs.models.individual import Individual
+from welfareobs.models.intersect import Intersect
+
+
+"""
+File layout:
+
+<filename>      records appended back to back, one per iteration
+<filename>.idx  one (offset, length) pair of little-endian int64 per record
+
+record:
+    8 bytes     header length (little-endian uint64)
+    header      UTF-8 JSON describing the object tree, numpy buffers are referenced by offset
+    buffers     raw numpy array data, starting at the first 64 byte boundary after the header, each one
+                aligned to 64 bytes (records are padded to 64 bytes so alignment holds across the file)
+
+Numpy arrays (masks, intersects, images) are read back as read-only views on the memory map, so nothing
+is copied or decoded until it is used. Anything that isn't a known type is pickled into a buffer.
+"""
+ALIGNMENT = 64
+INDEX_ENTRY = struct.Struct("<qq")
+HEADER_LENGTH = struct.Struct("<Q")
+DATACLASSES = {o.__name__: o for o in [Frame, Individual, Intersect]}
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def rebuild_index(filename: str) -> int:
+    """
+    Bring <filename>.idx up to date with the payload file: records after the last indexed one (the index
+    was deleted, or the process died between the two writes) are indexed from their headers, and a torn
+    record at the end of the file (or a torn index entry) is cut off. Index entries that end past the end
+    of the payload file (the data was lost, the index was not) are dropped.
+    :return: number of records added to the index
+    """
+    index_filename = f"{filename}.idx"
+    size = os.path.getsize(filename)
+    entries = []
+    if os.path.exists(index_filename):
+        with open(index_filename, "rb") as index:
+            content = index.read()
+        entries = list(INDEX_ENTRY.iter_unpack(content[:len(content) // INDEX_ENTRY.size * INDEX_ENTRY.size]))
+    # records are appended in order, so everything from the first entry past the end of the data goes
+    valid = next((i for i, (base, length) in enumerate(entries) if base + length > size), len(entries))
+    with open(index_filename, "ab") as index:
+        index.truncate(valid * INDEX_ENTRY.size)
+    position = sum(entries[valid - 1]) if valid > 0 else 0
+    added = []
+    with open(filename, "rb") as data:
+        while position + HEADER_LENGTH.size <= size:
+            data.seek(position)
+            header_length = HEADER_LENGTH.unpack(data.read(HEADER_LENGTH.size))[0]
+            if position + HEADER_LENGTH.size + header_length > size:
+                break
+            try:
+                buffers = json.loads(data.read(header_length))["buffers"]
+            except (ValueError, KeyError):
+                break
+            length = _align(HEADER_LENGTH.size + header_length) + (_align(sum(buffers[-1])) if buffers else 0)
+            if position + length > size:
+                break
+            added.append(INDEX_ENTRY.pack(position, length))
+            position += length
+    with open(index_filename, "ab") as index:
+        index.write(b"".join(added))
+    if position < size:
+        with open(filename, "ab") as data:
+            data.truncate(position)
+    return len(added)
+
+
+class PayloadWriter(object):
+    def __init__(self, filename: str, append: bool = False):
+        """
+        :param filename: payload filename (the index is written next to it)
+        :param append: keep existing records (otherwise the file is truncated), the index is rebuilt first
+            if it does not cover the file
+        """
+        self.__filename = filename
+        if append and os.path.exists(filename):
+            rebuild_index(filename)
+        self.__data = open(filename, "ab" if append else "wb")
+        self.__index = open(f"{filename}.idx", "ab" if append else "wb")
+
+    def __len__(self):
+        return self.__index.tell() // INDEX_ENTRY.size
+
+    def __encode(self, src: any, buffers: list) -> dict:
+        if src is None or isinstance(src, (bool, int, float, str)):
+            return {"v": src}
+        if isinstance(src, np.generic):
+            return {"v": src.item()}
+        if isinstance(src, datetime):
+            return {"t": "datetime", "v": src.isoformat()}
+        if isinstance(src, (list, tuple)):
+            return {"t": type(src).__name__, "v": [self.__encode(o, buffers) for o in src]}
+        if isinstance(src, np.ndarray) and src.dtype != object:
+            buffers.append(np.ascontiguousarray(src))
+            return {"t": "ndarray", "i": len(buffers) - 1, "dtype": src.dtype.str, "shape": list(src.shape)}
+        if dataclasses.is_dataclass(src) and type(src).__name__ in DATACLASSES:
+            return {
+                "t": type(src).__name__,
+                "v": {f.name: self.__encode(getattr(src, f.name), buffers) for f in dataclasses.fields(src)}
+            }
+        if type(src).__module__.startswith("PIL."):
+            return {"t": "image", "mode": src.mode, "v": self.__encode(np.asarray(src), buffers)}
+        buffers.append(np.frombuffer(pickle.dumps(src), dtype=np.uint8))
+        return {"t": "pickle", "i": len(buffers) - 1}
+
+    def write(self, src: any) -> int:
+        """
+        Append a record
+        :param src: object tree to save
+        :return: record number
+        """
+        buffers = []
+        tree = self.__encode(src, buffers)
+        positions = []
+        offset = 0
+        for buffer in buffers:
+            positions.append([offset, buffer.nbytes])
+            offset = _align(offset + buffer.nbytes)
+        header = json.dumps({"tree": tree, "buffers": positions}).encode("utf-8")
+        start = self.__data.tell()
+        self.__data.write(HEADER_LENGTH.pack(len(header)))
+        self.__data.write(header)
+        data_start = _align(HEADER_LENGTH.size + len(header))
+        for (position, _), buffer in zip(positions, buffers):
+            self.__data.write(b"\0" * (data_start + position - (self.__data.tell() - start)))
+            self.__data.write(buffer.data)
+        length = data_start + offset
+        self.__data.write(b"\0" * (length - (self.__data.tell() - start)))
+        self.__data.flush()
+        self.__index.write(INDEX_ENTRY.pack(start, length))
+        self.__index.flush()
+        return len(self) - 1
+
+    def close(self):
+        self.__data.close()
+        self.__index.close()
+
+
+class PayloadReader(object):
+    def __init__(self, filename: str):
+        """
+        :param filename: payload filename written by PayloadWriter
+        """
+        self.__filename = filename
+        self.__index_filename = f"{filename}.idx"
+        self.__map: mmap.mmap|None = None
+        self.__mapped_size = 0
+
+    def __len__(self):
+        if not os.path.exists(self.__index_filename):
+            return 0
+        return os.path.getsize(self.__index_filename) // INDEX_ENTRY.size
+
+    def __remap(self, required: int):
+        # the writer may still be appending, so grow the map as required. Old maps are not closed because
+        # arrays handed out earlier are views on them.
+        if required <= self.__mapped_size:
+            return
+        with open(self.__filename, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__mapped_size = len(self.__map)
+
+    def __decode(self, src: dict, base: int, positions: list) -> any:
+        kind = src.get("t")
+        if kind is None:
+            return src["v"]
+        if kind == "datetime":
+            return datetime.fromisoformat(src["v"])
+        if kind == "list":
+            return [self.__decode(o, base, positions) for o in src["v"]]
+        if kind == "tuple":
+            return tuple(self.__decode(o, base, positions) for o in src["v"])
+        if kind == "ndarray":
+            offset, length = positions[src["i"]]
+            dtype = np.dtype(src["dtype"])
+            return np.frombuffer(self.__map, dtype=dtype, count=length // dtype.itemsize, offset=base + offset).reshape(src["shape"])
+        if kind == "image":
+            from PIL import Image
+            image = Image.fromarray(self.__decode(src["v"], base, positions))
+            return image if image.mode == src["mode"] else image.convert(src["mode"])
+        if kind == "pickle":
+            offset, length = positions[src["i"]]
+            return pickle.loads(self.__map[base + offset:base + offset + length])
+        return DATACLASSES[kind](**{k: self.__decode(v, base, positions) for k, v in src["v"].items()})
+
+    def __getitem__(self, item: int) -> any:
+        """
+        Random access to record N (negative indices count from the end)
+        """
+        count = len(self)
+        if item < 0:
+            item += count
+        if item < 0 or item >= count:
+            raise IndexError(f"Record {item} out of range ({count} records in {self.__filename})")
+        with open(self.__index_filename, "rb") as file:
+            file.seek(item * INDEX_ENTRY.size)
+            base, length = INDEX_ENTRY.unpack(file.read(INDEX_ENTRY.size))
+        self.__remap(base + length)
+        header_length = HEADER_LENGTH.unpack_from(self.__map, base)[0]
+        header = json.loads(self.__map[base + HEADER_LENGTH.size:base + HEADER_LENGTH.size + header_length])
+        return self.__decode(header["tree"], base + _align(HEADER_LENGTH.size + header_length), header["buffers"])
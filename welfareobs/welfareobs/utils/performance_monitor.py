@@ -23,28 +23,63 @@ from collections import deque
 import time
 import statistics
 import csv
+import os
+import threading
+from welfareobs.utils.streaming_stats import RunningStats, RunningMedian, LogHistogram, stable_copy
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
 
 
 class PerformanceMonitor(object):
+    """
+    Tracks execution times.
+
+    By default the statistics are streaming: mean and standard deviation use Welford's method and
+    percentiles come from a log-bucketed histogram (1% precision), so updates and reads are O(1) in the
+    number of runs. They cover every run since creation, not a window. No raw times are kept unless
+    keep_history is set (iteration, cumulative, save and snapshot need them), in which case the last
+    `history_size` are kept.
+
+    With exact=True the statistics are computed exactly over the last `history_size` runs instead (the
+    original behaviour, O(history_size) per read), and the raw times are always kept.
+    """
     def __init__(self,
                  label: str = "",
-                 history_size: int = 1
+                 history_size: int = 1,
+                 exact: bool = False,
+                 keep_history: bool = False
                  ):
         self.__label = label
-        self.__history_size = history_size
-        self.__history = deque(maxlen=history_size)
+        self.__history_size = history_size if exact or keep_history else 0
+        self.__history = deque(maxlen=self.__history_size)
+        self.__exact: bool = exact
+        self.__running: RunningStats = RunningStats()
+        self.__histogram: LogHistogram = LogHistogram()
+        self.__last_execution_time: float = 0.0
         self.__overall_execution_time: float = 0.0
         self.__number_of_execution_runs = 0
         self.__this_start_time: float = 0.0
+        self.__snapshot_thread: threading.Thread|None = None
 
     def track_start(self):
-        self.__this_start_time = time.time()
+        self.__this_start_time = time.perf_counter()
 
     def track_end(self):
-        end_time = time.time()
-        self.__history.append(end_time - self.__this_start_time)
+        self.add(time.perf_counter() - self.__this_start_time)
+
+    def add(self, execution_time: float):
+        """
+        Record an execution time (seconds) measured elsewhere
+        """
+        self.__last_execution_time = execution_time
+        self.__history.append(execution_time)
         self.__number_of_execution_runs += 1
-        self.__overall_execution_time += self.__history[-1]
+        self.__overall_execution_time += execution_time
+        if not self.__exact:
+            self.__running.add(execution_time)
+            self.__histogram.add(execution_time)
 
     def __len__(self):
         return len(self.__history)
@@ -55,23 +90,59 @@ class PerformanceMonitor(object):
     def __iter__(self):
         return iter(self.__history)
 
+    @property
+    def exact(self) -> bool:
+        return self.__exact
+
+    @property
+    def last(self) -> float:
+        return self.__last_execution_time
+
     @property
     def average(self):
-        if len(self.__history) < 1:
+        if not self.__exact:
+            return round(self.__running.mean, 3)
+        history = stable_copy(self.__history)
+        if len(history) < 1:
             return 0
-        return round(sum(self.__history) / len(self.__history),3)
+        return round(sum(history) / len(history),3)
 
     @property
     def median(self):
-        if len(self.__history) < 1:
-            return 0
-        return round(statistics.median(self.__history),3)
+        return self.percentile(50)
 
     @property
     def stdev(self):
-        if len(self.__history) < 2:
+        if not self.__exact:
+            return round(self.__running.stdev, 3)
+        history = stable_copy(self.__history)
+        if len(history) < 2:
+            return 0
+        return round(statistics.stdev(history),3)
+
+    def percentile(self, p: float) -> float:
+        """
+        :param p: percentile 0 -> 100
+        :return: execution time at that percentile (nearest rank in exact mode, +/-0.5% in streaming mode)
+        """
+        if not self.__exact:
+            return round(self.__histogram.quantile(p / 100.0), 3)
+        # read on the metrics thread while the loop appends, so work on a copy
+        history = stable_copy(self.__history)
+        if len(history) < 1:
             return 0
-        return round(statistics.stdev(self.__history),3)
+        if p == 50:
+            return round(statistics.median(history), 3)
+        ordered = sorted(history)
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))], 3)
+
+    @property
+    def p95(self) -> float:
+        return self.percentile(95)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
 
     @property
     def overall_execution_time(self) -> float:
@@ -86,20 +157,97 @@ class PerformanceMonitor(object):
         return self.__label
 
     def __str__(self):
-        return f"{self.__label}: run={self.__number_of_execution_runs} time={self.__history[-1]} avg={self.average} sd={self.stdev}"
+        return f"{self.__label}: run={self.__number_of_execution_runs} time={self.__last_execution_time} avg={self.average} sd={self.stdev}"
+
+    COLUMNS = ['run', 'time', 'sum', 'avg', 'med', 'sd']
+
+    def cumulative(self):
+        """
+        Cumulative statistics over the history, one row per run: (run, time, sum, avg, med, sd).
+        Running sums, Welford variance and a two-heap median make this O(n log n) overall.
+        """
+        return _cumulative(stable_copy(self.__history), self.__start_run())
+
+    def __start_run(self) -> int:
+        return (self.__number_of_execution_runs - self.__history_size) if self.__history_size < self.__number_of_execution_runs else 0
 
     def save(self, filename, append=True):
-        start_run: int = (self.__number_of_execution_runs - self.__history_size) if self.__history_size < self.__number_of_execution_runs else 0
-        end_run: int = self.__number_of_execution_runs
-        with open(filename, 'a' if append else 'w') as csvfile:
+        """
+        Save the cumulative statistics (see cumulative)
+        :param filename: .csv (appended to unless append is False), .npz or .parquet (always overwritten)
+        :param append: append to an existing CSV
+        :return: None
+        """
+        _save(filename, self.cumulative(), append)
+
+    def snapshot(self, filename, background: bool = True) -> bool:
+        """
+        Overwrite filename with the current statistics (written to a temporary file then renamed, so a
+        reader never sees a partial file). The history is copied here and the statistics are written by a
+        background thread, so the pipeline loop only pays for the copy. A snapshot requested while the
+        previous one is still being written is skipped.
+        :param filename: as save
+        :param background: False to write on the calling thread
+        :return: False if skipped
+        """
+        if self.__snapshot_thread is not None and self.__snapshot_thread.is_alive():
+            return False
+        rows = _cumulative(stable_copy(self.__history), self.__start_run())
+        if not background:
+            _replace(filename, rows)
+            return True
+        self.__snapshot_thread = threading.Thread(target=_replace, args=(filename, rows),
+                                                  name="performance-snapshot", daemon=True)
+        self.__snapshot_thread.start()
+        return True
+
+    def wait(self, timeout: float|None = None):
+        """
+        Wait for a background snapshot to finish writing
+        """
+        if self.__snapshot_thread is not None:
+            self.__snapshot_thread.join(timeout)
+
+
+def _cumulative(history, start_run: int):
+    running = RunningStats()
+    median = RunningMedian()
+    for index, item in enumerate(history):
+        running.add(item)
+        median.add(item)
+        yield index + start_run, item, running.total, running.mean, median.median, running.stdev
+
+
+def _save(filename, rows, append=True):
+    suffix = os.path.splitext(filename)[1].lower()
+    if suffix == ".npz":
+        import numpy as np
+        columns = np.array(list(rows), dtype=np.float64).reshape(-1, len(PerformanceMonitor.COLUMNS))
+        np.savez(filename, **{name: columns[:, i] for i, name in enumerate(PerformanceMonitor.COLUMNS)})
+    elif suffix == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columns = list(zip(*rows)) or [[]] * len(PerformanceMonitor.COLUMNS)
+        pq.write_table(
+            pa.table({
+                name: pa.array(column, type=pa.int64() if name == 'run' else pa.float64())
+                for name, column in zip(PerformanceMonitor.COLUMNS, columns)
+            }),
+            filename
+        )
+    else:
+        with open(filename, 'a' if append else 'w', newline='') as csvfile:
             writer = csv.writer(csvfile)
             if not csvfile.tell():  # Check if file is empty
-                writer.writerow(['run', 'time', 'sum', 'avg', 'med', 'sd'])
-            state = []
-            for index, item in enumerate(self.__history):
-                state.append(item)
-                sdev = 0
-                if len(state) > 1:
-                    sdev = statistics.stdev(state)
-                writer.writerow([index + start_run, item, sum(state), sum(state) / len(state), statistics.median(state), sdev])
-    
\ No newline at end of file
+                writer.writerow(PerformanceMonitor.COLUMNS)
+            writer.writerows(rows)
+
+
+def _replace(filename, rows):
+    root, suffix = os.path.splitext(filename)
+    temporary = f"{root}.tmp{suffix}"
+    try:
+        _save(temporary, rows, append=False)
+        os.replace(temporary, filename)
+    except Exception as e:
+        log.error("Performance snapshot %s failed: %s", filename, e)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: position_store.py
+Description: Embedded (SQLite) time-series store for animal positions with range queries
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import math
+import sqlite3
+from datetime import datetime
+
+
+class PositionStore(object):
+    """
+    Positions are stored one row per identity per sample, indexed by (identity, timestamp) so that
+    "where was Kito between 10:00 and 11:00" is an index range scan rather than a full file scan.
+    Timestamps are stored as POSIX seconds (REAL). The database runs in WAL mode so dashboards can
+    read while the pipeline is writing.
+    """
+    def __init__(self, filename: str):
+        self.__filename = filename
+        self.__db = sqlite3.connect(filename, check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        # floor rather than CAST (which truncates toward zero) so negative XZ cells don't merge with cell 0
+        self.__db.create_function("cell", 2, lambda v, size: math.floor(v / size), deterministic=True)
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS positions ("
+                "sample INTEGER, identity INTEGER, timestamp REAL, x REAL, z REAL, uncertainty REAL, confidence REAL)"
+            )
+            self.__db.execute("CREATE INDEX IF NOT EXISTS positions_identity_time ON positions (identity, timestamp)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS positions_time ON positions (timestamp)")
+            self.__db.execute("CREATE TABLE IF NOT EXISTS individuals (identity INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    def close(self):
+        self.__db.close()
+
+    @staticmethod
+    def to_seconds(src: datetime|float|int|None) -> float|None:
+        if src is None:
+            return None
+        if isinstance(src, datetime):
+            return src.timestamp()
+        return float(src)
+
+    def set_names(self, names: list[str]):
+        """
+        Map identities to names (identities are 1-based, in the same order as the aggregator `individuals`)
+        :param names: list of names
+        :return: None
+        """
+        with self.__db:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO individuals (identity, name) VALUES (?, ?)",
+                [(index + 1, name) for index, name in enumerate(names)]
+            )
+
+    def identity(self, src: int|str) -> int:
+        """
+        Resolve a name (or identity) to an identity
+        :param src: name or identity
+        :return: identity, raises KeyError if the name is unknown
+        """
+        if isinstance(src, str) and not src.isdigit():
+            row = self.__db.execute("SELECT identity FROM individuals WHERE name = ?", (src,)).fetchone()
+            if row is None:
+                raise KeyError(f"Individual '{src}' not found in {self.__filename}")
+            return row[0]
+        return int(src)
+
+    def insert(self, rows: list[tuple]):
+        """
+        Bulk insert (one transaction)
+        :param rows: list of (sample, identity, timestamp, x, z, uncertainty, confidence)
+        :return: None
+        """
+        if len(rows) == 0:
+            return
+        with self.__db:
+            self.__db.executemany(
+                "INSERT INTO positions (sample, identity, timestamp, x, z, uncertainty, confidence) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(r[0], int(r[1]), PositionStore.to_seconds(r[2]), *r[3:]) for r in rows]
+            )
+
+    def __where(self, identity, start, end, clauses: list[str]|None = None) -> (str, list):
+        clauses = [] if clauses is None else clauses
+        args = []
+        if identity is not None:
+            clauses.append("identity = ?")
+            args.append(self.identity(identity))
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            args.append(PositionStore.to_seconds(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            args.append(PositionStore.to_seconds(end))
+        return (" WHERE " + " AND ".join(clauses)) if len(clauses) > 0 else "", args
+
+    def query(self, identity: int|str|None = None, start=None, end=None) -> list[tuple]:
+        """
+        Positions in a time range
+        :param identity: name or identity (None for all)
+        :param start: inclusive start (datetime or POSIX seconds, None for unbounded)
+        :param end: exclusive end (datetime or POSIX seconds, None for unbounded)
+        :return: list of (identity, timestamp, x, z, uncertainty, confidence) ordered by identity and time
+        """
+        where, args = self.__where(identity, start, end)
+        return self.__db.execute(
+            f"SELECT identity, timestamp, x, z, uncertainty, confidence FROM positions{where} ORDER BY identity, timestamp",
+            args
+        ).fetchall()
+
+    def downsample(self, bucket_seconds: float, identity: int|str|None = None, start=None, end=None) -> list[tuple]:
+        """
+        Mean position per time bucket
+        :param bucket_seconds: bucket width in seconds
+        :return: list of (identity, bucket start, mean x, mean z, samples)
+        """
+        where, args = self.__where(identity, start, end)
+        return self.__db.execute(
+            f"SELECT identity, CAST(timestamp / ? AS INTEGER) * ? AS bucket, AVG(x), AVG(z), COUNT(*) "
+            f"FROM positions{where} GROUP BY identity, bucket ORDER BY identity, bucket",
+            [bucket_seconds, bucket_seconds, *args]
+        ).fetchall()
+
+    def dwell_time(self, cell_size: float, identity: int|str|None = None, start=None, end=None,
+                   max_gap_seconds: float = 60.0) -> list[tuple]:
+        """
+        Dwell time per grid cell. Each position is credited with the time until that individual's next
+        position (capped at max_gap_seconds so that gaps in detection are not counted as dwelling).
+        :param cell_size: grid cell size in XZ units
+        :param max_gap_seconds: largest interval credited to a single position
+        :return: list of (identity, cell x, cell z, seconds) ordered by identity then longest dwell
+        """
+        where, args = self.__where(identity, start, end, ["x IS NOT NULL", "z IS NOT NULL"])
+        return self.__db.execute(
+            f"SELECT identity, cx, cz, SUM(MIN(IFNULL(dt, 0), ?)) AS seconds FROM ("
+            f"  SELECT identity, cell(x, ?) AS cx, cell(z, ?) AS cz,"
+            f"  LEAD(timestamp) OVER (PARTITION BY identity ORDER BY timestamp) - timestamp AS dt"
+            f"  FROM positions{where}"
+            f") GROUP BY identity, cx, cz ORDER BY identity, seconds DESC",
+            [max_gap_seconds, cell_size, cell_size, *args]
+        ).fetchall()
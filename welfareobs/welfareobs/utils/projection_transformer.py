@@ -24,16 +24,21 @@ from typing import Optional
 import numpy as np
 import cv2
 from sympy import Point2D
-from scipy.ndimage import zoom
+from scipy.ndimage import zoom, uniform_filter
 from welfareobs.utils.image_wrapper import ImageWrapper
 from welfareobs.utils.matplotlib_image_wrapper import MatPlotLibImageWrapper
 from welfareobs.utils.projection_overlay import ProjectionOverlay
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
 
 
 class ProjectionTransformer(object):
 
     def __init__(self):
         self.warped_grid_image: Optional[np.ndarray] = None
+        self.__weight_map: Optional[np.ndarray] = None
 
     def load(self, filename, target_w=None, target_h=None):
         """
@@ -53,7 +58,8 @@ class ProjectionTransformer(object):
                 ), 
                 order=1
             )
-        print(f"Loaded {filename}: dims=({self.warped_grid_image.shape})")
+        self.__build_weight_map()
+        log.info("Loaded %s: dims=%s", filename, self.warped_grid_image.shape)
 
     def save(self, filename):
         """
@@ -181,4 +187,38 @@ class ProjectionTransformer(object):
         ], dtype=np.float64)
         h_matrix = self.__get_h_matrix(h_corners, dest_corners)
         self.warped_grid_image = cv2.warpPerspective(homographic_overlay.generate_overlay_image(), h_matrix, (camera_image_width, camera_image_height))
+        self.__build_weight_map()
+
+    def __build_weight_map(self, window: int = 5):
+        """
+        Build the per-pixel LUT weight (sensitivity) map.
+        The footprint of a pixel is the XZ area it covers (determinant of the LUT jacobian), which grows with
+        distance from the camera. Weight is 1 / (1 + footprint), so near pixels tend to 1 and far pixels to 0.
+        The LUT is quantised to whole XZ units, so the gradients are smoothed over a small window first.
+        Pixels outside the calibrated area (both LUT channels 0, the warp's border fill) have weight 0, and so
+        do the pixels whose smoothed gradient reaches into that area (the step at the edge is not a footprint).
+        :param window: smoothing window size in pixels
+        :return: None
+        """
+        x = self.warped_grid_image[:, :, 1].astype(np.float32)
+        z = self.warped_grid_image[:, :, 0].astype(np.float32)
+        valid = (self.warped_grid_image[:, :, 0] > 0) | (self.warped_grid_image[:, :, 1] > 0)
+        # np.gradient reaches one pixel either side, the smoothing window // 2 more
+        valid = uniform_filter(valid.astype(np.float32), size=window + 2, mode="nearest") > 1.0 - 1e-3
+        dx_dr, dx_dc = np.gradient(x)
+        dz_dr, dz_dc = np.gradient(z)
+        footprint = np.abs(
+            uniform_filter(dx_dc, size=window) * uniform_filter(dz_dr, size=window) -
+            uniform_filter(dx_dr, size=window) * uniform_filter(dz_dc, size=window)
+        )
+        self.__weight_map = np.where(valid, 1.0 / (1.0 + footprint), 0.0).astype(np.float32)
+
+    def get_weight_array(self, src) -> np.ndarray:
+        """
+        LUT weight for each (x, y) pixel pair
+        :param src: array of (x, y) pixel pairs
+        :return: array of weights (one per pair)
+        """
+        src = np.asarray(src, dtype=np.intp).reshape(-1, 2)
+        return self.__weight_map[src[:, 1], src[:, 0]]
 
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: retrieval.py
+Description: Retrieval accuracy of ReID embeddings (cosine similarity, computed in batches)
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import hashlib
+import numpy as np
+
+
+def normalise(features: np.ndarray) -> np.ndarray:
+    """
+    :return: float32 rows of unit length (cosine similarity is then a dot product)
+    """
+    features = np.asarray(features, dtype=np.float32)
+    return features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+
+
+def leave_one_out_top1(features: np.ndarray, labels, batch_size: int = 1024) -> float:
+    """
+    Top-1 accuracy of matching every embedding against all the others (what ReIdHead does against the
+    gallery). This is a quick score for ranking configs. It is optimistic, because a query can match
+    another crop from the same image.
+    :param features: (n x embedding)
+    :param labels: n identities
+    :param batch_size: queries per similarity block (memory is batch_size x n floats)
+    """
+    gallery = normalise(features)
+    labels = np.asarray(labels)
+    if len(labels) < 2:
+        return 0.0
+    correct = 0
+    for start in range(0, len(gallery), batch_size):
+        similarity = gallery[start:start + batch_size] @ gallery.T
+        rows = np.arange(len(similarity))
+        similarity[rows, rows + start] = -np.inf
+        correct += int(np.sum(labels[similarity.argmax(axis=1)] == labels[start:start + batch_size]))
+    return correct / len(labels)
+
+
+def holdout(keys: list[str], labels, fraction: float) -> np.ndarray:
+    """
+    Deterministic held-out split: a row is held out when the hash of its key (the image path) falls under
+    fraction, so the split is the same on every run and for every config. Each identity keeps at least
+    one row in the database.
+    :return: bool array, True for the held-out (query) rows
+    """
+    labels = np.asarray(labels)
+    scores = np.array([int(hashlib.sha256(o.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF for o in keys])
+    held = scores < fraction
+    for label in np.unique(labels[held]):
+        rows = np.flatnonzero(labels == label)
+        if held[rows].all():
+            held[rows[np.argmax(scores[rows])]] = False
+    return held
+
+
+def evaluate(queries: np.ndarray, query_labels, database: np.ndarray, database_labels,
+             top_k: tuple[int, ...] = (1, 5), batch_size: int = 1024) -> dict:
+    """
+    Match held-out queries against the database (the gallery rows) by cosine similarity, one
+    (batch_size x database) similarity matrix at a time.
+    :return: {"top1": ..., "top5": ..., "mAP": ..., "queries": n, "labels": [...], "confusion": [[...]]}
+        confusion[i][j] counts queries of labels[i] whose nearest database row is labels[j]. mAP is the mean
+        over queries of the average precision of the database ranking (queries whose identity is not in
+        the database score 0).
+    """
+    query_labels = np.asarray(query_labels).astype(str)
+    database_labels = np.asarray(database_labels).astype(str)
+    labels, codes = np.unique(np.concatenate([query_labels, database_labels]), return_inverse=True)
+    query_codes, database_codes = codes[:len(query_labels)], codes[len(query_labels):]
+    database = normalise(database)
+    queries = normalise(queries)
+    hits = {k: 0 for k in top_k}
+    precision_sum = 0.0
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    relevant_total = np.bincount(database_codes, minlength=len(labels))
+    for start in range(0, len(queries), batch_size):
+        truth = query_codes[start:start + batch_size]
+        ranking = np.argsort(-(queries[start:start + batch_size] @ database.T), axis=1, kind="stable")
+        relevant = database_codes[ranking] == truth[:, None]
+        for k in top_k:
+            hits[k] += int(relevant[:, :k].any(axis=1).sum())
+        np.add.at(confusion, (truth, database_codes[ranking[:, 0]]), 1)
+        # average precision: mean of the precision at the rank of every relevant row
+        ranks = np.arange(1, relevant.shape[1] + 1)
+        precision = np.cumsum(relevant, axis=1) / ranks
+        totals = relevant_total[truth]
+        precision_sum += float(np.sum(np.sum(precision * relevant, axis=1)[totals > 0] / totals[totals > 0]))
+    count = max(1, len(queries))
+    output = {f"top{k}": hits[k] / count for k in top_k}
+    output["mAP"] = precision_sum / count
+    output["queries"] = len(queries)
+    output["labels"] = labels.tolist()
+    output["confusion"] = confusion.tolist()
+    return output
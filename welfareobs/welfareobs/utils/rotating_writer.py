@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: rotating_writer.py
+Description: Buffered, rotating CSV/Parquet writer for pipeline output
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import csv
+import os
+import time
+from datetime import datetime
+
+
+class RotatingWriter(object):
+    """
+    Keeps the output file open and buffers rows in memory. The buffer is written out when it reaches
+    flush_rows rows or flush_seconds has elapsed since the last flush (whichever comes first).
+
+    Files are rotated on the row timestamp (not wall-clock), so replayed data lands in the partition
+    it belongs to:
+        rotate="none" -> output.csv
+        rotate="hour" -> output-2025031010.csv
+        rotate="day"  -> output-20250310.csv
+
+    Parquet output needs pyarrow and a schema (pyarrow.Schema, column order must match the rows). Each
+    flush is written as one row group; a file is only complete once it has been rotated or closed.
+    """
+    ROTATIONS = {"none": None, "hour": "%Y%m%d%H", "day": "%Y%m%d"}
+    FORMATS = ["csv", "parquet"]
+
+    def __init__(self,
+                 filename: str,
+                 columns: list[str],
+                 fmt: str = "csv",
+                 rotate: str = "none",
+                 flush_rows: int = 1000,
+                 flush_seconds: float = 10.0,
+                 schema: any = None
+                 ):
+        if fmt not in RotatingWriter.FORMATS:
+            raise SyntaxError(f"Unsupported output format `{fmt}`")
+        if rotate not in RotatingWriter.ROTATIONS:
+            raise SyntaxError(f"Unsupported rotation `{rotate}`")
+        if fmt == "parquet" and schema is None:
+            raise SyntaxError("Parquet output requires a schema")
+        self.__root, self.__suffix = os.path.splitext(filename)
+        self.__columns: list[str] = columns
+        self.__format: str = fmt
+        self.__rotate: str|None = RotatingWriter.ROTATIONS[rotate]
+        self.__flush_rows: int = max(1, flush_rows)
+        self.__flush_seconds: float = flush_seconds
+        self.__schema = schema
+        self.__buffer: list[list] = []
+        self.__partition: str|None = None
+        self.__current: str|None = None
+        self.__file = None
+        self.__writer = None
+        self.__last_flush: float = time.monotonic()
+
+    @property
+    def filename(self) -> str|None:
+        """Name of the file currently open (None if nothing is open)"""
+        return self.__current
+
+    def __filename(self, partition: str) -> str:
+        if partition == "":
+            return f"{self.__root}{self.__suffix}"
+        return f"{self.__root}-{partition}{self.__suffix}"
+
+    def write(self, row: list, timestamp: datetime|None = None):
+        """
+        Buffer a single row
+        :param row: list of values in column order
+        :param timestamp: used to choose the rotation partition (defaults to now)
+        :return: None
+        """
+        partition = ""
+        if self.__rotate is not None:
+            partition = (timestamp if timestamp is not None else datetime.now()).strftime(self.__rotate)
+        if partition != self.__partition:
+            self.flush()
+            self.__open(partition)
+        self.__buffer.append(row)
+        if len(self.__buffer) >= self.__flush_rows:
+            self.flush()
+
+    def flush_if_due(self):
+        """Flush if the time policy has expired (call once per iteration)"""
+        if (time.monotonic() - self.__last_flush) >= self.__flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.__last_flush = time.monotonic()
+        if len(self.__buffer) == 0 or self.__writer is None:
+            return
+        if self.__format == "csv":
+            self.__writer.writerows(self.__buffer)
+            self.__file.flush()
+        else:
+            import pyarrow as pa
+            self.__writer.write_table(
+                pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(zip(*self.__buffer), self.__schema)],
+                    schema=self.__schema
+                )
+            )
+        self.__buffer = []
+
+    def close(self):
+        self.flush()
+        self.__close()
+        self.__partition = None
+
+    def __open(self, partition: str):
+        self.__close()
+        self.__partition = partition
+        filename = self.__filename(partition)
+        if self.__format == "csv":
+            self.__file = open(filename, "a", newline="")
+            self.__writer = csv.writer(self.__file)
+            if not self.__file.tell():  # Check if file is empty
+                self.__writer.writerow(self.__columns)
+                self.__file.flush()
+        else:
+            import pyarrow.parquet as pq
+            # parquet files can't be appended to, so a restart inside a partition starts a new sequence file
+            sequence = 1
+            while os.path.exists(filename):
+                filename = self.__filename(f"{partition}-{sequence}" if partition != "" else f"{sequence}")
+                sequence += 1
+            self.__writer = pq.ParquetWriter(filename, self.__schema)
+        self.__current = filename
+
+    def __close(self):
+        if self.__writer is not None and self.__format == "parquet":
+            self.__writer.close()
+        if self.__file is not None:
+            self.__file.close()
+        self.__writer = None
+        self.__file = None
+        self.__current = None
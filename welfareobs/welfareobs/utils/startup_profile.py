@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: startup_profile.py
+Description: Time-to-first-frame breakdown (config, validation, handler imports, setup, first iteration)
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import contextlib
+import os
+import sys
+import time
+from welfareobs.handlers import registry
+
+
+def process_age_ms() -> float:
+    """
+    Milliseconds since the process started (10ms resolution, from /proc on linux, 0 elsewhere).
+    This covers the interpreter start up and the imports before the profile was created.
+    """
+    try:
+        with open("/proc/self/stat", "r") as file:
+            # the command name (field 2) can contain spaces, fields after it are space separated
+            started = int(file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as file:
+            uptime = float(file.read().split()[0])
+        return max(0.0, (uptime - started / os.sysconf("SC_CLK_TCK")) * 1e3)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupProfile(object):
+    """
+    Phases are timed from the creation of the profile, and each records the number of modules it imported
+    (handler setups run concurrently, so their phases overlap and share the module counts). The per-handler
+    import times come from the handler registry. For a per-module breakdown run with `python -X importtime`.
+    """
+    def __init__(self):
+        self.__before_ms: float = process_age_ms()
+        self.__start: int = time.perf_counter_ns()
+        self.__phases: list[tuple[str, int, int, int]] = []  # name, start ns, end ns, modules imported
+        self.__marks: dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        modules = len(sys.modules)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.__phases.append((name, start, time.perf_counter_ns(), len(sys.modules) - modules))
+
+    def mark(self, name: str):
+        """
+        Record a point in time (e.g. "first-frame"), the first mark of a name wins
+        """
+        self.__marks.setdefault(name, time.perf_counter_ns())
+
+    def report(self) -> dict:
+        """
+        :return: dict (JSON serialisable), times in milliseconds from the start of the process
+        """
+        def since(ns: int) -> float:
+            return round(self.__before_ms + (ns - self.__start) / 1e6, 3)
+        return {
+            "before_profile_ms": round(self.__before_ms, 3),
+            "phases": [
+                {"phase": name, "ms": round((end - start) / 1e6, 3), "at_ms": since(end), "modules": modules}
+                for name, start, end, modules in self.__phases
+            ],
+            "handler_imports_ms": registry.import_times(),
+            "marks": {name: since(ns) for name, ns in self.__marks.items()}
+        }
+
+    def __str__(self):
+        report = self.report()
+        lines = [f"Startup: {report['before_profile_ms']:.0f}ms interpreter and imports before profiling"]
+        for o in report["phases"]:
+            lines.append(f"  {o['phase']:<32}{o['ms']:>10.1f}ms  +{o['modules']} modules  (at {o['at_ms']:.0f}ms)")
+        for handler, ms in sorted(report["handler_imports_ms"].items(), key=lambda o: o[1], reverse=True):
+            lines.append(f"  import {handler:<60}{ms:>10.1f}ms")
+        for name, ms in report["marks"].items():
+            lines.append(f"  {name:<32}at {ms:.0f}ms")
+        return "\n".join(lines)
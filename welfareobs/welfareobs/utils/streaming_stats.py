@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: streaming_stats.py
+Description: Constant memory running statistics (mean/variance and percentiles)
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import heapq
+import math
+
+
+def stable_copy(items, attempts: int = 100) -> tuple:
+    """
+    Copy of a collection another thread may be appending to (a metrics scrape reading the pipeline loop's
+    statistics). Copying a deque or dict view raises RuntimeError if it changes part way, so retry.
+    :param items: iterable to copy
+    :param attempts: retries before the error is raised
+    """
+    for attempt in range(attempts):
+        try:
+            return tuple(items)
+        except RuntimeError:
+            if attempt == attempts - 1:
+                raise
+
+
+class RunningStats(object):
+    """
+    Welford's online mean and variance, O(1) per update and numerically stable.
+    """
+    def __init__(self):
+        self.__count: int = 0
+        self.__mean: float = 0.0
+        self.__m2: float = 0.0
+        self.__total: float = 0.0
+
+    def add(self, value: float):
+        self.__count += 1
+        self.__total += value
+        delta = value - self.__mean
+        self.__mean += delta / self.__count
+        self.__m2 += delta * (value - self.__mean)
+
+    def __len__(self):
+        return self.__count
+
+    @property
+    def total(self) -> float:
+        return self.__total
+
+    @property
+    def mean(self) -> float:
+        return self.__mean
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (n - 1), matching statistics.variance"""
+        if self.__count < 2:
+            return 0.0
+        return self.__m2 / (self.__count - 1)
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class RunningMedian(object):
+    """
+    Exact running median with two heaps, O(log n) per update and O(1) per read.
+    """
+    def __init__(self):
+        self.__low: list[float] = []  # max heap (negated)
+        self.__high: list[float] = []  # min heap
+
+    def add(self, value: float):
+        if len(self.__low) == 0 or value <= -self.__low[0]:
+            heapq.heappush(self.__low, -value)
+        else:
+            heapq.heappush(self.__high, value)
+        if len(self.__low) > len(self.__high) + 1:
+            heapq.heappush(self.__high, -heapq.heappop(self.__low))
+        elif len(self.__high) > len(self.__low):
+            heapq.heappush(self.__low, -heapq.heappop(self.__high))
+
+    def __len__(self):
+        return len(self.__low) + len(self.__high)
+
+    @property
+    def median(self) -> float:
+        if len(self.__low) == 0:
+            return 0.0
+        if len(self.__low) > len(self.__high):
+            return -self.__low[0]
+        return (self.__high[0] - self.__low[0]) / 2.0
+
+
+class LogHistogram(object):
+    """
+    HDR-style histogram with logarithmic buckets. Every value above `minimum` is counted in a bucket whose
+    width is `precision` of its value, so percentiles are accurate to +/- precision/2 (relative) and the
+    number of buckets only depends on the dynamic range (about 2,100 buckets covers 1us to 1h at 1%).
+    """
+    def __init__(self, precision: float = 0.01, minimum: float = 1e-6):
+        self.__minimum: float = minimum
+        self.__log_base: float = math.log1p(precision)
+        self.__base: float = 1.0 + precision
+        self.__counts: dict[int, int] = {}
+        self.__count: int = 0
+        self.__max: float = 0.0
+        self.__min: float = math.inf
+
+    def __bucket(self, value: float) -> int:
+        if value <= self.__minimum:
+            return 0
+        return int(math.log(value / self.__minimum) / self.__log_base) + 1
+
+    def __value(self, bucket: int) -> float:
+        if bucket == 0:
+            return self.__minimum
+        # geometric middle of the bucket
+        return self.__minimum * self.__base ** (bucket - 0.5)
+
+    def add(self, value: float):
+        bucket = self.__bucket(value)
+        self.__counts[bucket] = self.__counts.get(bucket, 0) + 1
+        self.__count += 1
+        self.__max = max(self.__max, value)
+        self.__min = min(self.__min, value)
+
+    def __len__(self):
+        return self.__count
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: 0.0 -> 1.0 (0.5 is the median)
+        :return: estimated value (clamped to the observed min/max), 0 if empty
+        """
+        if self.__count == 0:
+            return 0.0
+        rank = q * (self.__count - 1)
+        seen = 0
+        # read on the metrics thread while the loop adds buckets
+        for bucket, count in sorted(stable_copy(self.__counts.items())):
+            seen += count
+            if seen > rank:
+                return min(max(self.__value(bucket), self.__min), self.__max)
+        return self.__max
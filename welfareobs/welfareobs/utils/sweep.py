@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: sweep.py
+Description: Run a list of training configs over a queue of devices, resumable, with a comparison table
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from types import SimpleNamespace
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
+
+
+def _worker(device: str, run: callable, jobs, results):
+    # one per device, pulls run names until it gets None
+    while True:
+        name = jobs.get()
+        if name is None:
+            return
+        results.put(("started", name, device, None))
+        start = time.perf_counter()
+        try:
+            result = dict(run(name, device) or {})
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            results.put(("done", name, device, result))
+        except Exception:
+            results.put(("failed", name, device, {"error": traceback.format_exc(limit=5)}))
+
+
+class Sweep(object):
+    """
+    Runs are queued and each device has a worker that takes the next run when it is free. With one device
+    the runs execute in this process. With more devices each worker is a spawned process (CUDA does not
+    survive a fork) that lives for the whole sweep, so whatever run() caches at module level (the parsed
+    dataset) is shared by the runs on that device.
+
+    run(name, device) -> dict of results (e.g. seconds per epoch, accuracy). It must be a module level
+    function so the spawned workers can import it. It should checkpoint as it goes and resume from its own
+    checkpoint, because the sweep retries runs that did not finish.
+
+    <directory>/sweep.json holds the status of every run (running, done, failed) and is rewritten as each
+    one changes. When the sweep starts again, the done runs are skipped and the rest are queued, including
+    those that were interrupted. <directory>/comparison.csv is the table of every run's results.
+    """
+    def __init__(self, directory: str, runs: list[str], devices: list[str], run: callable):
+        if len(devices) == 0:
+            raise ValueError("a sweep needs at least one device")
+        self.__directory: str = directory
+        self.__runs: list[str] = runs
+        self.__devices: list[str] = devices
+        self.__run: callable = run
+        self.__state: dict[str, dict] = {}
+        os.makedirs(directory, exist_ok=True)
+        filename = os.path.join(directory, "sweep.json")
+        if os.path.exists(filename):
+            with open(filename, "r") as file:
+                self.__state = json.load(file)
+
+    @property
+    def state(self) -> dict[str, dict]:
+        return self.__state
+
+    def pending(self) -> list[str]:
+        return [o for o in self.__runs if self.__state.get(o, {}).get("status") != "done"]
+
+    def __update(self, status: str, name: str, device: str, result: dict|None):
+        entry = {"status": status, "device": device}
+        if status == "started":
+            entry["status"] = "running"
+            log.info("Sweep: %s started on %s", name, device)
+        elif status == "done":
+            log.info("Sweep: %s done on %s", name, device)
+        else:
+            log.error("Sweep: %s failed on %s\n%s", name, device, (result or {}).get("error", ""))
+        self.__state[name] = {**entry, **(result or {})}
+        temp = os.path.join(self.__directory, ".sweep.json")
+        with open(temp, "w") as file:
+            json.dump(self.__state, file, indent=2)
+        os.replace(temp, os.path.join(self.__directory, "sweep.json"))
+
+    def start(self) -> dict[str, dict]:
+        """
+        Run every pending run, then write the comparison table
+        :return: state of every run
+        """
+        names = self.pending()
+        log.info("Sweep: %d of %d runs to do on %s", len(names), len(self.__runs), ", ".join(self.__devices))
+        if len(names) > 0 and len(self.__devices) == 1:
+            jobs = queue.SimpleQueue()
+            for name in names:
+                jobs.put(name)
+            jobs.put(None)
+            # in process: every status is written to sweep.json as it happens (running before the run starts,
+            # done straight after), so an interrupted sweep skips the runs that finished
+            _worker(self.__devices[0], self.__run, jobs, SimpleNamespace(put=lambda o: self.__update(*o)))
+        elif len(names) > 0:
+            self.__start_processes(names)
+        self.write_table()
+        return self.__state
+
+    def __start_processes(self, names: list[str]):
+        context = multiprocessing.get_context("spawn")
+        jobs, results = context.Queue(), context.Queue()
+        for name in names:
+            jobs.put(name)
+        workers = {}
+        for device in self.__devices[:len(names)]:
+            jobs.put(None)
+            workers[device] = context.Process(target=_worker, args=(device, self.__run, jobs, results),
+                                              name=f"sweep-{device}", daemon=True)
+            workers[device].start()
+        current: dict[str, str|None] = {device: None for device in workers.keys()}
+        remaining = len(names)
+        while remaining > 0:
+            try:
+                status, name, device, result = results.get(timeout=1.0)
+            except queue.Empty:
+                for device, process in workers.items():
+                    if not process.is_alive() and current[device] is not None:
+                        # killed (OOM, signal) part way through a run
+                        self.__update("failed", current[device], device, {"error": f"exit code {process.exitcode}"})
+                        current[device] = None
+                        remaining -= 1
+                if not any(o.is_alive() for o in workers.values()) and results.empty():
+                    break
+                continue
+            self.__update(status, name, device, result)
+            if status == "started":
+                current[device] = name
+            else:
+                current[device] = None
+                remaining -= 1
+        for process in workers.values():
+            process.join(timeout=5.0)
+
+    def table(self) -> list[dict]:
+        """
+        :return: one row per run (in the order given), the results as columns
+        """
+        return [{"run": name, **self.__state.get(name, {"status": "pending"})} for name in self.__runs]
+
+    def write_table(self) -> str:
+        """
+        Write comparison.csv and log it
+        :return: filename
+        """
+        rows = [{k: v for k, v in o.items() if k != "error"} for o in self.table()]
+        columns = list(dict.fromkeys(k for o in rows for k in o.keys()))
+        filename = os.path.join(self.__directory, "comparison.csv")
+        with open(filename, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        widths = {k: max(len(k), *(len(str(o.get(k, ""))) for o in rows)) for k in columns}
+        lines = ["  ".join(f"{k:<{widths[k]}}" for k in columns)]
+        lines.extend("  ".join(f"{str(o.get(k, '')):<{widths[k]}}" for k in columns) for o in rows)
+        log.info("Sweep comparison (%s):\n%s", filename, "\n".join(lines))
+        return filename
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: torch_profiler.py
+Description: torch.profiler window over a number of model iterations with labelled model stages
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import contextlib
+import functools
+import os
+from datetime import datetime
+import torch
+from torch.profiler import ProfilerActivity, profile, record_function, schedule
+from welfareobs.utils.logger import get_logger
+
+
+log = get_logger(__name__)
+
+# set while a profiling window is open, label() is a no-op otherwise
+_active: bool = False
+
+
+def label(name: str):
+    """
+    Context manager that labels a region in the profile (nullcontext when not profiling)
+    """
+    if _active:
+        return record_function(name)
+    return contextlib.nullcontext()
+
+
+def label_module(module: torch.nn.Module, name: str):
+    """
+    Wrap module.forward so its calls appear as `name` in the profile
+    """
+    forward = module.forward
+
+    @functools.wraps(forward)
+    def labelled(*args, **kwargs):
+        with label(name):
+            return forward(*args, **kwargs)
+    module.forward = labelled
+
+
+class TorchProfiler(object):
+    """
+    Profiles `iterations` calls of step() after skipping `skip` calls (model warm-up, cudnn autotune) and
+    writes <output>/<name>-<time>.trace.json (Chrome trace, opens in Perfetto) and .txt (summary table).
+    """
+    def __init__(self, output: str, name: str, skip: int = 10, iterations: int = 20, device: str = "cuda",
+                 profile_memory: bool = False):
+        self.__output = output
+        self.__name = name
+        self.__profile_memory = profile_memory
+        self.__activities = [ProfilerActivity.CPU]
+        self.__sort_by = "self_cpu_time_total"
+        if device.startswith("cuda") and torch.cuda.is_available():
+            self.__activities.append(ProfilerActivity.CUDA)
+            self.__sort_by = "self_cuda_time_total"
+        self.__schedule = schedule(wait=max(0, skip - 1), warmup=1 if skip > 0 else 0, active=iterations, repeat=1)
+        self.__profiler = None
+        self.__done: bool = False
+        os.makedirs(output, exist_ok=True)
+
+    def __ready(self, prof):
+        global _active
+        _active = False
+        self.__done = True
+        base = os.path.join(self.__output, f"{self.__name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        prof.export_chrome_trace(f"{base}.trace.json")
+        table = prof.key_averages().table(sort_by=self.__sort_by, row_limit=40)
+        with open(f"{base}.txt", "w") as file:
+            file.write(table)
+        log.info("Wrote torch profile %s.trace.json and %s.txt", base, base)
+
+    def start(self):
+        global _active
+        self.__profiler = profile(
+            activities=self.__activities,
+            schedule=self.__schedule,
+            on_trace_ready=self.__ready,
+            profile_memory=self.__profile_memory,
+            record_shapes=False
+        )
+        self.__profiler.start()
+        _active = True
+
+    def step(self):
+        """
+        Call once per iteration (after the model call)
+        """
+        if self.__profiler is not None:
+            self.__profiler.step()
+            if self.__done:
+                self.stop()  # window written, nothing more to record
+
+    def stop(self):
+        global _active
+        if self.__profiler is not None:
+            self.__profiler.stop()
+            self.__profiler = None
+        _active = False
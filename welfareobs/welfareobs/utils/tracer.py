@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: tracer.py
+Description: Ring buffer of timed pipeline events exported as Chrome Trace Event JSON (Perfetto)
+
+Copyright (C) 2025 J.Cincotta
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from welfareobs.utils.streaming_stats import stable_copy
+
+
+class Tracer(object):
+    """
+    Each event is a tuple appended to a bounded deque (atomic, no lock), so recording costs two
+    perf_counter_ns calls and an append. Only the last `capacity` events are kept, which makes it safe to
+    leave on for long runs: dump() writes the most recent window.
+
+    The output is the Chrome Trace Event format ("X" complete events, one track per thread) and opens in
+    https://ui.perfetto.dev or chrome://tracing.
+
+    Besides the dump at teardown, dump_if_due (called once per iteration) writes the buffer while running:
+    every `dump_seconds`, or when request_dump was called (the runner calls it on SIGUSR1). The events are
+    copied on the calling thread and the JSON is written by a background thread.
+    """
+    def __init__(self, capacity: int = 100000, dump_seconds: float = 0.0):
+        self.__events: deque = deque(maxlen=capacity)
+        self.__threads: dict[int, str] = {}
+        self.__iteration: int = 0
+        self.__origin_ns: int = time.perf_counter_ns()
+        self.__dump_seconds: float = dump_seconds
+        self.__next_dump: float = time.monotonic() + dump_seconds
+        self.__dump_requested: threading.Event = threading.Event()
+        self.__dump_thread: threading.Thread|None = None
+
+    @property
+    def iteration(self) -> int:
+        return self.__iteration
+
+    def next_iteration(self):
+        self.__iteration += 1
+
+    def __len__(self):
+        return len(self.__events)
+
+    def complete(self, name: str, category: str, start_ns: int, end_ns: int|None = None):
+        """
+        Record an event that started at start_ns (time.perf_counter_ns) and ends now (or at end_ns)
+        :param name: event name (job name)
+        :param category: event category (step label or phase)
+        """
+        if end_ns is None:
+            end_ns = time.perf_counter_ns()
+        ident = threading.get_ident()
+        if ident not in self.__threads:
+            self.__threads[ident] = threading.current_thread().name
+        self.__events.append((name, category, start_ns, end_ns, ident, self.__iteration))
+
+    def events(self) -> list[dict]:
+        """
+        :return: Chrome Trace Event dicts (thread name metadata first)
+        """
+        return self.__format(stable_copy(self.__threads.items()), stable_copy(self.__events))
+
+    def __format(self, threads: tuple, events: tuple) -> list[dict]:
+        pid = os.getpid()
+        output = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+            for ident, name in threads
+        ]
+        for name, category, start_ns, end_ns, ident, iteration in events:
+            output.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start_ns - self.__origin_ns) / 1e3,
+                "dur": (end_ns - start_ns) / 1e3,
+                "pid": pid,
+                "tid": ident,
+                "args": {"iteration": iteration}
+            })
+        return output
+
+    def dump(self, filename: str):
+        """
+        Write the buffered events as Chrome Trace Event JSON (to a temporary file then renamed, so a reader
+        never sees a partial file)
+        :param filename: output filename (.json)
+        """
+        self.__write(filename, stable_copy(self.__threads.items()), stable_copy(self.__events))
+
+    def __write(self, filename: str, threads: tuple, events: tuple):
+        root, suffix = os.path.splitext(filename)
+        temporary = f"{root}.tmp{suffix}"
+        with open(temporary, "w") as file:
+            json.dump({"traceEvents": self.__format(threads, events), "displayTimeUnit": "ms"}, file)
+        os.replace(temporary, filename)
+
+    def request_dump(self):
+        """
+        Dump at the next dump_if_due (only sets a flag, so it is safe in a signal handler)
+        """
+        self.__dump_requested.set()
+
+    def dump_if_due(self, filename: str) -> bool:
+        """
+        Start a background dump if one was requested or dump_seconds has elapsed (skipped while the previous
+        dump is still being written)
+        :param filename: output filename (.json), overwritten
+        :return: True if a dump was started
+        """
+        now = time.monotonic()
+        due = self.__dump_requested.is_set() or (self.__dump_seconds > 0 and now >= self.__next_dump)
+        if not due or (self.__dump_thread is not None and self.__dump_thread.is_alive()):
+            return False
+        self.__dump_requested.clear()
+        self.__next_dump = now + self.__dump_seconds
+        self.__dump_thread = threading.Thread(target=self.__write,
+                                              args=(filename, stable_copy(self.__threads.items()), stable_copy(self.__events)),
+                                              name="trace-dump", daemon=True)
+        self.__dump_thread.start()
+        return True
+
+    def wait(self, timeout: float|None = None):
+        """
+        Wait for a background dump to finish writing
+        """
+        if self.__dump_thread is not None:
+            self.__dump_thread.join(timeout)